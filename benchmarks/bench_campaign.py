@@ -0,0 +1,50 @@
+"""Load test of a campaign against the fake SLURM backend.
+
+Creates N jobs in a temporary folder, submits them with
+``smart_submit_all``, waits for the fake scheduler and checks all jobs with
+``JobSet.is_successful``. Jobs are not executed, they only sleep for the
+given runtime, so only the overhead of ccjob and the scheduler latencies
+are measured.
+
+Usage: python benchmarks/bench_campaign.py [njobs] [submit_latency_ms]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ccjob  # noqa: E402
+from ccjob.queue import FakeSLURM  # noqa: E402
+
+
+if __name__ == "__main__":
+    njobs = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    latency = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.0
+    fake = FakeSLURM(max_workers=64, execute=False, submit_latency=latency,
+                     status_latency=latency)
+
+    with tempfile.TemporaryDirectory() as root:
+        start = time.perf_counter()
+        inputs = ccjob.generate_inputs(
+            "ADC", {"nstates": range(njobs)},
+            os.path.join(root, "job_{index}", "adc.in"), silent=True)
+        jobs = [ccjob.Job(inp, script="qchem", queue=fake) for inp in inputs]
+        t_generate = time.perf_counter() - start
+
+        start = time.perf_counter()
+        ccjob.smart_submit_all(jobs, max_workers=32, silent=True,
+                               use_CCParser=False)
+        t_submit = time.perf_counter() - start
+        fake.wait()
+
+        start = time.perf_counter()
+        ccjob.JobSet(jobs).is_successful(use_CCParser=False)
+        t_check = time.perf_counter() - start
+        fake.shutdown()
+
+    print(f"jobs:     {njobs}")
+    print(f"generate: {t_generate:8.3f} s")
+    print(f"submit:   {t_submit:8.3f} s  ({njobs / t_submit:10.1f} jobs/s)")
+    print(f"check:    {t_check:8.3f} s  ({njobs / t_check:10.1f} jobs/s)")
@@ -0,0 +1,44 @@
+"""Benchmark formatting of point charge blocks.
+
+Compares a naive f-string join over rows with the single ``%`` operation
+of ``BlockFormatter.format_slow`` and the vectorized ``BlockFormatter``
+(numpy) for a block of random point charges.
+
+Usage: python benchmarks/bench_formatting.py [n_charges]
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+from ccjob.formatting import point_charge_formatter  # noqa: E402
+
+
+def naive(coords, charges):
+    return "\n".join(f"{x:16.10f}{y:16.10f}{z:16.10f}{q:10.4f}"
+                     for (x, y, z), q in zip(coords.tolist(),
+                                             charges.tolist()))
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    rng = np.random.RandomState(0)
+    coords = rng.uniform(-50, 50, size=(n, 3))
+    charges = rng.choice([-0.834, 0.417], size=n)
+    columns = [coords[:, 0], coords[:, 1], coords[:, 2], charges]
+
+    text = naive(coords, charges)
+    assert point_charge_formatter.format(*columns) == text
+    t_naive = min(timeit.repeat(lambda: naive(coords, charges),
+                                number=1, repeat=5))
+    t_slow = min(timeit.repeat(lambda: point_charge_formatter.format_slow(
+                               [c.tolist() for c in columns]),
+                               number=1, repeat=5))
+    t_fast = min(timeit.repeat(lambda: point_charge_formatter.format(
+                               *columns), number=1, repeat=5))
+    print(f"{n} point charges, {len(text) / 1e6:.1f} MB")
+    print(f"f-string join: {1e3 * t_naive:8.2f} ms")
+    print(f"format_slow:   {1e3 * t_slow:8.2f} ms {t_naive / t_slow:6.1f}x")
+    print(f"format:        {1e3 * t_fast:8.2f} ms {t_naive / t_fast:6.1f}x")
@@ -0,0 +1,38 @@
+"""Benchmark start-up time of scripts importing ccjob.
+
+Compares ``import ccjob`` (lazy) with importing everything the package used
+to import eagerly. Every measurement starts a fresh interpreter.
+
+Usage: python benchmarks/bench_import.py [repeats]
+"""
+import os
+import sys
+import subprocess as sp
+import time
+
+statements = {
+    "python (baseline)"   : "pass",
+    "import ccjob"        : "import ccjob",
+    "ccjob.Job"           : "import ccjob; ccjob.Job",
+    "eager (all modules)" : ("import ccjob.ccjob, ccjob.queue, ccjob.utils, "
+                             "ccjob.store, ccjob.templates, "
+                             "concurrent.futures"),
+}
+
+
+def startup_time(statement, repeats):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=root)
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        sp.run([sys.executable, "-c", statement], env=env, check=True)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+if __name__ == "__main__":
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    for label, statement in statements.items():
+        t = startup_time(statement, repeats)
+        print(f"{label:22s} {1000 * t:8.2f} ms")
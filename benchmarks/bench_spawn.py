@@ -0,0 +1,37 @@
+"""Benchmark the overhead of spawning scheduler commands.
+
+Compares the old way of calling sbatch/sacct (joined string with
+``shell=True``) with executing the program directly from an argument
+vector, with and without the cached lookup of ``ccjob.utils.which``.
+``true`` stands in for the scheduler binary.
+
+Usage: python benchmarks/bench_spawn.py [number]
+"""
+import os
+import shutil
+import subprocess as sp
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ccjob.utils import which  # noqa: E402
+
+args = ["true", "-j", "1234,1235,1236", "--parsable2", "--noheader",
+        "--format=JobID,State"]
+
+cases = {
+    "shell=True"         : lambda: sp.run(" ".join(args), shell=True,
+                                          stdout=sp.PIPE, stderr=sp.PIPE),
+    "argv, PATH lookup"  : lambda: sp.run([shutil.which(args[0])] + args[1:],
+                                          stdout=sp.PIPE, stderr=sp.PIPE),
+    "argv, cached which" : lambda: sp.run([which(args[0])] + args[1:],
+                                          stdout=sp.PIPE, stderr=sp.PIPE),
+}
+
+
+if __name__ == "__main__":
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    for label, case in cases.items():
+        t = min(timeit.repeat(case, number=number, repeat=3))
+        print(f"{label:20s} {1000 * t / number:8.3f} ms per call")
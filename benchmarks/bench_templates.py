@@ -0,0 +1,37 @@
+"""Benchmark rendering of input templates.
+
+Compares ``string.Template.substitute`` with the compiled templates of
+``ccjob.registry`` for every template of ``ccjob.templates``.
+
+Usage: python benchmarks/bench_templates.py [number]
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ccjob import templates  # noqa: E402
+from ccjob.registry import registry  # noqa: E402
+
+
+if __name__ == "__main__":
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    params = dict(templates.defaults, basis="aug-cc-pVTZ", nstates=10)
+    total_std, total_compiled = 0.0, 0.0
+    for name in registry.names():
+        compiled = registry[name]
+        if compiled.missing(params):
+            continue
+        template = getattr(templates, name)
+        t_std = min(timeit.repeat(lambda: template.substitute(params),
+                                  number=number, repeat=3))
+        t_compiled = min(timeit.repeat(lambda: compiled.render(params),
+                                       number=number, repeat=3))
+        total_std += t_std
+        total_compiled += t_compiled
+        print(f"{name:22s} {1e6 * t_std / number:8.2f} us "
+              f"{1e6 * t_compiled / number:8.2f} us "
+              f"{t_std / t_compiled:6.1f}x")
+    print(f"{'total':22s} {total_std:8.3f} s  {total_compiled:8.3f} s  "
+          f"{total_std / total_compiled:6.1f}x")
@@ -1,10 +1,81 @@
 """Top-level package for CompChemJob."""
 
-__all__ = ['ccjob', 'queue', 'utils']
-# deprecated to keep older scripts who import this from breaking
-from ccjob.ccjob import Input, Job
-from ccjob import queue
-from ccjob import utils
+import sys
+import importlib
+
+__all__ = ['ccjob', 'queue', 'utils', 'store', 'registry',
+           'generate', 'watch', 'workflow', 'throttle', 'campaign',
+           'allocation', 'sizing', 'trajectory', 'geometry', 'formatting']
+
+# Submodules and classes are only imported on first access (PEP 562), so
+# scripts that need only a small part of the package start faster.
+_submodules = ['ccjob', 'queue', 'utils', 'store', 'registry', 'generate',
+               'watch', 'workflow', 'throttle', 'campaign', 'allocation',
+               'sizing', 'trajectory', 'geometry', 'formatting', 'templates']
+_objects = {'Input'            : 'ccjob.ccjob',
+            'Job'              : 'ccjob.ccjob',
+            'JobSet'           : 'ccjob.ccjob',
+            'JobArray'         : 'ccjob.ccjob',
+            'JobBundle'        : 'ccjob.ccjob',
+            'smart_submit_all' : 'ccjob.ccjob',
+            'CompiledTemplate' : 'ccjob.registry',
+            'TemplateRegistry' : 'ccjob.registry',
+            'generate_inputs'  : 'ccjob.generate',
+            'JobWatcher'       : 'ccjob.watch',
+            'Workflow'         : 'ccjob.workflow',
+            'SubmitController' : 'ccjob.throttle',
+            'Campaign'         : 'ccjob.campaign',
+            'Allocation'       : 'ccjob.allocation',
+            'SizingPolicy'     : 'ccjob.sizing',
+            'read_xyz_frames'  : 'ccjob.trajectory',
+            'stream_inputs'    : 'ccjob.trajectory',
+            'Geometry'         : 'ccjob.geometry',
+            'BlockFormatter'   : 'ccjob.formatting',
+           }
+
+
+def __getattr__(name):
+    if name in _submodules:
+        return importlib.import_module('ccjob.' + name)
+    elif name in _objects:
+        return getattr(importlib.import_module(_objects[name]), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + _submodules + list(_objects))
+
+
+if sys.version_info < (3, 7):
+    # no module-level __getattr__, import everything right away
+    # deprecated to keep older scripts who import this from breaking
+    from ccjob.ccjob import Input, Job, JobSet, JobArray, JobBundle
+    from ccjob.ccjob import smart_submit_all
+    from ccjob import queue
+    from ccjob import utils
+    from ccjob import store
+    from ccjob import registry
+    from ccjob.registry import CompiledTemplate, TemplateRegistry
+    from ccjob import generate
+    from ccjob.generate import generate_inputs
+    from ccjob import watch
+    from ccjob.watch import JobWatcher
+    from ccjob import workflow
+    from ccjob.workflow import Workflow
+    from ccjob import throttle
+    from ccjob.throttle import SubmitController
+    from ccjob import campaign
+    from ccjob.campaign import Campaign
+    from ccjob import allocation
+    from ccjob.allocation import Allocation
+    from ccjob import sizing
+    from ccjob.sizing import SizingPolicy
+    from ccjob import trajectory
+    from ccjob.trajectory import read_xyz_frames, stream_inputs
+    from ccjob import geometry
+    from ccjob.geometry import Geometry
+    from ccjob import formatting
+    from ccjob.formatting import BlockFormatter
 
 
 __author__ = """Alexander Zech"""
@@ -0,0 +1,208 @@
+from ccjob.ccjob import JobSet
+from ccjob.queue import queue_factory, JobScheduler
+from ccjob.utils import which, template_args
+
+
+class Allocation(object):
+    """ One allocation in which many jobs are run as concurrent job steps.
+
+    The allocation is requested with ``salloc --no-shell`` (or an existing
+    one is used) and every job is started with ``srun`` as an exclusive
+    job step (``--exclusive --ntasks=1 --cpus-per-task=<cpus>``) from its
+    working directory. At most ``max_steps`` steps run at the same time,
+    standard output and error of every job go to its working directory.
+
+    Only SLURM (and FakeSLURM) support allocations.
+
+    Parameters
+    ----------
+    cpus : int
+        Number of CPUs of the allocation (default: 1).
+    mem : int
+        Memory in MB (default: None, i.e. scheduler default).
+    time : str
+        Time in scheduler format (default: None, i.e. scheduler default).
+    partition : str
+        Partition on which the allocation should be placed (default: None).
+    jobname : str
+        Job name (default: CCJob).
+    queue : str, SLURM
+        Name of job scheduler or instance (default: 'slurm').
+    jobid : str
+        Job ID of an existing allocation, e.g. ``$SLURM_JOB_ID`` inside of
+        salloc (default: None, i.e. request a new allocation).
+    """
+
+    def __init__(self, cpus=1, mem=None, time=None, partition=None,
+                 jobname="CCJob", queue="slurm", jobid=None):
+        if type(queue) == str:
+            self.queue = queue_factory(queue)
+        elif isinstance(queue, JobScheduler):
+            self.queue = queue
+        if not hasattr(self.queue, "allocation_template"):
+            raise NotImplementedError("Allocations are only supported by "
+                                      "SLURM!")
+        self.cpus = cpus
+        self.options = {"memory": mem, "time": time, "partition": partition,
+                        "jobname": jobname}
+        self.jobid = jobid
+        # only allocations requested here are released again
+        self.owned = False
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    def allocate_args(self):
+        """ Argument vector for requesting the allocation. """
+        args = [which(self.queue.job_allocate)]
+        args.extend(template_args(self.queue.allocation_template,
+                                  {"cpus": self.cpus}))
+        for key, value in self.options.items():
+            if value is not None:
+                args.extend(template_args(self.queue.template[key],
+                                          {key: value}))
+        return args
+
+    def acquire(self, silent=False):
+        """ Request the allocation (blocks until it is granted).
+
+        Raises
+        ------
+        RuntimeError
+            If no allocation was granted.
+        """
+        if self.jobid is not None:
+            return
+        args = self.allocate_args()
+        if not silent:
+            print("-- running: ", " ".join(args))
+        p = self.queue.run_command(args)
+        out = p.stdout.decode("utf-8") + p.stderr.decode("utf-8")
+        try:
+            self.jobid = self.queue.parse_jobid_allocation(out)
+        except ValueError:
+            raise RuntimeError(f"No allocation granted: {out.strip()}")
+        self.owned = True
+
+    def release(self):
+        """ Give back the allocation if it was requested by ``acquire``. """
+        if self.owned and self.jobid is not None:
+            self.queue.run_command(self.queue.cancel_args(self.jobid))
+            self.jobid = None
+            self.owned = False
+
+    def run_step(self, job, silent=False,
+                 out_extension='out',
+                 success_string="Have a nice day.",
+                 success_fct=None,
+                 use_CCParser=True):
+        """ Run one job as job step and check its output.
+
+        Returns
+        -------
+        successful : bool
+            Whether the job finished with good output.
+        """
+        job.meta["status"] = 'PENDING'
+        job.save_meta()
+        job.run(silent=silent, step_of=self.jobid)
+        # the step is finished, the output decides
+        job.jobid = None
+        return job.is_successful(out_extension=out_extension,
+                                 success_string=success_string,
+                                 success_fct=success_fct,
+                                 ignore_meta=True,
+                                 use_CCParser=use_CCParser,
+                                 q_status="")
+
+    def run(self, jobs, max_steps=None, dry_run=False, silent=False,
+            smart=True,
+            out_extension='out',
+            success_string="Have a nice day.",
+            success_fct=None,
+            use_CCParser=True):
+        """ Run jobs as concurrent job steps of the allocation.
+
+        The allocation is acquired if necessary.
+
+        Parameters
+        ----------
+        jobs : iterable of ccjob.Job
+            Job objects.
+        max_steps : int
+            Maximum number of job steps at the same time (default: None,
+            i.e. as many as fit into the CPUs of the allocation).
+        dry_run : bool
+            Whether to only print the commands (default: False).
+        silent : bool
+            Whether to print additional information (default: False).
+        smart : bool
+            Skip jobs which finished successfully or are still active
+            (default: True).
+        out_extension : str
+            File extension of output file (default: 'out').
+        success_string : str
+            String to match in output regarding successful job completion
+            (default: 'Have a nice day.').
+        success_fct : function(path_to_output)
+            Function object for custom parsing (default: None). Has to take
+            output path as an input and has to return a boolean.
+        use_CCParser : bool
+            Use CCParser module if possible (defautl: True).
+
+        Returns
+        -------
+        summary : dict
+            Lists of jobs which were 'successful', 'failed' or 'skipped'.
+        """
+        import concurrent.futures
+
+        jobs = list(jobs)
+        summary = {"successful": [], "failed": [], "skipped": []}
+        todo = jobs
+        if smart:
+            successful = JobSet(jobs).is_successful(
+                out_extension=out_extension,
+                success_string=success_string,
+                success_fct=success_fct,
+                use_CCParser=use_CCParser)
+            todo = [job for job, ok in zip(jobs, successful)
+                    if not ok and job.meta["status"] != 'PENDING']
+            summary["skipped"] = [job for job in jobs if job not in todo]
+        if len(todo) == 0:
+            return summary
+
+        if dry_run:
+            for job in todo:
+                job.run(dry_run=True, step_of=self.jobid or "$SLURM_JOB_ID")
+            return summary
+
+        if max_steps is None:
+            cpus = max(job.options["cpus"] or 1 for job in todo)
+            max_steps = max(1, self.cpus // cpus)
+        self.acquire(silent=silent)
+        with concurrent.futures.ThreadPoolExecutor(max_steps) as pool:
+            futures = {pool.submit(self.run_step, job, silent=silent,
+                                   out_extension=out_extension,
+                                   success_string=success_string,
+                                   success_fct=success_fct,
+                                   use_CCParser=use_CCParser): job
+                       for job in todo}
+            for f in concurrent.futures.as_completed(futures):
+                job = futures[f]
+                try:
+                    ok = f.result()
+                except Exception as error:
+                    print(f"!! Job step failed in {job.meta['wdir']}/: "
+                          f"{error}")
+                    ok = False
+                summary["successful" if ok else "failed"].append(job)
+        if not silent:
+            print("-- successful: {0}, failed: {1}, skipped: {2}".format(
+                  *[len(summary[k]) for k in
+                    ("successful", "failed", "skipped")]))
+        return summary
@@ -0,0 +1,227 @@
+import os
+from ccjob import utils
+
+
+class Campaign(object):
+    """ Index of all job folders below a root directory.
+
+    The directory tree is walked only once with ``os.scandir`` (optionally
+    by several worker threads, which helps on network file systems) and the
+    names of input, output, eleconfig and meta files of every folder are
+    kept in memory. Lookups like ``find_output`` are then answered from the
+    index instead of globbing every folder again.
+
+    Parameters
+    ----------
+    root : str
+        Root directory of the job tree.
+    in_extension : str
+        File extension of input files (default: 'in').
+    out_extension : str
+        File extension of output files (default: 'out').
+    meta_file : str
+        Name of meta files (default: 'meta.json').
+    """
+
+    def __init__(self, root, in_extension='in', out_extension='out',
+                 meta_file="meta.json"):
+        self.root = os.path.abspath(root)
+        self.in_extension = in_extension
+        self.out_extension = out_extension
+        self.meta_file = meta_file
+        #: mapping of absolute folder path to folder entry
+        self.index = {}
+
+    @classmethod
+    def scan(cls, root, max_workers=None, **kwargs):
+        """ Alternative constructor scanning the job tree right away.
+
+        Parameters
+        ----------
+        root : str
+            Root directory of the job tree.
+        max_workers : int
+            Number of threads walking the tree (default: None, i.e. walk
+            in the calling thread).
+        **kwargs : key-value pairs
+            Passed on to the constructor.
+        """
+        campaign = cls(root, **kwargs)
+        campaign.update(max_workers=max_workers)
+        return campaign
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, directory):
+        return os.path.abspath(directory) in self.index
+
+    def _scan_dir(self, path):
+        files, subdirs = [], []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    # symlinked folders are not followed (no loops)
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif entry.is_file():
+                        files.append(entry.name)
+        except OSError as error:
+            print(f"!! Could not scan {path}/: {error}")
+        return path, files, subdirs
+
+    def _entry(self, path, files):
+        in_ext = "." + self.in_extension
+        out_ext = "." + self.out_extension
+        files.sort()
+        return {"wdir"      : path,
+                "files"     : files,
+                "inputs"    : [fn for fn in files if fn.endswith(in_ext)],
+                "outputs"   : [fn for fn in files if fn.endswith(out_ext)
+                               and not fn.startswith("slurm")],
+                "eleconfig" : [fn for fn in files
+                               if fn.lower() in utils.eleconfig_names],
+                "meta"      : self.meta_file if self.meta_file in files
+                              else None}
+
+    def update(self, max_workers=None):
+        """ (Re-)scan the job tree and replace the index.
+
+        Parameters
+        ----------
+        max_workers : int
+            Number of threads walking the tree (default: None, i.e. walk
+            in the calling thread).
+        """
+        index = {}
+        if max_workers is None or max_workers <= 1:
+            todo = [self.root]
+            while len(todo) > 0:
+                path, files, subdirs = self._scan_dir(todo.pop())
+                index[path] = self._entry(path, files)
+                todo.extend(subdirs)
+        else:
+            import concurrent.futures
+
+            with concurrent.futures.ThreadPoolExecutor(max_workers) as pool:
+                pending = {pool.submit(self._scan_dir, self.root)}
+                while len(pending) > 0:
+                    done, pending = concurrent.futures.wait(
+                        pending,
+                        return_when=concurrent.futures.FIRST_COMPLETED)
+                    for f in done:
+                        path, files, subdirs = f.result()
+                        index[path] = self._entry(path, files)
+                        pending.update(pool.submit(self._scan_dir, d)
+                                       for d in subdirs)
+        self.index = index
+        return self
+
+    def folders(self):
+        """ Entries of all job folders (i.e. folders with an input file),
+        sorted by path.
+
+        Returns
+        -------
+        folders : list of dict
+            Folder entries with keys 'wdir', 'files', 'inputs', 'outputs',
+            'eleconfig' and 'meta'.
+        """
+        return [self.index[k] for k in sorted(self.index)
+                if len(self.index[k]["inputs"]) > 0]
+
+    def find_output(self, directory, extension=None, abspath=True):
+        """ Find output file in a directory (see ``utils.find_output``).
+
+        Folders outside of the index are searched with
+        ``utils.find_output``.
+
+        Parameters
+        ----------
+        directory : str
+            Path to folder in which output should be located.
+        extension : str
+            File extension of output file (default: None, i.e.
+            ``out_extension``).
+        abspath : bool
+            Whether to return absolute path (default: True).
+
+        Returns
+        -------
+        outpath : str
+            Path to output file (relative or absolute, default: absolute).
+        """
+        if extension is None:
+            extension = self.out_extension
+        absdir = os.path.abspath(directory)
+        entry = self.index.get(absdir)
+        if entry is None:
+            return utils.find_output(directory, extension=extension,
+                                     abspath=abspath)
+        if extension == self.out_extension:
+            outputs = entry["outputs"]
+        else:
+            outputs = [fn for fn in entry["files"]
+                       if fn.endswith("." + extension)
+                       and not fn.startswith("slurm")]
+
+        if len(outputs) != 1:
+            err = (f"Could not determine unique .{extension} file in "
+                   f"{directory}/ !")
+            raise FileNotFoundError(err)
+        return os.path.join(absdir if abspath else directory, outputs[0])
+
+    def find_eleconfig(self, directory, abspath=True):
+        """ Find electronic configuration file in a directory (see
+        ``utils.find_eleconfig``).
+
+        Parameters
+        ----------
+        directory : str
+            Search directory for finding electronic configuration file.
+        abspath : bool
+            Whether to return absolute path (default: True).
+
+        Returns
+        -------
+        elconf_path : str
+            Path to electronic configuration file.
+        """
+        absdir = os.path.abspath(directory)
+        entry = self.index.get(absdir)
+        if entry is None:
+            return utils.find_eleconfig(directory, abspath=abspath)
+        if len(entry["eleconfig"]) != 1:
+            err = "No or more than one electronic configuration file detected!"
+            raise FileNotFoundError(err)
+        return os.path.join(absdir if abspath else directory,
+                            entry["eleconfig"][0])
+
+    def jobs(self, **kwargs):
+        """ Job objects for all folders with exactly one input file.
+
+        The inputs are not read or written.
+
+        Parameters
+        ----------
+        **kwargs : key-value pairs
+            Passed on to ``ccjob.Job``, e.g. script or queue.
+
+        Returns
+        -------
+        jobs : list of ccjob.Job
+            One job per folder.
+        """
+        from ccjob.ccjob import Input, Job
+
+        kwargs.setdefault("meta_file", self.meta_file)
+        jobs = []
+        for entry in self.folders():
+            if len(entry["inputs"]) != 1:
+                print(f"!! Skipping {entry['wdir']}/: "
+                      f"{len(entry['inputs'])} input files")
+                continue
+            inp = Input(os.path.join(entry["wdir"], entry["inputs"][0]),
+                        to_file=False)
+            jobs.append(Job(inp, **kwargs))
+        return jobs
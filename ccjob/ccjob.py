@@ -1,11 +1,42 @@
-import subprocess as sp
 import string
+import shlex
 import os
 import json
 import re
-from ccjob.templates import defaults
-from ccjob.queue import queue_factory
-from ccjob.utils import split_path, module_exists
+from ccjob.queue import queue_factory, JobScheduler
+from ccjob.utils import split_path, module_exists, file_contains
+from ccjob.utils import which, time_to_seconds, seconds_to_time
+from ccjob.utils import template_args
+
+# Wrapper script for array jobs. Every task looks up its line in the
+# manifest (index, working directory, input file) and runs the actual
+# submission script from the job's working directory. $script has to be
+# substituted shell-quoted.
+array_wrapper = string.Template("""#!/bin/bash
+# generated by ccjob
+IFS=$$'\\t' read -r index wdir infile <<< \\
+    "$$(sed -n "$$((SLURM_ARRAY_TASK_ID + 1))p" "$$1")"
+cd "$$wdir" || exit 1
+exec $script "$$infile"
+""")
+
+# Script of a job bundle. All jobs of the manifest are run inside one
+# allocation, at most $max_parallel at the same time. Standard output and
+# error of every job are written to its working directory.
+bundle_script = string.Template("""#!/bin/bash
+# generated by ccjob
+while IFS=$$'\t' read -r index wdir infile cpus script; do
+    while [ "$$(jobs -rp | wc -l)" -ge $max_parallel ]; do
+        wait -n
+    done
+    (
+        cd "$$wdir" || exit 1
+        export OMP_NUM_THREADS="$$cpus"
+        "$$script" "$$infile" > stdout.txt 2> stderr.txt
+    ) &
+done < "$$1"
+wait
+""")
 
 class Input(object):
     def __init__(self, fpath, inp_string=None, to_file=True):
@@ -26,27 +57,38 @@ class Input(object):
             self.save_input()
 
     @classmethod
-    def from_template(cls, template, fpath, defaults=defaults, **kwargs):
+    def from_template(cls, template, fpath, defaults=None, **kwargs):
         """ Alternative constructor using string.Template
 
         Parameters
         ----------
-        template : string.Template
+        template : string.Template or ccjob.registry.CompiledTemplate
             Template of input file
         fpath : str
             Requested path to input file.
+        defaults : dict
+            Default values for template fields (default: None, i.e.
+            ``ccjob.templates.defaults``).
         **kwargs : key-value pairs
             keyworded arguments which have to match template
+
+        Raises
+        ------
+        KeyError
+            If template parameters are missing.
+        ValueError
+            If the template contains invalid placeholders.
         """
+        if defaults is None:
+            # templates module is only loaded when needed
+            from ccjob.templates import defaults
 
-        try:
-            #use defaults first and overwrite with user's specs
-            inp = template.substitute(defaults, **kwargs)
-            return cls(fpath, inp_string=inp)
-        except (KeyError, ValueError) as error:
-            print(error)
-            print(error.args)
-            quit(0)
+        # compiled templates report all missing parameters at once
+        if hasattr(template, "validate"):
+            template.validate(defaults, **kwargs)
+        #use defaults first and overwrite with user's specs
+        inp = template.substitute(defaults, **kwargs)
+        return cls(fpath, inp_string=inp)
 
     @classmethod
     def from_file(cls, path_src):
@@ -69,14 +111,48 @@ class Input(object):
         # connect object with file content
         return cls(path_src, inp_string=content, to_file=False)
 
-    def save_input(self):
-        """ Save input to file. """
+    def save_input(self, silent=False, force=False):
+        """ Save input to file.
+
+        An existing file with identical content is not rewritten, so its
+        mtime is kept.
+
+        Parameters
+        ----------
+        silent : bool
+            Whether to print additional information (default: False).
+        force : bool
+            Write file even if its content did not change (default: False).
+
+        Returns
+        -------
+        written : bool
+            Whether the file was written.
+        """
         if not os.path.exists(self.wdir):
             os.makedirs(self.wdir)
+        elif not force and self.is_unchanged():
+            if not silent:
+                print(f"-- Input file [{self.filename}] unchanged.")
+            return False
 
         with open(self.filepath, "w") as f:
             f.write(self.input_string)
-        print(f"-- Input file [{self.filename}] written successfully.")
+        if not silent:
+            print(f"-- Input file [{self.filename}] written successfully.")
+        return True
+
+    def is_unchanged(self):
+        """ Check whether the input file already holds the input string. """
+        try:
+            size = os.path.getsize(self.filepath)
+        except OSError:
+            return False
+        # cheap size check before comparing the content
+        if size != len(self.input_string.encode("utf-8")):
+            return False
+        with open(self.filepath) as f:
+            return f.read() == self.input_string
 
 class Job(object):
     """ Job Constructor.
@@ -104,7 +180,8 @@ class Job(object):
 
     def __init__(self, ccinput, script=None, queue="slurm", mem=500,
                  cpus=1, time="00:15:00", partition=None, jobname="CCJob",
-                 software=None, meta_file="meta.json"):
+                 software=None, meta_file="meta.json", store=None,
+                 group=None):
         """ Contructor for Job object.
 
         Parameters
@@ -129,47 +206,126 @@ class Job(object):
             Name of software binary (has to be in $PATH) (default: None).
         meta_file : str
             Name of file used to save meta info (default: 'meta.json').
+        store : ccjob.store.StatusStore
+            Central store used to save meta info instead of meta files
+            (default: None).
+        group : str
+            Label of jobs with similar resource needs, e.g. template and
+            basis set, used by ``ccjob.sizing.SizingPolicy`` (default: None).
         """
         self.ccinput = ccinput
         self.script = script
         self.software = software
         if type(queue) == str:
             self.queue = queue_factory(queue)
-        elif type(queue) == ccjob.Queue.SLURM:
+        elif isinstance(queue, JobScheduler):
             self.queue = queue
 
         self.jobid = None
+        # standard error of the last submission
+        self.submit_error = ""
 
         self.meta = {"status": None,
             "wdir"     : self.ccinput.wdir,
             "infile"   : self.ccinput.filename,
-            "basename" : self.ccinput.basename
+            "basename" : self.ccinput.basename,
+            "group"    : group
         }
         self.meta_filename = os.path.basename(meta_file)
         self.meta_filepath = os.path.join(self.ccinput.wdir, meta_file)
+        self.store = store
 
         # submit options
         self.options = {"memory": mem, "cpus": cpus, "time": time,
                         "partition": partition, "jobname": jobname}
         self.custom_options = []
         self.software_options = []
+        # job IDs which have to finish successfully before this job starts
+        self.dependencies = []
 
-    def get_job_options(self):
+    def get_job_options(self, exclude=()):
         """Prepare the string that holds all options for the queuing manager
 
+        Parameters
+        ----------
+        exclude : tuple
+            Names of options which are left out, e.g. 'partition'
+            (default: ()).
+
         Returns
         -------
         argument : list
             Option string for queuing manager.
         """
         argument = [string.Template(self.queue.template[key]).substitute(
-                    {key : value}) for key, value in self.options.items()]
+                    {key : value}) for key, value in self.options.items()
+                    if value is not None and key not in exclude]
 
         if len(self.custom_options) > 0:
             argument += self.custom_options
 
+        if len(self.dependencies) > 0:
+            argument.append(string.Template(
+                self.queue.dependency_template).substitute(
+                jobids=":".join(str(j) for j in self.dependencies)))
+
         return argument
 
+    def get_job_args(self, exclude=()):
+        """Queuing manager options as an argument vector.
+
+        Options of the form '-l mem=500' are split into separate arguments.
+        The option templates are split before the values are substituted,
+        so values with spaces or quotes (e.g. a job name) stay one argument.
+        Custom options are split as the shell would do it.
+
+        Parameters
+        ----------
+        exclude : tuple
+            Names of options which are left out (default: ()).
+
+        Returns
+        -------
+        args : list
+            Arguments for queuing manager.
+        """
+        args = []
+        for key, value in self.options.items():
+            if value is not None and key not in exclude:
+                args.extend(template_args(self.queue.template[key],
+                                          {key: value}))
+        for option in self.custom_options:
+            args.extend(shlex.split(option))
+        if len(self.dependencies) > 0:
+            args.extend(template_args(self.queue.dependency_template, {
+                "jobids": ":".join(str(j) for j in self.dependencies)}))
+        return args
+
+    def submit_args(self):
+        """Argument vector for submitting the job in batch mode.
+        """
+        return [which(self.queue.job_submit)] + self.get_job_args() \
+               + [self.script, self.ccinput.filename]
+
+    def run_args(self, step_of=None):
+        """Argument vector for running the job in live mode.
+
+        Parameters
+        ----------
+        step_of : str
+            Job ID of an allocation in which the job is run as a job step
+            with exclusive CPUs (default: None, i.e. the job gets its own
+            allocation).
+        """
+        if step_of is None:
+            return [which(self.queue.job_run)] + self.get_job_args() \
+                   + [self.script, self.ccinput.filename]
+        step = template_args(self.queue.step_template, {"jobid": step_of})
+        # the partition is given by the allocation
+        return [which(self.queue.job_run)] + step \
+               + self.get_job_args(exclude=("partition",)) \
+               + [self.script, self.ccinput.filename]
+
     def set_custom_options(self, *args, use_long=True, silent=True, **kwargs):
         """Adds custom queueing manager options.
 
@@ -192,43 +348,65 @@ class Job(object):
         """
         # TODO: need to automatically decide whether long or short format
         # keyworded arguments
+        # values are quoted, so they stay one argument in get_job_args
         if use_long:
-            self.custom_options.extend(["{0}={1}".format(k, v) for k, v in
-                                        kwargs.items()])
+            self.custom_options.extend(["{0}={1}".format(
+                k, shlex.quote(str(v))) for k, v in kwargs.items()])
         else:
-            self.custom_options.extend(["{0} {1}".format(k, v) for k, v in
-                                        kwargs.items()])
+            self.custom_options.extend(["{0} {1}".format(
+                k, shlex.quote(str(v))) for k, v in kwargs.items()])
         # flags
         self.custom_options.extend(args)
 
         if not silent:
-            print("-- Custom options specified: ", " ".join(self.custom_options))
+            print("-- Custom options specified: ",
+                  " ".join(self.custom_options))
 
-    def is_running(self):
+    def is_running(self, q_status=None):
         """ Check whether job is still running.
 
-        This function also changes the status variable. """
+        This function also changes the status variable.
+
+        Parameters
+        ----------
+        q_status : str
+            Queue state obtained beforehand, e.g. by ``JobSet`` (default:
+            None, i.e. ask the queue).
+        """
         # do we have a job ID to work with?
-        if self.jobid == None:
-            return False
-        else:
-            q_status = self.queue.get_status(self.jobid)
+        if self.jobid != None and q_status is None:
+            # jobs unknown to the queue (e.g. purged from accounting) are
+            # treated as not active
+            q_status = self.queue.get_status_many([self.jobid]).get(
+                       str(self.jobid), "")
 
-        if q_status == self.queue.state["active"]:
+        if self.jobid != None and self.queue.is_active(q_status):
             self.meta["status"] = 'PENDING'
             return True
         else:
+            # job left the queue, status has to be decided by its output
+            if self.meta["status"] == 'PENDING':
+                self.meta["status"] = None
             return False
 
     def good_output(self, path_to_outfile,
                    success_string="Have a nice day.",
                    success_fct=None,
-                   use_CCParser=True):
+                   use_CCParser=True,
+                   tail_size=65536,
+                   use_cache=True):
         """ Determines whether job terminated successfully.
 
         This function determines if the quantum chemistry software ended
         normally. It also changes the status variable.
 
+        Size, mtime and inode of the output and the success criterion are
+        saved to meta together with the verdict, so an unchanged output is
+        not parsed again with the same criterion. Verdicts of a
+        ``success_fct`` are only reused if it has a ``cache_key`` attribute
+        (e.g. 'energy-check-v2'), which has to change whenever the function
+        does.
+
         Parameters
         ----------
         path_to_outfile : str
@@ -241,6 +419,13 @@ class Job(object):
             output path as an input and has to return a boolean.
         use_CCParser : bool
             Use CCParser module if possible (defautl: True).
+        tail_size : int
+            Number of bytes at the end of the output which are searched for
+            ``success_string`` before scanning the whole file
+            (default: 64 KiB).
+        use_cache : bool
+            Reuse the verdict from meta if the output did not change
+            (default: True).
         """
 
         # do we have an output file?
@@ -248,10 +433,23 @@ class Job(object):
         if not out_exists:
             # status then stays the default, i.e. 'None'
             return False
+        out_stat = os.stat(path_to_outfile)
+        use_CCParser = use_CCParser and module_exists("CCParser")
+        fingerprint = {"out_size"  : out_stat.st_size,
+                       "out_mtime" : out_stat.st_mtime,
+                       "out_inode" : out_stat.st_ino,
+                       "out_check" : self.success_check(success_string,
+                                                        success_fct,
+                                                        use_CCParser)}
 
         normal = False
+        cached = None
+        if use_cache and fingerprint["out_check"] is not None:
+            cached = self.cached_verdict(fingerprint)
         # parse output file
-        if use_CCParser and module_exists("CCParser"):
+        if cached is not None:
+            normal = cached
+        elif use_CCParser:
             import CCParser as ccp
             #get has_finished
             p = ccp.Parser(path_to_outfile, to_console=False, to_file=False)
@@ -259,26 +457,70 @@ class Job(object):
         else:
             # manual implementation of has_finished
             if success_fct == None:
-                with open(path_to_outfile) as out:
-                    for line in out:
-                        if success_string in line:
-                            normal = True
+                normal = file_contains(path_to_outfile, success_string,
+                                       tail_size=tail_size)
             else:
                 normal = success_fct(path_to_outfile)
-                if type(gg) != bool:
+                if type(normal) != bool:
                     raise TypeError("Success_fct does not yield boolean!")
 
+        self.meta.update(fingerprint)
+        self.meta["out_good"] = bool(normal)
         if normal:
             self.meta["status"] = 'FIN'
         else:
             self.meta["status"] = 'FAIL'
         return normal
 
+    def success_check(self, success_string, success_fct, use_CCParser):
+        """ Description of the success criterion of ``good_output``.
+
+        Returns
+        -------
+        check : str or None
+            'CCParser', 'fct:<cache_key>' or 'string:<success_string>'. None
+            for a ``success_fct`` without ``cache_key`` attribute, as
+            functions cannot be told apart by their names (e.g. lambdas).
+        """
+        if use_CCParser:
+            return "CCParser"
+        if success_fct != None:
+            cache_key = getattr(success_fct, "cache_key", None)
+            if cache_key is None:
+                return None
+            return f"fct:{cache_key}"
+        return f"string:{success_string}"
+
+    def cached_verdict(self, fingerprint):
+        """ Get verdict of a previous output check from meta.
+
+        Parameters
+        ----------
+        fingerprint : dict
+            Current size, mtime and inode of the output file and success
+            criterion.
+
+        Returns
+        -------
+        verdict : bool or None
+            Previous verdict or None if the output or the criterion changed
+            since.
+        """
+        previous = self.meta
+        if "out_good" not in previous and self.has_meta():
+            previous = self.load_meta()
+        if previous.get("out_good") is None:
+            return None
+        if any(previous.get(k) != v for k, v in fingerprint.items()):
+            return None
+        return previous["out_good"]
+
     def is_successful(self, out_extension='out',
                       success_string="Have a nice day.",
                       success_fct=None,
                       ignore_meta=False,
-                      use_CCParser=True):
+                      use_CCParser=True,
+                      q_status=None):
         """ Checks whether job finished with good output.
 
         In principle there are three cases to be considered:
@@ -304,19 +546,20 @@ class Job(object):
             old meta with new one.
         use_CCParser : bool
             Use CCParser module if possible (defautl: True).
+        q_status : str
+            Queue state obtained beforehand, e.g. by ``JobSet`` (default:
+            None, i.e. ask the queue).
         """
         # output info
         outfile = ".".join([self.meta["basename"], out_extension])
         path_to_out = os.path.join(self.meta["wdir"], outfile)
 
         # Case (1) - output checked previously
-        is_fin = os.path.exists(self.meta_filepath) and \
-                 self.load_status() == "FIN" and \
-                 not ignore_meta
+        is_fin = self.is_finished(ignore_meta=ignore_meta)
 
         if not is_fin:
             # Case (2) - active job
-            is_running = self.is_running()
+            is_running = self.is_running(q_status=q_status)
             successful = False
             if not is_running:
                 # Case (3) - parse output
@@ -340,33 +583,101 @@ class Job(object):
         silent : bool
             Whether to print additional information (default: False).
         """
-        q_arg = self.get_job_options()
-
-        args = [self.queue.job_submit] \
-               + q_arg \
-               + [self.script, self.ccinput.filename]
+        args = self.submit_args()
         arg_str = " ".join(args)
         if dry_run:
             print("-- dry-run: ", arg_str)
         else:
             if not silent:
                 print("-- running: ", arg_str)
-            p = sp.run(arg_str, stdout=sp.PIPE, stderr=sp.PIPE, shell=True)
-            out = p.stdout.decode("utf-8")
-            if len(p.stderr) > 0:
-                print("-- stderr: ", p.stderr)
-            try:
-                self.jobid = self.queue.parse_jobid_batch(out)
-            except ValueError:
-                print("!! Could not parse Job ID, showing stdout instead:")
-                print("-- stdout: ", out)
+            p = self.queue.run_command(args, cwd=self.ccinput.wdir)
+            self.set_jobid(p.stdout, p.stderr)
+
+    async def submit_async(self, limiter=None, dry_run=False, silent=False):
+        """Submit job to queuing manager in batch mode (coroutine).
+
+        The submission command is executed with
+        ``asyncio.create_subprocess_exec``, so many jobs can be submitted
+        concurrently from one event loop.
+
+        Parameters
+        ----------
+        limiter : asyncio.Semaphore
+            Limits the number of concurrent subprocesses (default: None).
+        dry_run : bool
+            Whether to perform a dry-run job submission (default: False).
+        silent : bool
+            Whether to print additional information (default: False).
+        """
+        args = self.submit_args()
+        if dry_run:
+            print("-- dry-run: ", " ".join(args))
+            return
+        if not silent:
+            print("-- running: ", " ".join(args))
+        _, out, err = await self.queue.run_command_async(
+            args, cwd=self.ccinput.wdir, limiter=limiter)
+        self.set_jobid(out, err)
+
+    async def status_async(self, limiter=None):
+        """Get queue state of the job (coroutine).
+
+        Parameters
+        ----------
+        limiter : asyncio.Semaphore
+            Limits the number of concurrent subprocesses (default: None).
+
+        Returns
+        -------
+        q_status : str or None
+            Queue state or None if the job has no job ID or is unknown to
+            the queue.
+        """
+        if self.jobid == None:
+            return None
+        status = await self.queue.get_status_many_async([self.jobid],
+                                                        limiter=limiter)
+        return status.get(str(self.jobid))
+
+    def set_jobid(self, stdout, stderr):
+        """Set job ID from output of submission command.
+
+        Parameters
+        ----------
+        stdout : bytes
+            Standard output of submission command.
+        stderr : bytes
+            Standard error of submission command.
+        """
+        out = stdout.decode("utf-8")
+        self.submit_error = stderr.decode("utf-8")
+        if len(stderr) > 0:
+            print("-- stderr: ", stderr)
+        try:
+            self.jobid = self.queue.parse_jobid_batch(out)
+        except ValueError:
+            self.jobid = None
+            print("!! Could not parse Job ID, showing stdout instead:")
+            print("-- stdout: ", out)
+        self.meta["jobid"] = self.jobid
+        self.record_request()
+
+    def record_request(self):
+        """Save the requested memory and time to meta.
+
+        They are the limits of the submitted job, which may differ from
+        the options of a later driver (see ``ccjob.sizing.SizingPolicy``).
+        """
+        self.meta["memory"] = self.options["memory"]
+        self.meta["time"] = self.options["time"]
 
     def smart_submit(self, dry_run=False, silent=False,
                      out_extension='out',
                      success_string="Have a nice day.",
                      success_fct=None,
                      ignore_meta=False,
-                     use_CCParser=True):
+                     use_CCParser=True,
+                     q_status=None):
         """ Safe-submit job based on meta conditions.
 
         In principle there are three cases to be considered:
@@ -393,57 +704,75 @@ class Job(object):
             old meta with new one.
         use_CCParser : bool
             Use CCParser module if possible (defautl: True).
+        q_status : str
+            Queue state obtained beforehand, e.g. by ``JobSet`` (default:
+            None, i.e. ask the queue).
+
+        Returns
+        -------
+        submitted : bool
+            Whether the job was (re-)submitted.
         """
-        origin = os.getcwd()
-        if not self.is_successful(out_extension=out_extension,
-                                  success_string=success_string,
-                                  success_fct=success_fct,
-                                  ignore_meta=ignore_meta,
-                                  use_CCParser=use_CCParser):
-            # change directory to wdir (submit needs to be run from there)
-            os.chdir(self.meta["wdir"])
-            self.submit(dry_run=dry_run, silent=silent)
-            # take care of new status info
-            self.meta["status"] = 'PENDING'
-            self.save_meta()
-            # change back to origin folder
-            os.chdir(origin)
-        elif not silent:
-            wdir = self.meta["wdir"]
-            print(f"All good. Skipping folder {wdir}/")
+        wdir = self.meta["wdir"]
+        if self.is_successful(out_extension=out_extension,
+                              success_string=success_string,
+                              success_fct=success_fct,
+                              ignore_meta=ignore_meta,
+                              use_CCParser=use_CCParser,
+                              q_status=q_status):
+            if not silent:
+                print(f"All good. Skipping folder {wdir}/")
+            return False
+        elif self.meta["status"] == 'PENDING':
+            if not silent:
+                print(f"Job still active. Skipping folder {wdir}/")
+            return False
+
+        # submit is run from wdir
+        self.submit(dry_run=dry_run, silent=silent)
+        # take care of new status info
+        self.meta["status"] = 'PENDING'
+        self.save_meta()
+        return True
 
-    def run(self, dry_run=False, silent=False):
+    def run(self, dry_run=False, silent=False, step_of=None):
         """Submit job to queuing manager in live mode.
 
         This function uses the following commmand line structure:
 
         ``srun <SLURM options> script <input>``
 
+        The command is run from the working directory, standard output and
+        error go to 'stdout.txt' and 'stderr.txt' in there.
+
         Parameters
         ----------
         dry_run : bool
             Whether to perform a dry-run job submission (default: False).
         silent : bool
             Whether to print additional information (default: False).
-        """
-        q_arg = self.get_job_options()
+        step_of : str
+            Job ID of an allocation in which the job is run as a job step
+            (default: None).
 
-        args = [self.queue.job_run] \
-               + q_arg \
-               + [self.script, self.ccinput.filename]
+        Returns
+        -------
+        returncode : int or None
+            Return code of the command (None for a dry-run).
+        """
+        args = self.run_args(step_of=step_of)
         arg_str = " ".join(args)
         if dry_run:
             print("-- dry-run: ", arg_str)
-        else:
-            if not silent:
-                print("-- running: ", arg_str)
-            stdout = open("stdout.txt", "w")
-            stderr = open("stderr.txt", "w")
-
-            p = sp.run(arg_str, stdout=stdout, stderr=stderr, shell=True)
-
-            stderr.close()
-            stdout.close()
+            return None
+        if not silent:
+            print("-- running: ", arg_str)
+        wdir = self.ccinput.wdir
+        with open(os.path.join(wdir, "stdout.txt"), "w") as stdout, \
+             open(os.path.join(wdir, "stderr.txt"), "w") as stderr:
+            p = self.queue.run_command(args, cwd=wdir, stdout=stdout,
+                                       stderr=stderr)
+        return p.returncode
 
     def smart_run(self, dry_run=False, silent=False,
                   out_extension='out',
@@ -473,34 +802,772 @@ class Job(object):
         use_CCParser : bool
                 Use CCParser module if possible (defautl: True).
         """
-        origin = os.getcwd()
         if not self.is_successful(out_extension=out_extension,
                                   success_string=success_string,
                                   success_fct=success_fct,
                                   ignore_meta=ignore_meta,
                                   use_CCParser=use_CCParser):
-            # change directory to wdir (submit needs to be run from there)
-            os.chdir(self.meta["wdir"])
+            # run is executed in wdir
             self.run(dry_run=dry_run, silent=silent)
             # take care of new status information
             self.meta["status"] = 'PENDING'
             self.save_meta()
-            # change back to origin folder
-            os.chdir(origin)
 
     def save_meta(self):
-        """Dump meta information in json format.
+        """Dump meta information in json format (or to the status store).
         """
+        if self.store is not None:
+            self.store.save(self.meta)
+            return
         # jOut = os.path.join(self.meta["wdir"], meta_file)
         with open(self.meta_filepath, "w") as f:
             json.dump(self.meta, f)
 
-    def load_status(self):
-        """Read status from meta file.
+    def has_meta(self):
+        """Check whether meta information was saved before.
+        """
+        if self.store is not None:
+            return self.load_meta() is not None
+        return os.path.exists(self.meta_filepath)
+
+    def load_meta(self):
+        """Read meta information from meta file (or from the status store).
         """
+        if self.store is not None:
+            return self.store.load(self.meta["wdir"], self.meta["basename"])
         # jIn = os.path.join(self.meta["wdir"], meta_file)
         with open(self.meta_filepath, "r") as f:
             tmp = json.load(f)
+        return tmp
+
+    def load_status(self):
+        """Read status from meta file (None if the status store has no entry
+        for the job).
+        """
+        tmp = self.load_meta()
+        if tmp is None:
+            return None
         if "status" in tmp.keys():
             # self.meta["status"] = tmp["status"]
             return tmp["status"]
+
+    def is_finished(self, ignore_meta=False):
+        """Check whether meta file marks the job as finished.
+
+        As a side effect, the job ID of a previous submission and its
+        requested memory and time are recovered from the meta file if the
+        job does not have a job ID yet.
+
+        Parameters
+        ----------
+        ignore_meta : bool
+            Ignore existing meta file (default: False).
+        """
+        if ignore_meta:
+            return False
+        tmp = self.load_meta() if self.has_meta() else None
+        if tmp is None:
+            return False
+        if self.jobid == None and tmp.get("jobid") != None:
+            self.jobid = tmp["jobid"]
+            self.meta["jobid"] = self.jobid
+            self.meta.update((k, tmp[k]) for k in ("memory", "time")
+                             if k in tmp)
+        return tmp.get("status") == "FIN"
+
+
+# meta keys of the resource usage of a job which left the queue
+usage_keys = ("q_state", "elapsed", "total_cpu", "max_rss", "usage_jobid")
+
+
+class JobSet(object):
+    """ Collection of Job objects sharing scheduler queries.
+
+    Instead of asking the queuing manager once per job, the status of all
+    jobs is obtained with a single (chunked) query per queue instance.
+
+    Parameters
+    ----------
+    jobs : iterable of ccjob.Job
+        Job objects.
+    """
+
+    def __init__(self, jobs):
+        self.jobs = list(jobs)
+
+    def __iter__(self):
+        return iter(self.jobs)
+
+    def __len__(self):
+        return len(self.jobs)
+
+    def get_status(self, jobs=None):
+        """ Query the status of all jobs at once.
+
+        Parameters
+        ----------
+        jobs : list of ccjob.Job
+            Subset of jobs to be queried (default: None, i.e. all jobs).
+
+        Returns
+        -------
+        status : dict
+            Mapping of job ID to queue state.
+        """
+        jobs = self.jobs if jobs is None else jobs
+        by_queue = {}
+        for job in jobs:
+            if job.jobid != None:
+                # instances of one class may hold different state
+                queue_jobs = by_queue.setdefault(id(job.queue), [])
+                queue_jobs.append(job)
+
+        status = {}
+        for queue_jobs in by_queue.values():
+            queue = queue_jobs[0].queue
+            status.update(queue.get_status_many([j.jobid for j in queue_jobs]))
+        return status
+
+    def get_status_usage(self, jobs=None):
+        """ Query the status of all jobs and the usage of finished jobs.
+
+        Queues with accounting (see ``SLURM.get_status_usage_many``) return
+        the usage together with the status, i.e. without a second query.
+
+        Parameters
+        ----------
+        jobs : list of ccjob.Job
+            Subset of jobs to be queried (default: None, i.e. all jobs).
+
+        Returns
+        -------
+        status : dict
+            Mapping of job ID to queue state.
+        usage : dict
+            Mapping of job ID to usage.
+        """
+        jobs = self.jobs if jobs is None else jobs
+        by_queue = {}
+        for job in jobs:
+            if job.jobid != None:
+                by_queue.setdefault(id(job.queue), []).append(job)
+
+        status, usage = {}, {}
+        for queue_jobs in by_queue.values():
+            queue = queue_jobs[0].queue
+            jobids = [j.jobid for j in queue_jobs]
+            if hasattr(queue, "get_status_usage_many"):
+                queue_status, queue_usage = queue.get_status_usage_many(jobids)
+                usage.update(queue_usage)
+            else:
+                queue_status = queue.get_status_many(jobids)
+            status.update(queue_status)
+        return status, usage
+
+    def recorded_usage(self, job):
+        """ Usage saved to meta for the current job ID of a job.
+
+        Returns
+        -------
+        usage : dict or None
+            Usage keys of meta or None if the usage of the current job ID
+            was not recorded yet.
+        """
+        meta = job.meta
+        if "usage_jobid" not in meta and job.has_meta():
+            meta = job.load_meta() or {}
+        if job.jobid == None or meta.get("usage_jobid") != str(job.jobid):
+            return None
+        return {k: meta[k] for k in usage_keys if k in meta}
+
+    def update_usage(self, jobs=None):
+        """ Add state and resource usage of finished jobs to their meta.
+
+        The keys 'q_state', 'elapsed', 'total_cpu' and 'max_rss' are
+        obtained with one (chunked) accounting query per queue instance, see
+        ``SLURM.get_usage_many``. Queues without accounting and jobs whose
+        usage was recorded before (key 'usage_jobid') are skipped. Meta is
+        not saved.
+
+        Parameters
+        ----------
+        jobs : list of ccjob.Job
+            Subset of jobs to be queried (default: None, i.e. all jobs).
+        """
+        jobs = self.jobs if jobs is None else jobs
+        by_queue = {}
+        for job in jobs:
+            if job.jobid != None and hasattr(job.queue, "get_usage_many"):
+                recorded = self.recorded_usage(job)
+                if recorded is not None:
+                    job.meta.update(recorded)
+                    continue
+                by_queue.setdefault(id(job.queue), []).append(job)
+
+        for queue_jobs in by_queue.values():
+            queue = queue_jobs[0].queue
+            usage = queue.get_usage_many([j.jobid for j in queue_jobs])
+            for job in queue_jobs:
+                self.set_usage(job, usage.get(str(job.jobid)))
+
+    def set_usage(self, job, usage):
+        """ Add usage of a job which left the queue to its meta. """
+        if usage is None or job.queue.is_active(usage.get("q_state")):
+            return
+        job.meta.update(usage, usage_jobid=str(job.jobid))
+
+    async def get_status_async(self, jobs=None, limiter=None):
+        """ Query the status of all jobs at once (coroutine).
+
+        Parameters
+        ----------
+        jobs : list of ccjob.Job
+            Subset of jobs to be queried (default: None, i.e. all jobs).
+        limiter : asyncio.Semaphore
+            Limits the number of concurrent subprocesses (default: None).
+
+        Returns
+        -------
+        status : dict
+            Mapping of job ID to queue state.
+        """
+        import asyncio
+
+        jobs = self.jobs if jobs is None else jobs
+        by_queue = {}
+        for job in jobs:
+            if job.jobid != None:
+                by_queue.setdefault(id(job.queue), []).append(job)
+
+        results = await asyncio.gather(*[
+            queue_jobs[0].queue.get_status_many_async(
+                [j.jobid for j in queue_jobs], limiter=limiter)
+            for queue_jobs in by_queue.values()])
+        status = {}
+        for result in results:
+            status.update(result)
+        return status
+
+    async def submit_async(self, jobs=None, max_concurrency=32,
+                           dry_run=False, silent=False):
+        """ Submit jobs concurrently from one event loop (coroutine).
+
+        Parameters
+        ----------
+        jobs : list of ccjob.Job
+            Subset of jobs to submit (default: None, i.e. all jobs).
+        max_concurrency : int
+            Maximum number of concurrent submission commands (default: 32).
+        dry_run : bool
+            Whether to perform a dry-run job submission (default: False).
+        silent : bool
+            Whether to print additional information (default: False).
+        """
+        import asyncio
+
+        jobs = self.jobs if jobs is None else jobs
+        limiter = asyncio.Semaphore(max_concurrency)
+        await asyncio.gather(*[job.submit_async(limiter=limiter,
+                                                dry_run=dry_run,
+                                                silent=silent)
+                               for job in jobs])
+        if not dry_run:
+            for job in jobs:
+                job.meta["status"] = 'PENDING'
+                job.save_meta()
+
+    def is_successful(self, out_extension='out',
+                      success_string="Have a nice day.",
+                      success_fct=None,
+                      ignore_meta=False,
+                      use_CCParser=True):
+        """ Checks for all jobs whether they finished with good output.
+
+        Same as ``Job.is_successful``, but the queue is only asked once for
+        all jobs which are not yet marked as finished in their meta file.
+        The state and usage of jobs which left the queue are recorded in
+        meta (see ``update_usage``), so these jobs are not queried again
+        until they are resubmitted.
+
+        Parameters
+        ----------
+        out_extension : str
+            File extension of output file (default: 'out').
+        success_string : str
+            String to match in output regarding successful job completion
+            (default: 'Have a nice day.').
+        success_fct : function(path_to_output)
+            Function object for custom parsing (default: None). Has to take
+            output path as an input and has to return a boolean.
+        ignore_meta : bool
+            Ignore existing meta file (default: False). Effectively overwrites
+            old meta with new one.
+        use_CCParser : bool
+            Use CCParser module if possible (defautl: True).
+
+        Returns
+        -------
+        successful : list of bool
+            Result of ``Job.is_successful`` for every job (same order).
+        """
+        finished = [job.is_finished(ignore_meta=ignore_meta)
+                    for job in self.jobs]
+        # final state of jobs which left the queue before
+        recorded = {job: self.recorded_usage(job)
+                    for job, fin in zip(self.jobs, finished) if not fin}
+        status, usage = self.get_status_usage(
+            [job for job, rec in recorded.items() if rec is None])
+
+        successful = []
+        for job, fin in zip(self.jobs, finished):
+            if fin:
+                successful.append(True)
+                continue
+            if recorded[job] is not None:
+                job.meta.update(recorded[job])
+                q_status = recorded[job].get("q_state", "")
+            else:
+                # jobs unknown to the queue are treated as not active
+                q_status = status.get(str(job.jobid), "")
+                # saved to meta below
+                self.set_usage(job, usage.get(str(job.jobid)))
+            # meta was checked above already
+            successful.append(job.is_successful(out_extension=out_extension,
+                                                success_string=success_string,
+                                                success_fct=success_fct,
+                                                ignore_meta=True,
+                                                use_CCParser=use_CCParser,
+                                                q_status=q_status))
+        return successful
+
+
+class JobArray(JobSet):
+    """ Collection of jobs submitted as a single array job.
+
+    All jobs have to share the same submission script and queue options.
+    The jobs are listed in a manifest file (one line per array index) which
+    is read by a generated wrapper script in every array task. The job ID
+    of every task (``<jobid>_<index>``) is saved to its meta file, so
+    ``Job.is_successful`` and ``Job.smart_submit`` keep working per job.
+
+    Parameters
+    ----------
+    jobs : iterable of ccjob.Job
+        Job objects.
+    root : str
+        Folder in which manifest and wrapper script are written (default:
+        None, i.e. common parent folder of all jobs).
+    manifest : str
+        Name of manifest file (default: 'array_manifest.txt').
+    wrapper : str
+        Name of wrapper script (default: 'array_wrapper.sh').
+    """
+
+    def __init__(self, jobs, root=None, manifest="array_manifest.txt",
+                 wrapper="array_wrapper.sh"):
+        super().__init__(jobs)
+        if root is None and len(self.jobs) > 0:
+            root = os.path.commonpath([j.meta["wdir"] for j in self.jobs])
+        self.root = root
+        self.manifest = manifest
+        self.wrapper = wrapper
+
+    def check_jobs(self, jobs):
+        """ Make sure that all jobs can be submitted in one array. """
+        if len(jobs) == 0:
+            raise ValueError("No jobs to submit!")
+        first = jobs[0]
+        for job in jobs[1:]:
+            if type(job.queue) != type(first.queue) or \
+               job.script != first.script or \
+               job.get_job_options() != first.get_job_options():
+                raise ValueError(("All jobs of an array have to share queue, "
+                                  "script and options!"))
+        if not hasattr(first.queue, "array_template"):
+            raise NotImplementedError(("Array jobs are not supported by "
+                                       f"{type(first.queue).__name__}!"))
+
+    def write_manifest(self, jobs):
+        """ Write manifest and wrapper script to the root folder.
+
+        Returns
+        -------
+        manifest_path : str
+            Path to manifest file.
+        wrapper_path : str
+            Path to wrapper script.
+        """
+        manifest_path = os.path.join(self.root, self.manifest)
+        wrapper_path = os.path.join(self.root, self.wrapper)
+        with open(manifest_path, "w") as f:
+            for i, job in enumerate(jobs):
+                f.write(f"{i}\t{job.meta['wdir']}\t{job.meta['infile']}\n")
+        with open(wrapper_path, "w") as f:
+            f.write(array_wrapper.substitute(
+                    script=shlex.quote(jobs[0].script)))
+        os.chmod(wrapper_path, 0o755)
+        return manifest_path, wrapper_path
+
+    def submit(self, jobs=None, throttle=None, dry_run=False, silent=False):
+        """Submit jobs as one array job to the queuing manager.
+
+        Parameters
+        ----------
+        jobs : list of ccjob.Job
+            Subset of jobs to submit (default: None, i.e. all jobs).
+        throttle : int
+            Maximum number of simultaneously running tasks (default: None).
+        dry_run : bool
+            Whether to perform a dry-run job submission (default: False).
+        silent : bool
+            Whether to print additional information (default: False).
+        """
+        jobs = self.jobs if jobs is None else jobs
+        self.check_jobs(jobs)
+        queue = jobs[0].queue
+        manifest_path, wrapper_path = self.write_manifest(jobs)
+
+        array = f"0-{len(jobs) - 1}"
+        if throttle is not None:
+            array += f"%{throttle}"
+        array_arg = string.Template(queue.array_template).substitute(
+                    array=array)
+        args = [which(queue.job_submit)] \
+               + jobs[0].get_job_args() \
+               + [array_arg, wrapper_path, manifest_path]
+        arg_str = " ".join(args)
+        if dry_run:
+            print("-- dry-run: ", arg_str)
+            return
+
+        if not silent:
+            print("-- running: ", arg_str)
+        p = queue.run_command(args, cwd=self.root)
+        out = p.stdout.decode("utf-8")
+        if len(p.stderr) > 0:
+            print("-- stderr: ", p.stderr)
+        try:
+            jobid = queue.parse_jobid_batch(out)
+        except ValueError:
+            print("!! Could not parse Job ID, showing stdout instead:")
+            print("-- stdout: ", out)
+            return
+
+        for i, job in enumerate(jobs):
+            job.jobid = f"{jobid}_{i}"
+            job.meta["jobid"] = job.jobid
+            job.record_request()
+            job.meta["status"] = 'PENDING'
+            job.save_meta()
+
+    def smart_submit(self, throttle=None, dry_run=False, silent=False,
+                     out_extension='out',
+                     success_string="Have a nice day.",
+                     success_fct=None,
+                     ignore_meta=False,
+                     use_CCParser=True):
+        """ Submit all unsuccessful jobs as one array job.
+
+        Parameters
+        ----------
+        throttle : int
+            Maximum number of simultaneously running tasks (default: None).
+        dry_run : bool
+            Whether to perform a dry-run job submission (default: False).
+        silent : bool
+            Whether to print additional information (default: False).
+        out_extension : str
+            File extension of output file (default: 'out').
+        success_string : str
+            String to match in output regarding successful job completion
+            (default: 'Have a nice day.').
+        success_fct : function(path_to_output)
+            Function object for custom parsing (default: None). Has to take
+            output path as an input and has to return a boolean.
+        ignore_meta : bool
+            Ignore existing meta file (default: False). Effectively overwrites
+            old meta with new one.
+        use_CCParser : bool
+            Use CCParser module if possible (defautl: True).
+        """
+        successful = self.is_successful(out_extension=out_extension,
+                                        success_string=success_string,
+                                        success_fct=success_fct,
+                                        ignore_meta=ignore_meta,
+                                        use_CCParser=use_CCParser)
+        # neither finished nor still active
+        todo = [job for job, ok in zip(self.jobs, successful)
+                if not ok and job.meta["status"] != 'PENDING']
+        if len(todo) > 0:
+            self.submit(jobs=todo, throttle=throttle, dry_run=dry_run,
+                        silent=silent)
+        elif not silent:
+            print(f"All good. Skipping array in {self.root}/")
+
+
+class JobBundle(JobSet):
+    """ Collection of short jobs run together inside one allocation.
+
+    Instead of paying the queueing latency for every job, a single batch
+    job is submitted which runs all jobs in parallel (at most
+    ``max_parallel`` at a time). The allocation is sized from the job
+    options: CPUs and memory are the sums over the largest
+    ``max_parallel`` jobs, the time limit covers running all jobs in that
+    many slots. Every job gets the job ID of the bundle in its meta file
+    and writes 'stdout.txt'/'stderr.txt' to its working directory, so
+    ``Job.is_successful`` keeps working per job.
+
+    Parameters
+    ----------
+    jobs : iterable of ccjob.Job
+        Job objects.
+    max_parallel : int
+        Maximum number of jobs running at the same time (default: None,
+        i.e. all jobs).
+    root : str
+        Folder in which manifest and bundle script are written (default:
+        None, i.e. common parent folder of all jobs).
+    manifest : str
+        Name of manifest file (default: 'bundle_manifest.txt').
+    script : str
+        Name of bundle script (default: 'bundle.sh').
+    jobname : str
+        Job name of the bundle (default: 'CCJob-bundle').
+    """
+
+    def __init__(self, jobs, max_parallel=None, root=None,
+                 manifest="bundle_manifest.txt", script="bundle.sh",
+                 jobname="CCJob-bundle"):
+        super().__init__(jobs)
+        if root is None and len(self.jobs) > 0:
+            root = os.path.commonpath([j.meta["wdir"] for j in self.jobs])
+        self.root = root
+        self.max_parallel = max_parallel
+        self.manifest = manifest
+        self.script = script
+        self.jobname = jobname
+
+    def get_options(self, jobs):
+        """ Queue options of the bundle sized from the options of all jobs.
+
+        Returns
+        -------
+        options : dict
+            Options in the format of ``Job.options``.
+        """
+        slots = len(jobs) if self.max_parallel is None else \
+                min(self.max_parallel, len(jobs))
+        cpus = sorted((j.options["cpus"] for j in jobs), reverse=True)
+        memory = sorted((j.options["memory"] for j in jobs), reverse=True)
+        times = [time_to_seconds(j.options["time"]) for j in jobs]
+        # upper bound for running all jobs in the given number of slots
+        walltime = min(sum(times), sum(times) / slots + max(times))
+
+        options = dict(jobs[0].options)
+        options.update({"cpus": sum(cpus[:slots]),
+                        "memory": sum(memory[:slots]),
+                        "time": seconds_to_time(walltime),
+                        "jobname": self.jobname})
+        return options
+
+    def write_manifest(self, jobs):
+        """ Write manifest and bundle script to the root folder.
+
+        Returns
+        -------
+        manifest_path : str
+            Path to manifest file.
+        script_path : str
+            Path to bundle script.
+        """
+        manifest_path = os.path.join(self.root, self.manifest)
+        script_path = os.path.join(self.root, self.script)
+        with open(manifest_path, "w") as f:
+            for i, job in enumerate(jobs):
+                f.write("\t".join([str(i), job.meta["wdir"],
+                                   job.meta["infile"],
+                                   str(job.options["cpus"]),
+                                   which(job.script)]) + "\n")
+        slots = len(jobs) if self.max_parallel is None else self.max_parallel
+        with open(script_path, "w") as f:
+            f.write(bundle_script.substitute(max_parallel=slots))
+        os.chmod(script_path, 0o755)
+        return manifest_path, script_path
+
+    def submit(self, jobs=None, dry_run=False, silent=False):
+        """Submit jobs as one bundle to the queuing manager.
+
+        Parameters
+        ----------
+        jobs : list of ccjob.Job
+            Subset of jobs to submit (default: None, i.e. all jobs).
+        dry_run : bool
+            Whether to perform a dry-run job submission (default: False).
+        silent : bool
+            Whether to print additional information (default: False).
+        """
+        jobs = self.jobs if jobs is None else jobs
+        if len(jobs) == 0:
+            raise ValueError("No jobs to submit!")
+        queue = jobs[0].queue
+        if any(type(j.queue) != type(queue) for j in jobs):
+            raise ValueError("All jobs of a bundle have to share the queue!")
+        manifest_path, script_path = self.write_manifest(jobs)
+
+        args = [which(queue.job_submit)]
+        for key, value in self.get_options(jobs).items():
+            if value is not None:
+                args.extend(template_args(queue.template[key], {key: value}))
+        args += [script_path, manifest_path]
+        arg_str = " ".join(args)
+        if dry_run:
+            print("-- dry-run: ", arg_str)
+            return
+
+        if not silent:
+            print("-- running: ", arg_str)
+        p = queue.run_command(args, cwd=self.root)
+        out = p.stdout.decode("utf-8")
+        if len(p.stderr) > 0:
+            print("-- stderr: ", p.stderr)
+        try:
+            jobid = queue.parse_jobid_batch(out)
+        except ValueError:
+            print("!! Could not parse Job ID, showing stdout instead:")
+            print("-- stdout: ", out)
+            return
+
+        for job in jobs:
+            job.jobid = jobid
+            job.meta["jobid"] = jobid
+            job.record_request()
+            job.meta["status"] = 'PENDING'
+            job.save_meta()
+
+    def smart_submit(self, dry_run=False, silent=False,
+                     out_extension='out',
+                     success_string="Have a nice day.",
+                     success_fct=None,
+                     ignore_meta=False,
+                     use_CCParser=True):
+        """ Submit all unsuccessful jobs as one bundle.
+
+        Parameters
+        ----------
+        dry_run : bool
+            Whether to perform a dry-run job submission (default: False).
+        silent : bool
+            Whether to print additional information (default: False).
+        out_extension : str
+            File extension of output file (default: 'out').
+        success_string : str
+            String to match in output regarding successful job completion
+            (default: 'Have a nice day.').
+        success_fct : function(path_to_output)
+            Function object for custom parsing (default: None). Has to take
+            output path as an input and has to return a boolean.
+        ignore_meta : bool
+            Ignore existing meta file (default: False). Effectively overwrites
+            old meta with new one.
+        use_CCParser : bool
+            Use CCParser module if possible (defautl: True).
+        """
+        successful = self.is_successful(out_extension=out_extension,
+                                        success_string=success_string,
+                                        success_fct=success_fct,
+                                        ignore_meta=ignore_meta,
+                                        use_CCParser=use_CCParser)
+        # neither finished nor still active
+        todo = [job for job, ok in zip(self.jobs, successful)
+                if not ok and job.meta["status"] != 'PENDING']
+        if len(todo) > 0:
+            self.submit(jobs=todo, dry_run=dry_run, silent=silent)
+        elif not silent:
+            print(f"All good. Skipping bundle in {self.root}/")
+
+
+def smart_submit_all(jobs, max_workers=8, dry_run=False, silent=False,
+                     out_extension='out',
+                     success_string="Have a nice day.",
+                     success_fct=None,
+                     ignore_meta=False,
+                     use_CCParser=True):
+    """ Safe-submit many jobs concurrently.
+
+    Meta files and outputs are checked and jobs are submitted by a pool of
+    worker threads. The queue is asked only once for the status of all
+    unfinished jobs (see ``JobSet``).
+
+    Parameters
+    ----------
+    jobs : iterable of ccjob.Job
+        Job objects.
+    max_workers : int
+        Maximum number of worker threads (default: 8).
+    dry_run : bool
+        Whether to perform a dry-run job submission (default: False).
+    silent : bool
+        Whether to print additional information (default: False).
+    out_extension : str
+        File extension of output file (default: 'out').
+    success_string : str
+        String to match in output regarding successful job completion
+        (default: 'Have a nice day.').
+    success_fct : function(path_to_output)
+        Function object for custom parsing (default: None). Has to take
+        output path as an input and has to return a boolean.
+    ignore_meta : bool
+        Ignore existing meta file (default: False). Effectively overwrites
+        old meta with new one.
+    use_CCParser : bool
+        Use CCParser module if possible (defautl: True).
+
+    Returns
+    -------
+    summary : dict
+        Lists of jobs which were 'submitted', 'skipped' (finished or still
+        active) or 'failed' (exception raised or no job ID obtained).
+    """
+    import concurrent.futures
+
+    jobs = list(jobs)
+    summary = {"submitted": [], "skipped": [], "failed": []}
+    with concurrent.futures.ThreadPoolExecutor(max_workers) as pool:
+        finished = list(pool.map(
+            lambda job: job.is_finished(ignore_meta=ignore_meta), jobs))
+        todo = [job for job, fin in zip(jobs, finished) if not fin]
+        summary["skipped"].extend(job for job, fin in zip(jobs, finished)
+                                  if fin)
+        status = JobSet(todo).get_status()
+
+        futures = {}
+        for job in todo:
+            # meta was checked above already
+            f = pool.submit(job.smart_submit, dry_run=dry_run, silent=silent,
+                            out_extension=out_extension,
+                            success_string=success_string,
+                            success_fct=success_fct,
+                            ignore_meta=True,
+                            use_CCParser=use_CCParser,
+                            q_status=status.get(str(job.jobid), ""))
+            futures[f] = job
+
+        for f in concurrent.futures.as_completed(futures):
+            job = futures[f]
+            try:
+                submitted = f.result()
+            except Exception as error:
+                print(f"!! Submission failed in {job.meta['wdir']}/: {error}")
+                summary["failed"].append(job)
+                continue
+            if not submitted:
+                summary["skipped"].append(job)
+            elif job.jobid == None and not dry_run:
+                summary["failed"].append(job)
+            else:
+                summary["submitted"].append(job)
+
+    if not silent:
+        print("-- submitted: {0}, skipped: {1}, failed: {2}".format(
+              *[len(summary[k]) for k in ("submitted", "skipped", "failed")]))
+    return summary
@@ -0,0 +1,292 @@
+import re
+import threading
+from ccjob.utils import module_exists
+
+_spec = re.compile(r"%(-?)(\d+)(?:\.(\d+))?([sf])")
+
+
+class BlockFormatter(object):
+    """ Fast fixed-width formatting of columns into lines of text.
+
+    The row format is given in printf style with fixed widths, e.g.
+    '%-2s%20.10f%16.10f%16.10f' for atom lines. With numpy, all rows are
+    formatted at once: the digits of every float column are computed with
+    array arithmetic and written directly into a byte buffer, which is
+    reused by later calls in the same thread. Values whose last digit
+    cannot be decided safely this way are formatted with Python, so the
+    text is the same as with ``row_format % values``. Without numpy, or if
+    any value does not fit into its column, the whole block is formatted
+    with one ``%`` operation.
+
+    Parameters
+    ----------
+    row_format : str
+        Format of one line, made of '%[-]<width>s' and
+        '%<width>.<precision>f' fields.
+    """
+
+    def __init__(self, row_format):
+        self.row_format = row_format
+        self.fields = []
+        pos = 0
+        for mo in _spec.finditer(row_format):
+            if mo.start() != pos:
+                raise ValueError(f"Invalid row format '{row_format}': only "
+                                 "fixed-width fields are supported!")
+            left, width, precision, kind = mo.groups()
+            if kind == "f" and (precision is None or left):
+                raise ValueError(f"Invalid row format '{row_format}': float "
+                                 "fields need a precision!")
+            self.fields.append((kind, int(width), int(precision or 0),
+                                bool(left)))
+            pos = mo.end()
+        if pos != len(row_format) or len(self.fields) == 0:
+            raise ValueError(f"Invalid row format '{row_format}'!")
+        #: bytes per line (including newline)
+        self.line_length = sum(f[1] for f in self.fields) + 1
+        # one buffer per thread, as the module level formatters are shared
+        self._local = threading.local()
+
+    def __repr__(self):
+        return f"BlockFormatter('{self.row_format}')"
+
+    def format_slow(self, columns):
+        """ Format columns with one ``%`` operation (no numpy needed). """
+        nrows = len(columns[0])
+        if nrows == 0:
+            return ""
+        values = [None] * (nrows * len(columns))
+        for i, column in enumerate(columns):
+            values[i::len(columns)] = list(column)
+        return "\n".join([self.row_format] * nrows) % tuple(values)
+
+    def format(self, *columns):
+        """ Format columns into lines.
+
+        Parameters
+        ----------
+        *columns : sequences or numpy arrays
+            One sequence per field of the row format, all of the same
+            length.
+
+        Returns
+        -------
+        text : str
+            One line per row (no trailing newline).
+        """
+        if len(columns) != len(self.fields):
+            raise ValueError(f"{len(self.fields)} columns required, "
+                             f"{len(columns)} given!")
+        if len({len(c) for c in columns}) > 1:
+            raise ValueError("All columns need the same length!")
+        if len(columns[0]) == 0:
+            return ""
+        if not module_exists("numpy"):
+            return self.format_slow(columns)
+        text = self._format_numpy(columns)
+        if text is None:
+            return self.format_slow([c.tolist() if hasattr(c, "tolist")
+                                     else c for c in columns])
+        return text
+
+    def _get_buffer(self, nrows):
+        import numpy as np
+
+        size = nrows * self.line_length
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is None or len(buffer) < size:
+            buffer = self._local.buffer = np.empty(size, dtype=np.uint8)
+        buf = buffer[:size].reshape(nrows, self.line_length)
+        buf.fill(ord(" "))
+        buf[:, -1] = ord("\n")
+        return buf
+
+    def _format_numpy(self, columns):
+        """ Vectorized formatting, None if a value does not fit. """
+        import numpy as np
+
+        nrows = len(columns[0])
+        prepared = []
+        for (kind, width, precision, left), column in zip(self.fields,
+                                                          columns):
+            if kind == "s":
+                column = np.asarray(column, dtype=str)
+                if column.dtype.itemsize // 4 > width:
+                    return None
+                prepared.append(column)
+                continue
+            x = np.asarray(column, dtype=float)
+            if not np.all(np.isfinite(x)):
+                return None
+            # digits before the decimal point (and sign) have to fit, also
+            # if rounding carries over
+            room = width - precision - (1 if precision > 0 else 0)
+            if room < 2 or precision > 15 or \
+                    np.any(np.abs(x) >= 10.0**(room - 1) - 1):
+                return None
+            prepared.append(x)
+
+        buf = self._get_buffer(nrows)
+        start = 0
+        for (kind, width, precision, left), x in zip(self.fields, prepared):
+            end = start + width
+            if kind == "s":
+                encoded = np.char.encode(x, "ascii")
+                raw = np.frombuffer(encoded.tobytes(), dtype=np.uint8)
+                raw = raw.reshape(nrows, encoded.dtype.itemsize)
+                lengths = np.char.str_len(x)
+                cols = np.arange(raw.shape[1])
+                if left:
+                    target = start + cols
+                    valid = cols[None, :] < lengths[:, None]
+                else:
+                    target = end - lengths[:, None] + cols[None, :]
+                    valid = cols[None, :] < lengths[:, None]
+                rows = np.broadcast_to(np.arange(nrows)[:, None], raw.shape)
+                target = np.broadcast_to(target, raw.shape)
+                buf[rows[valid], target[valid]] = raw[valid]
+                start = end
+                continue
+            self._write_float(buf, x, start, end, precision)
+            start = end
+        return buf.tobytes()[:-1].decode("ascii")
+
+    def _write_float(self, buf, x, start, end, precision):
+        import numpy as np
+
+        nrows = len(x)
+        negative = np.signbit(x)
+        ipart = np.floor(np.abs(x))
+        scaled = (np.abs(x) - ipart) * 10.0**precision
+        frac = np.rint(scaled)
+        # the last digit of values close to a tie is decided by Python
+        tolerance = 4 * np.spacing(10.0**precision)
+        doubtful = np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5)
+                                  <= tolerance)
+        carry = frac >= 10.0**precision
+        frac[carry] = 0
+        ipart[carry] += 1
+        ipart = ipart.astype(np.int64)
+        frac = frac.astype(np.int64)
+
+        pos = end - 1
+        for _ in range(precision):
+            frac, digit = np.divmod(frac, 10)
+            buf[:, pos] = ord("0") + digit
+            pos -= 1
+        if precision > 0:
+            buf[:, pos] = ord(".")
+            pos -= 1
+
+        ndigits = np.ones(nrows, dtype=np.int64)
+        rest = ipart // 10
+        while np.any(rest > 0):
+            ndigits += rest > 0
+            rest //= 10
+        rows = np.arange(nrows)
+        for k in range(int(ndigits.max())):
+            ipart, digit = np.divmod(ipart, 10)
+            active = rows[k < ndigits]
+            buf[active, pos - k] = ord("0") + digit[active]
+        signed = rows[negative]
+        buf[signed, pos - ndigits[signed]] = ord("-")
+
+        if len(doubtful) > 0:
+            spec = "%{0}.{1}f".format(end - start, precision)
+            for row in doubtful:
+                text = (spec % x[row]).encode("ascii")
+                buf[row, start:end] = np.frombuffer(text, dtype=np.uint8)
+
+
+# atom lines ('frag_a', 'frag_b', 'xyz')
+xyz_formatter = BlockFormatter("%-2s%20.10f%16.10f%16.10f")
+# point charge lines ('point_charges')
+point_charge_formatter = BlockFormatter("%16.10f%16.10f%16.10f%10.4f")
+
+
+def _coordinate_columns(coords):
+    if hasattr(coords, "shape"):
+        return [coords[:, 0], coords[:, 1], coords[:, 2]]
+    coords = list(coords)
+    return [[c[i] for c in coords] for i in range(3)]
+
+
+def format_xyz(symbols, coords):
+    """ Atom lines (symbol and coordinates) as used by the templates.
+
+    Parameters
+    ----------
+    symbols : sequence of str
+        Element symbols.
+    coords : array_like
+        Cartesian coordinates, shape (N, 3).
+
+    Returns
+    -------
+    text : str
+        One line per atom.
+    """
+    return xyz_formatter.format(symbols, *_coordinate_columns(coords))
+
+
+def format_point_charges(coords, charges):
+    """ Point charge lines (coordinates and charge) as used by the
+    templates.
+
+    Parameters
+    ----------
+    coords : array_like
+        Cartesian coordinates, shape (N, 3).
+    charges : sequence of float
+        Charges.
+
+    Returns
+    -------
+    text : str
+        One line per point charge.
+    """
+    return point_charge_formatter.format(*_coordinate_columns(coords),
+                                         charges)
+
+
+class Block(object):
+    """ Text block which is formatted only when a template is rendered.
+
+    Blocks can be passed as template parameters (e.g. ``xyz`` or
+    ``point_charges``) to ``Input.from_template``, ``generate_inputs`` or
+    ``stream_inputs`` instead of preformatted strings.
+
+    Parameters
+    ----------
+    formatter : BlockFormatter
+        Formatter of the block.
+    *columns : sequences or numpy arrays
+        Columns of the block.
+    """
+
+    def __init__(self, formatter, *columns):
+        self.formatter = formatter
+        self.columns = columns
+        self._text = None
+
+    @classmethod
+    def xyz(cls, symbols, coords):
+        """ Block of atom lines (see ``format_xyz``). """
+        return cls(xyz_formatter, symbols, *_coordinate_columns(coords))
+
+    @classmethod
+    def point_charges(cls, coords, charges):
+        """ Block of point charge lines (see ``format_point_charges``). """
+        return cls(point_charge_formatter, *_coordinate_columns(coords),
+                   charges)
+
+    def __str__(self):
+        if self._text is None:
+            self._text = self.formatter.format(*self.columns)
+        return self._text
+
+    def __format__(self, format_spec):
+        return format(str(self), format_spec)
+
+    def __len__(self):
+        return len(self.columns[0])
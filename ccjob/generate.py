@@ -0,0 +1,119 @@
+import os
+import itertools
+import string
+import concurrent.futures
+from ccjob.ccjob import Input
+from ccjob.registry import CompiledTemplate, registry
+
+
+def expand_grid(grid, mode="product"):
+    """ Expand a parameter grid into a list of parameter sets.
+
+    Parameters
+    ----------
+    grid : dict
+        Mapping of template field to a list of values. A dictionary may be
+        given instead of a list to attach a label to each value (e.g. the
+        name of a geometry), which is then used in path patterns.
+    mode : str
+        Either 'product' (Cartesian product of all values) or 'zip' (n-th
+        values of all fields belong together) (default: 'product').
+
+    Returns
+    -------
+    points : list of tuple
+        List of (params, labels) pairs. ``labels`` holds the label of every
+        value (the value itself if no label was given).
+    """
+    keys = list(grid)
+    axes = []
+    for key in keys:
+        values = grid[key]
+        if isinstance(values, dict):
+            axes.append(list(values.items()))
+        else:
+            axes.append([(v, v) for v in values])
+
+    if mode == "product":
+        combinations = itertools.product(*axes)
+    elif mode == "zip":
+        if len({len(axis) for axis in axes}) > 1:
+            raise ValueError("All grid axes need the same length for 'zip'!")
+        combinations = zip(*axes)
+    else:
+        raise ValueError("Invalid grid mode! Use either 'product' or 'zip'.")
+
+    points = []
+    for combination in combinations:
+        labels = {k: label for k, (label, _) in zip(keys, combination)}
+        params = {k: value for k, (_, value) in zip(keys, combination)}
+        points.append((params, labels))
+    return points
+
+
+def generate_inputs(template, grid, path_pattern, defaults=None,
+                    mode="product", max_workers=8, to_file=True,
+                    silent=False):
+    """ Generate inputs for every point of a parameter grid.
+
+    All inputs are rendered first, then all directories are created in one
+    pass and the files are written by a pool of worker threads. Files whose
+    content did not change are not rewritten.
+
+    Parameters
+    ----------
+    template : str, string.Template or ccjob.registry.CompiledTemplate
+        Template of input file. Strings are looked up in
+        ``ccjob.registry.registry``.
+    grid : dict
+        Parameter grid (see ``expand_grid``).
+    path_pattern : str
+        Pattern of input paths in ``str.format`` syntax. Available fields are
+        the grid keys (replaced by their labels) and ``index``, e.g.
+        '{basis}/{xyz}/input_{index}.in'.
+    defaults : dict
+        Default values for template fields (default: None, i.e.
+        ``ccjob.templates.defaults``).
+    mode : str
+        Either 'product' or 'zip' (default: 'product').
+    max_workers : int
+        Maximum number of worker threads writing files (default: 8).
+    to_file : bool
+        Whether to write the input files (default: True).
+    silent : bool
+        Whether to print additional information (default: False).
+
+    Returns
+    -------
+    inputs : list of ccjob.Input
+        Input objects in grid order.
+    """
+    if isinstance(template, str):
+        template = registry[template]
+    elif isinstance(template, string.Template):
+        template = CompiledTemplate(template)
+    if defaults is None:
+        from ccjob.templates import defaults
+
+    points = expand_grid(grid, mode=mode)
+    if len(points) == 0:
+        return []
+    # all points share the same keys
+    template.validate(defaults, **points[0][0])
+
+    inputs = []
+    for index, (params, labels) in enumerate(points):
+        fpath = path_pattern.format(index=index, **labels)
+        inp_string = template.render(defaults, **params)
+        inputs.append(Input(fpath, inp_string=inp_string, to_file=False))
+
+    if to_file:
+        for wdir in {inp.wdir for inp in inputs}:
+            os.makedirs(wdir, exist_ok=True)
+        with concurrent.futures.ThreadPoolExecutor(max_workers) as pool:
+            written = sum(pool.map(lambda inp: inp.save_input(silent=True),
+                                   inputs))
+        if not silent:
+            print(f"-- {written} input files written, "
+                  f"{len(inputs) - written} unchanged.")
+    return inputs
@@ -0,0 +1,328 @@
+import itertools
+from ccjob.utils import module_exists
+from ccjob.formatting import format_xyz, format_point_charges
+
+
+class CellList(object):
+    """ Spatial index of atoms sorted into cubic cells.
+
+    All atoms within a radius of some points are found by only looking at
+    the neighbouring cells of every point, so a query does not depend on
+    the total number of atoms. Requires numpy.
+
+    Parameters
+    ----------
+    coords : array_like
+        Cartesian coordinates, shape (N, 3).
+    cell_size : float
+        Edge length of the cells, ideally the largest query radius.
+    """
+
+    def __init__(self, coords, cell_size):
+        import numpy as np
+
+        self.coords = np.asarray(coords, dtype=float).reshape(-1, 3)
+        self.cell_size = float(cell_size)
+        if self.cell_size <= 0:
+            raise ValueError("Cell size has to be positive!")
+        self.origin = self.coords.min(axis=0) if len(self.coords) > 0 \
+                      else np.zeros(3)
+        cells = self.cells(self.coords)
+        self.shape = cells.max(axis=0) + 1 if len(cells) > 0 \
+                     else np.ones(3, dtype=int)
+        keys = self.keys(cells)
+        #: atom indices sorted by cell
+        self.order = np.argsort(keys, kind="stable")
+        self.sorted_keys = keys[self.order]
+
+    def cells(self, points):
+        import numpy as np
+
+        return np.floor((points - self.origin) / self.cell_size).astype(int)
+
+    def keys(self, cells):
+        return (cells[:, 0] * self.shape[1] + cells[:, 1]) * self.shape[2] \
+               + cells[:, 2]
+
+    def query(self, points, radius):
+        """ Atoms within a radius of any of the points.
+
+        Parameters
+        ----------
+        points : array_like
+            Cartesian coordinates, shape (M, 3).
+        radius : float
+            Distance cutoff.
+
+        Returns
+        -------
+        indices : numpy.ndarray
+            Sorted indices of atoms.
+        """
+        import numpy as np
+
+        points = np.asarray(points, dtype=float).reshape(-1, 3)
+        if len(points) == 0 or len(self.coords) == 0:
+            return np.zeros(0, dtype=int)
+        reach = int(np.ceil(radius / self.cell_size))
+        home = self.cells(points)
+        hits = []
+        for offset in itertools.product(range(-reach, reach + 1), repeat=3):
+            cells = home + offset
+            valid = np.all((cells >= 0) & (cells < self.shape), axis=1)
+            if not np.any(valid):
+                continue
+            keys = self.keys(cells[valid])
+            lo = np.searchsorted(self.sorted_keys, keys, side="left")
+            hi = np.searchsorted(self.sorted_keys, keys, side="right")
+            counts = hi - lo
+            total = counts.sum()
+            if total == 0:
+                continue
+            # flatten the ranges [lo, hi) of all points
+            owner = np.repeat(np.flatnonzero(valid), counts)
+            position = np.arange(total) - np.repeat(np.cumsum(counts)
+                                                    - counts, counts)
+            candidates = self.order[np.repeat(lo, counts) + position]
+            d2 = np.sum((self.coords[candidates] - points[owner])**2, axis=1)
+            hits.append(candidates[d2 <= radius**2])
+        if len(hits) == 0:
+            return np.zeros(0, dtype=int)
+        return np.unique(np.concatenate(hits))
+
+
+class Geometry(object):
+    """ Atomic coordinates held as arrays for selecting embedding regions.
+
+    The QM fragment, the environment fragment and the point-charge shell
+    are selected by distance cutoffs with a spatial index (scipy's KD-tree
+    if available, otherwise ``CellList``), so large solvent boxes are
+    handled without loops over atoms. If molecule labels are given, whole
+    molecules are selected. Requires numpy.
+
+    Parameters
+    ----------
+    symbols : sequence of str
+        Element symbols.
+    coords : array_like
+        Cartesian coordinates in Angstrom, shape (N, 3).
+    molecules : array_like
+        Molecule label of every atom (default: None, i.e. atoms are
+        selected individually).
+    """
+
+    def __init__(self, symbols, coords, molecules=None):
+        if not module_exists("numpy"):
+            raise ImportError("ccjob.geometry requires numpy!")
+        import numpy as np
+
+        self.symbols = np.asarray(symbols, dtype=str)
+        self.coords = np.asarray(coords, dtype=float).reshape(-1, 3)
+        if len(self.symbols) != len(self.coords):
+            raise ValueError("Number of symbols and coordinates differ!")
+        self.molecules = None
+        if molecules is not None:
+            self.molecules = np.asarray(molecules)
+            if len(self.molecules) != len(self.coords):
+                raise ValueError("Number of molecule labels and atoms "
+                                 "differ!")
+        self._index = None
+
+    def __len__(self):
+        return len(self.coords)
+
+    @classmethod
+    def from_xyz(cls, xyz, molecules=None):
+        """ Alternative constructor reading atom lines ('C x y z').
+
+        Parameters
+        ----------
+        xyz : str
+            Atom lines, e.g. ``frame["xyz"]`` of
+            ``ccjob.trajectory.read_xyz_frames`` or ``ccjob.templates.A``.
+        molecules : array_like
+            Molecule label of every atom (default: None).
+        """
+        fields = [line.split()[:4] for line in xyz.splitlines()
+                  if len(line.strip()) > 0]
+        symbols = [f[0] for f in fields]
+        coords = [[float(x) for x in f[1:4]] for f in fields]
+        return cls(symbols, coords, molecules=molecules)
+
+    def index(self, cell_size, use_kdtree=None):
+        """ Spatial index of all atoms (built once and reused). """
+        if use_kdtree is None:
+            use_kdtree = module_exists("scipy")
+        cached = self._index
+        if cached is not None and cached[0] == use_kdtree and \
+                (use_kdtree or cached[1].cell_size >= cell_size):
+            return cached[1]
+        if use_kdtree:
+            from scipy.spatial import cKDTree
+            index = cKDTree(self.coords)
+        else:
+            index = CellList(self.coords, cell_size)
+        self._index = (use_kdtree, index)
+        return index
+
+    def within(self, atoms, radius, use_kdtree=None):
+        """ Atoms within a distance of any atom of a selection.
+
+        Parameters
+        ----------
+        atoms : array_like
+            Indices of the selected atoms.
+        radius : float
+            Distance cutoff in Angstrom.
+        use_kdtree : bool
+            Use scipy's KD-tree instead of the cell list (default: None,
+            i.e. if scipy is available).
+
+        Returns
+        -------
+        indices : numpy.ndarray
+            Sorted indices of atoms (including the selection itself).
+        """
+        import numpy as np
+
+        points = self.coords[np.asarray(atoms, dtype=int)]
+        index = self.index(radius, use_kdtree=use_kdtree)
+        if isinstance(index, CellList):
+            return index.query(points, radius)
+        found = index.query_ball_point(points, radius)
+        if len(found) == 0:
+            return np.zeros(0, dtype=int)
+        return np.unique(np.concatenate([np.asarray(f, dtype=int)
+                                         for f in found]))
+
+    def whole(self, atoms):
+        """ Extend a selection to whole molecules.
+
+        Returns
+        -------
+        indices : numpy.ndarray
+            Sorted indices of all atoms of the selected molecules.
+        """
+        import numpy as np
+
+        atoms = np.asarray(atoms, dtype=int)
+        if self.molecules is None:
+            return np.unique(atoms)
+        return np.flatnonzero(np.isin(self.molecules, self.molecules[atoms]))
+
+    def select(self, qm, env_cutoff, pc_cutoff=None, use_kdtree=None):
+        """ Select QM fragment, environment fragment and point-charge shell.
+
+        Parameters
+        ----------
+        qm : array_like
+            Indices of atoms of the QM fragment (A).
+        env_cutoff : float
+            Atoms within this distance of fragment A form the environment
+            fragment (B).
+        pc_cutoff : float
+            Atoms within this distance of fragment A which are not part of
+            A or B are point charges (default: None, i.e. no point
+            charges).
+        use_kdtree : bool
+            Use scipy's KD-tree instead of the cell list (default: None,
+            i.e. if scipy is available).
+
+        Returns
+        -------
+        selection : tuple of numpy.ndarray
+            Indices of fragment A, fragment B and point charges.
+        """
+        import numpy as np
+
+        a = self.whole(qm)
+        # one index for both queries
+        self.index(max(env_cutoff, pc_cutoff or 0), use_kdtree=use_kdtree)
+        b = np.setdiff1d(self.whole(self.within(a, env_cutoff,
+                                                use_kdtree=use_kdtree)), a)
+        pc = np.zeros(0, dtype=int)
+        if pc_cutoff is not None:
+            pc = self.whole(self.within(a, pc_cutoff, use_kdtree=use_kdtree))
+            pc = np.setdiff1d(pc, np.union1d(a, b))
+        return a, b, pc
+
+    def charges(self, table, atoms=None):
+        """ Charges of atoms from a lookup table.
+
+        Parameters
+        ----------
+        table : dict
+            Mapping of element symbol to charge, e.g. TIP3P water
+            ``{"O": -0.834, "H": 0.417}``.
+        atoms : array_like
+            Indices of atoms (default: None, i.e. all atoms).
+
+        Returns
+        -------
+        charges : numpy.ndarray
+            Charge of every atom.
+        """
+        import numpy as np
+
+        symbols = self.symbols if atoms is None \
+                  else self.symbols[np.asarray(atoms, dtype=int)]
+        unique, inverse = np.unique(symbols, return_inverse=True)
+        missing = [s for s in unique if s not in table]
+        if len(missing) > 0:
+            raise KeyError("No charge for elements: " + ", ".join(missing))
+        values = np.array([table[s] for s in unique], dtype=float)
+        return values[inverse]
+
+    def xyz_block(self, atoms=None):
+        """ Atom lines as expected by the templates ('frag_a', 'xyz').
+        """
+        import numpy as np
+
+        atoms = np.arange(len(self)) if atoms is None \
+                else np.asarray(atoms, dtype=int)
+        return format_xyz(self.symbols[atoms], self.coords[atoms])
+
+    def point_charge_block(self, atoms, charges):
+        """ Point charge lines as expected by the templates
+        ('point_charges').
+        """
+        import numpy as np
+
+        atoms = np.asarray(atoms, dtype=int)
+        return format_point_charges(self.coords[atoms], charges)
+
+    def blocks(self, qm, env_cutoff, pc_cutoff=None, charge_table=None,
+               use_kdtree=None):
+        """ Template fields of an embedded QM calculation.
+
+        Parameters
+        ----------
+        qm : array_like
+            Indices of atoms of the QM fragment.
+        env_cutoff : float
+            Cutoff of the environment fragment (see ``select``).
+        pc_cutoff : float
+            Cutoff of the point-charge shell (default: None).
+        charge_table : dict
+            Mapping of element symbol to charge, required for point charges
+            (default: None).
+        use_kdtree : bool
+            Use scipy's KD-tree instead of the cell list (default: None).
+
+        Returns
+        -------
+        fields : dict
+            Values of 'frag_a', 'xyz' (same as 'frag_a'), 'frag_b' and, if
+            ``pc_cutoff`` is given, 'point_charges'.
+        """
+        a, b, pc = self.select(qm, env_cutoff, pc_cutoff=pc_cutoff,
+                               use_kdtree=use_kdtree)
+        frag_a = self.xyz_block(a)
+        fields = {"frag_a": frag_a, "xyz": frag_a,
+                  "frag_b": self.xyz_block(b)}
+        if pc_cutoff is not None:
+            if charge_table is None:
+                raise ValueError("Point charges need a charge table!")
+            fields["point_charges"] = self.point_charge_block(
+                pc, self.charges(charge_table, pc))
+        return fields
@@ -1,12 +1,101 @@
+import os
 import re
+import json
+import time
+import threading
+import contextlib
 import subprocess as sp
+from ccjob.utils import run_async, which, time_to_seconds, memory_to_mb
+from ccjob.utils import seconds_to_time
 
 
 class JobScheduler(object):
-    """ Empty base class for job schedulers."""
+    """ Base class for job schedulers."""
+    # mapping of category ('active', 'finished', ...) to queue states
+    state = {}
+    inv_state = {}
+    # patterns of submission errors which go away if the submission is
+    # retried later (limits, busy controller)
+    transient_errors = ()
+
     def __init__(self):
         pass
 
+    def is_active(self, q_status):
+        """ Whether a queue state means the job is still queued or running.
+        """
+        return self.inv_state.get(q_status) == "active"
+
+    def is_transient(self, stderr):
+        """ Whether a submission error is worth retrying later.
+
+        Parameters
+        ----------
+        stderr : str
+            Standard error of the submission command.
+        """
+        return any(re.search(p, stderr) for p in self.transient_errors)
+
+    def run_command(self, args, cwd=None, stdout=sp.PIPE, stderr=sp.PIPE):
+        """ Execute a scheduler command (e.g. sbatch, sacct).
+
+        Parameters
+        ----------
+        args : list
+            Argument vector (program and arguments).
+        cwd : str
+            Working directory of the command (default: None).
+        stdout, stderr : file object or int
+            Passed on to ``subprocess.run`` (default: subprocess.PIPE).
+
+        Returns
+        -------
+        p : subprocess.CompletedProcess
+            Completed process.
+        """
+        return sp.run(args, cwd=cwd, stdout=stdout, stderr=stderr)
+
+    async def run_command_async(self, args, cwd=None, limiter=None):
+        """ Execute a scheduler command (coroutine).
+
+        Returns
+        -------
+        returncode : int
+            Return code of the command.
+        stdout : bytes
+            Standard output.
+        stderr : bytes
+            Standard error.
+        """
+        return await run_async(args, cwd=cwd, limiter=limiter)
+
+    def split_options(self, args):
+        """ Split arguments into '--key=value' options and command.
+
+        Returns
+        -------
+        options : dict
+            Mapping of option name to value ('' for flags).
+        command : list
+            Remaining arguments (script and its arguments).
+        """
+        options = {}
+        for i, arg in enumerate(args):
+            if not arg.startswith("-"):
+                return options, args[i:]
+            key, _, value = arg.partition("=")
+            options[key] = value
+        return options, []
+
+    def get_status(self, jobid):
+        """ Get status of a single job.
+        """
+        status = self.get_status_many([jobid])
+        if str(jobid) in status:
+            return status[str(jobid)]
+        else:
+            raise IndexError(f"No status found for Job ID {jobid}!")
+
 class SLURM(JobScheduler):
     job_submit = "sbatch"
     job_run = "srun"
@@ -19,17 +108,43 @@ class SLURM(JobScheduler):
                 "jobname"   : "--job-name=$jobname"
                }
 
-    state = {"active": "RUNNING",
-             "finished": "COMPLETE",
-             "failed" : "FAILED",
-             "cancelled" : "CANCELLED",
-             "timeout" : "TIMEOUT"
+    array_template = "--array=$array"
+    # children of failed parents are cancelled instead of being held
+    # forever (reason DependencyNeverSatisfied)
+    dependency_template = ("--dependency=afterok:$jobids "
+                           "--kill-on-invalid-dep=yes")
+    # job step with exclusive CPUs inside an existing allocation
+    step_template = "--jobid=$jobid --exclusive --ntasks=1"
+    # allocation without shell, job steps are started with srun
+    allocation_template = "--no-shell --ntasks=$cpus --cpus-per-task=1"
+
+    transient_errors = (r"QOSMaxSubmitJob", r"MaxSubmitJobs",
+                        r"[Tt]imed? ?out", r"temporarily unable",
+                        r"[Uu]nable to contact slurm controller")
+
+    # jobs in any 'active' state are still known to slurmctld (squeue)
+    state = {"active": ("PENDING", "CONFIGURING", "RUNNING", "COMPLETING",
+                        "REQUEUED", "REQUEUE_FED", "REQUEUE_HOLD",
+                        "RESIZING", "RESV_DEL_HOLD", "SIGNALING",
+                        "SPECIAL_EXIT", "STAGE_OUT", "STOPPED",
+                        "SUSPENDED"),
+             "finished": ("COMPLETED",),
+             "failed" : ("FAILED", "BOOT_FAIL", "NODE_FAIL",
+                         "OUT_OF_MEMORY"),
+             "cancelled" : ("CANCELLED", "PREEMPTED", "REVOKED"),
+             "timeout" : ("TIMEOUT", "DEADLINE")
             }
 
-    inv_state = {v: k for k, v in state.items()}
+    inv_state = {s: k for k, v in state.items() for s in v}
 
-    def __init__(self):
-        pass
+    #: ask squeue for active jobs before falling back to sacct
+    use_squeue = True
+
+    # sacct fields of get_usage_many (MaxRSS is only known for steps)
+    usage_fields = "JobID,State,Elapsed,TotalCPU,MaxRSS"
+
+    def __init__(self, use_squeue=True):
+        self.use_squeue = use_squeue
 
     def parse_jobid_batch(self, submit_string):
         p = r"Submitted batch job\s+(\d+)"
@@ -39,24 +154,282 @@ class SLURM(JobScheduler):
         else:
             raise ValueError("Could not parse job ID!")
 
-    def get_status(self, jobid):
-        """ Get job status from 'sacct'
+    def parse_jobid_allocation(self, salloc_string):
+        p = r"Granted job allocation\s+(\d+)"
+        match = re.search(p, salloc_string)
+        if match:
+            return match.group(1)
+        else:
+            raise ValueError("Could not parse job ID of allocation!")
+
+    def cancel_args(self, jobid):
+        """ Argument vector for cancelling a job. """
+        return [which("scancel"), str(jobid)]
+
+    def get_status_many(self, jobids, chunksize=500):
+        """ Get status of many jobs with as few queries as possible.
+
+        All active jobs of the user are obtained from slurmctld with a single
+        'squeue' call. Only jobs missing from its output (i.e. jobs which
+        left the queue) are looked up with 'sacct', which goes through the
+        much slower accounting database.
+
+        Parameters
+        ----------
+        jobids : iterable
+            Job IDs to be queried.
+        chunksize : int
+            Maximum number of job IDs per 'sacct' call (default: 500).
+
+        Returns
+        -------
+        status : dict
+            Mapping of job ID to state. Job IDs unknown to the queue are
+            missing from the dictionary.
         """
-        sacct = f"sacct -j {jobid}"
-        p = sp.run(sacct, stdout=sp.PIPE, stderr=sp.PIPE, shell=True)
-        out = p.stdout.decode("utf-8")
+        return self.get_status_usage_many(jobids, chunksize=chunksize,
+                                          fields="JobID,State")[0]
 
-        # process string
-        lines = out.split('\n')
-        istatus = lines[0].split().index("State")
-        if len(lines) > 2:
-            return lines[2].split()[istatus]
-        else:
-            raise IndexError(f"No status found for Job ID {jobid}!")
+    def get_status_usage_many(self, jobids, chunksize=500, fields=None):
+        """ Get status of many jobs and the usage of jobs which left the
+        queue.
+
+        Same queries as ``get_status_many``, but the 'sacct' calls also ask
+        for the fields of ``get_usage_many``, so no second accounting query
+        is needed.
+
+        Parameters
+        ----------
+        jobids : iterable
+            Job IDs to be queried.
+        chunksize : int
+            Maximum number of job IDs per 'sacct' call (default: 500).
+        fields : str
+            Fields of the 'sacct' calls (default: None, i.e.
+            ``usage_fields``).
+
+        Returns
+        -------
+        status : dict
+            Mapping of job ID to state.
+        usage : dict
+            Mapping of job ID to usage (see ``get_usage_many``) for all jobs
+            found by 'sacct'.
+        """
+        fields = self.usage_fields if fields is None else fields
+        ids = {str(j) for j in jobids if j is not None}
+        status, usage = {}, {}
+        if self.use_squeue and len(ids) > 0:
+            status = self.active_status(ids, self.get_active())
+        for args in self.status_args(ids - set(status), chunksize=chunksize,
+                                     fields=fields):
+            p = self.run_command(args)
+            out = p.stdout.decode("utf-8")
+            status.update(self.parse_status_many(out))
+            if fields == self.usage_fields:
+                usage.update(self.parse_usage_many(out))
+        return status, usage
+
+    async def get_status_many_async(self, jobids, chunksize=500,
+                                    limiter=None):
+        """ Get status of many jobs from 'sacct' (coroutine).
+
+        Same as ``get_status_many``, but all chunks are queried concurrently.
+
+        Parameters
+        ----------
+        jobids : iterable
+            Job IDs to be queried.
+        chunksize : int
+            Maximum number of job IDs per 'sacct' call (default: 500).
+        limiter : asyncio.Semaphore
+            Limits the number of concurrent subprocesses (default: None).
+
+        Returns
+        -------
+        status : dict
+            Mapping of job ID to state.
+        """
+        import asyncio
+
+        ids = {str(j) for j in jobids if j is not None}
+        status = {}
+        if self.use_squeue and len(ids) > 0:
+            try:
+                returncode, stdout, _ = await self.run_command_async(
+                    self.active_args(), limiter=limiter)
+            except OSError:
+                self.use_squeue = False
+                returncode = 1
+            active = None
+            if returncode == 0:
+                active = self.parse_active(stdout.decode("utf-8"))
+            status = self.active_status(ids, active)
+
+        results = await asyncio.gather(*[
+            self.run_command_async(args, limiter=limiter)
+            for args in self.status_args(ids - set(status),
+                                         chunksize=chunksize)])
+        for _, stdout, _ in results:
+            status.update(self.parse_status_many(stdout.decode("utf-8")))
+        return status
+
+    def active_args(self):
+        """ Argument vector of the 'squeue' call for all active jobs. """
+        return [which("squeue"), "--me", "-h", "-o", "%i %T"]
+
+    def get_active(self):
+        """ Get status of all active jobs of the user with one 'squeue' call.
+
+        Returns
+        -------
+        active : dict or None
+            Mapping of job ID to state or None if 'squeue' failed.
+        """
+        try:
+            p = self.run_command(self.active_args())
+        except OSError:
+            # no squeue on this machine, only use sacct from now on
+            self.use_squeue = False
+            return None
+        if p.returncode != 0:
+            return None
+        return self.parse_active(p.stdout.decode("utf-8"))
+
+    def parse_active(self, squeue_string):
+        """ Parse output of 'squeue -h -o "%i %T"'.
+
+        Pending array tasks which are listed as a range ('123_[4-6%2]') are
+        expanded to one entry per task.
+        """
+        active = {}
+        for line in squeue_string.splitlines():
+            fields = line.split()
+            if len(fields) < 2:
+                continue
+            for jobid in self.expand_array_jobid(fields[0]):
+                active[jobid] = fields[1]
+        return active
+
+    def active_status(self, ids, active):
+        """ States of the requested jobs which are found in ``active``.
+
+        Only jobs in an active state are taken, anything else (e.g. a job
+        shown as COMPLETED for a few minutes) is left to 'sacct'.
+        """
+        if active is None:
+            return {}
+        return {jobid: active[jobid] for jobid in ids
+                if jobid in active and self.is_active(active[jobid])}
+
+    def status_args(self, jobids, chunksize=500, fields="JobID,State"):
+        """ Argument vectors of 'sacct' calls for many jobs.
+
+        Returns
+        -------
+        args : list of list
+            One argument vector per chunk of job IDs.
+        """
+        ids = sorted({str(j) for j in jobids if j is not None})
+        return [[which("sacct"), "-j", ",".join(ids[i:i+chunksize]),
+                 "--parsable2",
+                 "--noheader", "--format=" + fields]
+                for i in range(0, len(ids), chunksize)]
+
+    def get_usage_many(self, jobids, chunksize=500):
+        """ Get state and resource usage of finished jobs from 'sacct'.
+
+        Parameters
+        ----------
+        jobids : iterable
+            Job IDs to be queried.
+        chunksize : int
+            Maximum number of job IDs per 'sacct' call (default: 500).
+
+        Returns
+        -------
+        usage : dict
+            Mapping of job ID to a dictionary with the keys 'q_state',
+            'elapsed' and 'total_cpu' (seconds) and 'max_rss' (MB). Empty
+            if 'sacct' is not available.
+        """
+        usage = {}
+        for args in self.status_args(jobids, chunksize=chunksize,
+                                     fields=self.usage_fields):
+            try:
+                p = self.run_command(args)
+            except OSError:
+                return {}
+            usage.update(self.parse_usage_many(p.stdout.decode("utf-8")))
+        return usage
+
+    def parse_usage_many(self, sacct_string):
+        """ Parse output of 'sacct --parsable2 --format=<usage_fields>'.
+
+        State, Elapsed and TotalCPU are taken from the line of the job
+        itself, MaxRSS is the maximum over all its steps.
+        """
+        usage = {}
+        for line in sacct_string.splitlines():
+            fields = line.strip().split("|")
+            if len(fields) < 5 or fields[0] == "JobID":
+                continue
+            jobid, state, elapsed, total_cpu, max_rss = fields[:5]
+            step = "." in jobid
+            for taskid in self.expand_array_jobid(jobid.split(".")[0]):
+                entry = usage.setdefault(taskid, {"max_rss": 0.0})
+                if not step and len(state.split()) > 0:
+                    entry["q_state"] = state.split()[0]
+                    entry["elapsed"] = time_to_seconds(elapsed or 0)
+                    entry["total_cpu"] = time_to_seconds(total_cpu or 0)
+                if max_rss != "":
+                    entry["max_rss"] = max(entry["max_rss"],
+                                           memory_to_mb(max_rss))
+        return {k: v for k, v in usage.items() if "q_state" in v}
+
+    def parse_status_many(self, sacct_string):
+        """ Parse output of 'sacct --parsable2 --format=JobID,State[,...]'.
+
+        Job steps (e.g. '123.batch') are skipped and only the first word
+        of the state is kept ('CANCELLED by 1000' -> 'CANCELLED'). Pending
+        array tasks which are listed as a range ('123_[4-6%2]') are expanded
+        to one entry per task.
+        """
+        status = {}
+        for line in sacct_string.splitlines():
+            fields = line.strip().split("|")
+            if len(fields) < 2 or "." in fields[0] or fields[0] == "JobID":
+                continue
+            state = fields[1].split()
+            if len(state) == 0:
+                continue
+            for jobid in self.expand_array_jobid(fields[0]):
+                status[jobid] = state[0]
+        return status
+
+    def expand_array_jobid(self, jobid):
+        """ Expand array job ID ranges, e.g. '123_[1,3-4]' -> '123_1', ...
+        """
+        match = re.match(r"(\d+)_\[([^\]]+)\]$", jobid)
+        if not match:
+            return [jobid]
+        base, ranges = match.groups()
+        # strip throttle ('%N')
+        ranges = ranges.split("%")[0]
+        expanded = []
+        for r in ranges.split(","):
+            if "-" in r:
+                first, last = r.split("-")
+                expanded.extend(f"{base}_{i}" for i in
+                                range(int(first), int(last) + 1))
+            else:
+                expanded.append(f"{base}_{r}")
+        return expanded
 
     def tformat(self, days=0, hours=0, minutes=0):
         if any([days < 0, hours < 0, minutes < 0]):
-            raise ValueError("Only non-negative integers allowed for time format!")
+            raise ValueError("Only non-negative integers allowed for time "
+                             "format!")
         if all([days == 0, hours == 0, minutes == 0]):
             minutes = str(15)
         if days > 0:
@@ -79,10 +452,697 @@ class PBS(JobScheduler):
                 "jobname"   : "-N $jobname"
                }
 
+    dependency_template = "-W depend=afterok:$jobids"
+
+    transient_errors = (r"[Mm]aximum number of jobs", r"would exceed",
+                        r"[Cc]annot connect to server", r"[Tt]imed? ?out")
+
+    def cancel_args(self, jobid):
+        """ Argument vector for cancelling a job. """
+        return [which("qdel"), str(jobid)]
+
+class FakeSLURM(SLURM):
+    """ In-process emulation of SLURM for testing and benchmarking.
+
+    Calls of sbatch, salloc, scancel, squeue, sacct and srun are
+    intercepted and answered like the real commands would, so the whole
+    submission and status machinery of ccjob can be exercised without a
+    cluster. Submitted scripts are run locally by a pool of worker threads
+    (one subprocess each) with the usual SLURM environment variables; their
+    output goes to 'slurm-<jobid>.out' in the submission folder. Jobs go
+    through the states PENDING, RUNNING and COMPLETED (or FAILED). Jobs
+    submitted with '--dependency=afterok:<ids>' wait for their parents. If
+    any parent does not complete, they stay PENDING like with real SLURM,
+    unless '--kill-on-invalid-dep=yes' was given, then they are CANCELLED.
+
+    Only long options of the form '--key=value' are understood. All jobs
+    created with ``queue="fake-slurm"`` share one instance with default
+    settings.
+
+    Parameters
+    ----------
+    max_workers : int
+        Number of jobs running at the same time (default: 4).
+    execute : bool
+        Whether to actually run the job scripts (default: True). Otherwise
+        every job only sleeps for ``runtime`` seconds.
+    runtime : float
+        Duration of jobs which are not executed (default: 0).
+    submit_latency : float
+        Seconds every sbatch call takes (default: 0).
+    status_latency : float
+        Seconds every sacct call takes (default: 0).
+    failure_rate : float
+        Probability that a job fails regardless of its script (default: 0).
+    submit_failure_rate : float
+        Probability that sbatch rejects a submission with a transient
+        error (socket timeout) (default: 0).
+    max_submit_jobs : int
+        Maximum number of jobs in the queue (PENDING or RUNNING), further
+        submissions are rejected like with the 'MaxSubmitJobs' limit of
+        SLURM (default: None, i.e. no limit).
+    max_rss : float
+        Memory in MB reported by sacct as MaxRSS of every job (default: 0).
+    seed : int
+        Seed of the random number generator (default: None).
+    """
+    first_jobid = 1000
+
+    def __init__(self, max_workers=4, execute=True, runtime=0.0,
+                 submit_latency=0.0, status_latency=0.0, failure_rate=0.0,
+                 submit_failure_rate=0.0, max_submit_jobs=None, max_rss=0.0,
+                 seed=None):
+        import concurrent.futures
+        import random
+        import threading
+
+        self.pool = concurrent.futures.ThreadPoolExecutor(max_workers)
+        self.execute = execute
+        self.runtime = runtime
+        self.submit_latency = submit_latency
+        self.status_latency = status_latency
+        self.failure_rate = failure_rate
+        self.submit_failure_rate = submit_failure_rate
+        self.max_submit_jobs = max_submit_jobs
+        self.max_rss = max_rss
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.jobs = {}
+        self.waiting = {}
+        self.futures = []
+        # start and end time of every job
+        self.times = {}
+        self.next_jobid = self.first_jobid
+
+    def run_command(self, args, cwd=None, stdout=sp.PIPE, stderr=sp.PIPE):
+        program = os.path.basename(args[0])
+        if program == self.job_submit:
+            returncode, out, err = self.sbatch(args[1:], cwd=cwd)
+        elif program == "sacct":
+            returncode, out, err = self.sacct(args[1:])
+        elif program == "squeue":
+            returncode, out, err = self.squeue(args[1:])
+        elif program == self.job_allocate:
+            returncode, out, err = self.salloc(args[1:])
+        elif program == "scancel":
+            returncode, out, err = self.scancel(args[1:])
+        elif program == self.job_run:
+            options, command = self.split_options(args[1:])
+            jobid = options.get("--jobid")
+            if jobid is not None and self.jobs.get(jobid) != "RUNNING":
+                returncode, out = 1, ""
+                err = (f"srun: error: Unable to confirm allocation for job "
+                       f"{jobid}: Invalid job id specified\n")
+            else:
+                return sp.run([which(command[0])] + command[1:], cwd=cwd,
+                              stdout=stdout, stderr=stderr)
+        else:
+            return super().run_command(args, cwd=cwd, stdout=stdout,
+                                       stderr=stderr)
+        return sp.CompletedProcess(args, returncode, out.encode("utf-8"),
+                                   err.encode("utf-8"))
+
+    async def run_command_async(self, args, cwd=None, limiter=None):
+        import asyncio
+
+        if limiter is not None:
+            async with limiter:
+                return await self.run_command_async(args, cwd=cwd)
+        loop = asyncio.get_event_loop()
+        p = await loop.run_in_executor(None, lambda: self.run_command(
+                                       args, cwd=cwd))
+        return p.returncode, p.stdout, p.stderr
+
+    def roll(self, rate):
+        with self.lock:
+            return self.random.random() < rate
+
+    def sbatch(self, args, cwd=None):
+        """ Emulate 'sbatch': queue job (or array tasks) for execution. """
+        time.sleep(self.submit_latency)
+        options, command = self.split_options(args)
+        if len(command) == 0:
+            return 1, "", "sbatch: error: No batch script given\n"
+        if self.roll(self.submit_failure_rate):
+            return 1, "", ("sbatch: error: Batch job submission failed: "
+                           "Socket timed out on send/recv operation\n")
+
+        dependencies = []
+        if "--dependency" in options:
+            dependencies = options["--dependency"].split(":")[1:]
+        kill = options.get("--kill-on-invalid-dep") == "yes"
+        with self.lock:
+            if self.max_submit_jobs is not None:
+                queued = sum(1 for s in self.jobs.values()
+                             if s in ("PENDING", "RUNNING"))
+                if queued >= self.max_submit_jobs:
+                    return 1, "", ("sbatch: error: QOSMaxSubmitJobPerUserLimit"
+                                   "\nsbatch: error: Batch job submission "
+                                   "failed: Job violates accounting/QOS "
+                                   "policy (job submit limit, user's size "
+                                   "and/or time limits)\n")
+            if any(len(self.dependency_states(d)) == 0 for d in dependencies):
+                return 1, "", ("sbatch: error: Batch job submission failed: "
+                               "Job dependency problem\n")
+            jobid = str(self.next_jobid)
+            self.next_jobid += 1
+        if "--array" in options:
+            taskids = self.expand_array_jobid(
+                f"{jobid}_[{options['--array']}]")
+        else:
+            taskids = [jobid]
+
+        for taskid in taskids:
+            env = {"SLURM_JOB_ID": jobid}
+            if taskid != jobid:
+                env["SLURM_ARRAY_JOB_ID"] = jobid
+                env["SLURM_ARRAY_TASK_ID"] = taskid.split("_")[1]
+            with self.lock:
+                self.jobs[taskid] = "PENDING"
+                self.waiting[taskid] = (dependencies, kill, command, cwd, env)
+                self.release()
+        return 0, f"Submitted batch job {jobid}\n", ""
+
+    def dependency_states(self, jobid):
+        """ States of a job or of all tasks of an array job. """
+        if jobid in self.jobs:
+            return [self.jobs[jobid]]
+        return [v for k, v in self.jobs.items() if k.startswith(jobid + "_")]
+
+    def release(self):
+        """ Start waiting jobs whose dependencies are satisfied.
+
+        Has to be called with the lock held.
+        """
+        for taskid, (dependencies, kill, command, cwd, env) in \
+                list(self.waiting.items()):
+            states = [s for d in dependencies
+                      for s in self.dependency_states(d)]
+            if any(s in ("FAILED", "CANCELLED", "TIMEOUT") for s in states):
+                # otherwise held with reason DependencyNeverSatisfied
+                if kill:
+                    del self.waiting[taskid]
+                    self.jobs[taskid] = "CANCELLED"
+            elif all(s == "COMPLETED" for s in states):
+                del self.waiting[taskid]
+                self.futures.append(self.pool.submit(
+                    self.execute_job, taskid, command, cwd, env))
+
+    def finish_job(self, jobid, state):
+        with self.lock:
+            self.jobs[jobid] = state
+            self.times.setdefault(jobid, [time.time()]).append(time.time())
+            self.release()
+
+    def execute_job(self, jobid, command, cwd, env):
+        """ Run a queued job, called by the worker threads. """
+        self.jobs[jobid] = "RUNNING"
+        self.times[jobid] = [time.time()]
+        if self.roll(self.failure_rate):
+            self.finish_job(jobid, "FAILED")
+            return
+        if not self.execute:
+            time.sleep(self.runtime)
+            self.finish_job(jobid, "COMPLETED")
+            return
+
+        outfile = os.path.join(cwd or os.getcwd(), f"slurm-{jobid}.out")
+        try:
+            with open(outfile, "w") as out:
+                p = sp.run([which(command[0])] + command[1:], cwd=cwd,
+                           env=dict(os.environ, **env), stdout=out,
+                           stderr=sp.STDOUT)
+            returncode = p.returncode
+        except OSError:
+            returncode = 1
+        self.finish_job(jobid, "COMPLETED" if returncode == 0 else "FAILED")
+
+    def sacct(self, args):
+        """ Emulate 'sacct -j <ids> --parsable2 --noheader'.
+
+        The fields JobID, State, Elapsed, TotalCPU and MaxRSS are known,
+        MaxRSS is reported for the batch step of a job.
+        """
+        time.sleep(self.status_latency)
+        options, _ = self.split_options(args)
+        if "-j" in args:
+            requested = args[args.index("-j") + 1].split(",")
+        else:
+            requested = options.get("--jobs", "").split(",")
+        fields = "JobID,State"
+        for arg in args:
+            if arg.startswith("--format="):
+                fields = arg.split("=", 1)[1]
+        fields = fields.split(",")
+        jobs = dict(self.jobs)
+        taskids = []
+        for jobid in requested:
+            if jobid in jobs:
+                taskids.append(jobid)
+            else:
+                # all tasks of an array job
+                taskids.extend(k for k in jobs if k.startswith(jobid + "_"))
+
+        lines = []
+        for taskid in taskids:
+            times = self.times.get(taskid, [])
+            elapsed = 0.0
+            if len(times) > 0:
+                elapsed = (times[-1] if len(times) > 1 else time.time()) \
+                          - times[0]
+            values = {"JobID": taskid, "State": jobs[taskid],
+                      "Elapsed": seconds_to_time(elapsed),
+                      "TotalCPU": seconds_to_time(elapsed), "MaxRSS": ""}
+            lines.append("|".join(values[f] for f in fields))
+            if "MaxRSS" in fields and len(times) > 0:
+                values.update(JobID=taskid + ".batch",
+                              MaxRSS=f"{int(self.max_rss * 1024)}K")
+                lines.append("|".join(values[f] for f in fields))
+        return 0, "".join(line + "\n" for line in lines), ""
+
+    def salloc(self, args):
+        """ Emulate 'salloc --no-shell': grant an allocation right away. """
+        time.sleep(self.submit_latency)
+        with self.lock:
+            jobid = str(self.next_jobid)
+            self.next_jobid += 1
+            self.jobs[jobid] = "RUNNING"
+        return 0, "", f"salloc: Granted job allocation {jobid}\n"
+
+    def scancel(self, args):
+        """ Emulate 'scancel <ids>' for queued jobs and allocations. """
+        with self.lock:
+            for jobid in args:
+                self.waiting.pop(jobid, None)
+                if self.jobs.get(jobid) in ("PENDING", "RUNNING"):
+                    self.jobs[jobid] = "CANCELLED"
+            self.release()
+        return 0, "", ""
+
+    def squeue(self, args):
+        """ Emulate 'squeue --me -h -o "%i %T"'. """
+        time.sleep(self.status_latency)
+        jobs = dict(self.jobs)
+        return 0, "".join(f"{k} {v}\n" for k, v in jobs.items()
+                          if self.is_active(v)), ""
+
+    def wait(self, timeout=None):
+        """ Block until all submitted jobs are finished. """
+        import concurrent.futures
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self.lock:
+                futures = list(self.futures)
+            remaining = None
+            if deadline is not None:
+                remaining = max(0.0, deadline - time.monotonic())
+            concurrent.futures.wait(futures, timeout=remaining)
+            with self.lock:
+                # finished jobs may have released dependent jobs
+                if len(self.futures) == len(futures):
+                    return
+            if deadline is not None and time.monotonic() >= deadline:
+                return
+
+    def shutdown(self):
+        """ Wait for all jobs and stop the worker threads. """
+        self.pool.shutdown(wait=True)
+
+class LocalPool(JobScheduler):
+    """ Run jobs on the local machine without a job scheduler.
+
+    Submitted jobs wait in a queue until enough CPUs and memory are free
+    and are then started as subprocesses, e.g. on a workstation or inside
+    a large allocation. The requested CPUs are exported as
+    OMP_NUM_THREADS and the time limit is enforced. Output goes to
+    'local-<jobid>.out' in the submission folder.
+
+    The state of all jobs is saved to a JSON file after every change, so
+    status queries keep working after the driver script was restarted. Jobs
+    that were still pending are then started by the new driver, jobs that
+    were running are monitored until they finish. The state file is locked
+    while it is read or written. Jobs of other running drivers using the
+    same file are kept and left to them. CPUs and memory are tracked per
+    instance, so all jobs created with ``queue="local"`` share one instance
+    per state file.
+
+    Parameters
+    ----------
+    cpus : int
+        Number of CPUs used for jobs (default: None, i.e. all CPUs).
+    memory : int
+        Memory in MB used for jobs (default: None, i.e. all memory).
+    state_file : str
+        Path to state file (default: 'ccjob_local.json').
+    """
+    job_submit = "ccjob-local-submit"
+    job_run = "ccjob-local-run"
+
+    template = SLURM.template
+    state = SLURM.state
+    inv_state = SLURM.inv_state
+
+    def __init__(self, cpus=None, memory=None, state_file="ccjob_local.json"):
+        import threading
+
+        self.cpus = cpus if cpus is not None else os.cpu_count()
+        if memory is None:
+            try:
+                memory = os.sysconf("SC_PAGE_SIZE") \
+                         * os.sysconf("SC_PHYS_PAGES") // 2**20
+            except (ValueError, OSError, AttributeError):
+                memory = float("inf")
+        self.memory = memory
+        self.state_file = os.path.abspath(state_file)
+        # created when the first job is started
+        self.rc_dir = os.path.splitext(self.state_file)[0] + ".d"
+
+        self.lock = threading.Condition()
+        self.jobs = {}
+        self.pending = []
+        self.used_cpus = 0
+        self.used_memory = 0
+        self.next_jobid = 1
+        # jobs started or monitored by this instance
+        self.owned = set()
+        with self.lock:
+            # nothing is written before the first submission
+            if os.path.exists(self.state_file):
+                with self.state_lock():
+                    self.load_state()
+            self.dispatch()
+
+    def parse_jobid_batch(self, submit_string):
+        match = re.search(r"Submitted local job\s+(\d+)", submit_string)
+        if match:
+            return match.group(1)
+        else:
+            raise ValueError("Could not parse job ID!")
+
+    def run_command(self, args, cwd=None, stdout=sp.PIPE, stderr=sp.PIPE):
+        program = os.path.basename(args[0])
+        if program == self.job_submit:
+            returncode, out, err = self.submit(args[1:], cwd=cwd)
+            return sp.CompletedProcess(args, returncode, out.encode("utf-8"),
+                                       err.encode("utf-8"))
+        elif program == self.job_run:
+            options, command = self.split_options(args[1:])
+            return sp.run([which(command[0])] + command[1:], cwd=cwd,
+                          stdout=stdout, stderr=stderr)
+        else:
+            return super().run_command(args, cwd=cwd, stdout=stdout,
+                                       stderr=stderr)
+
+    def submit(self, args, cwd=None):
+        """ Queue a job for execution.
+
+        Returns
+        -------
+        returncode : int
+            Zero if the job was accepted.
+        stdout : str
+            Submission message containing the job ID.
+        stderr : str
+            Error message.
+        """
+        options, command = self.split_options(args)
+        if len(command) == 0:
+            return 1, "", "error: No script given\n"
+        cpus = int(options.get("--cpus-per-task", 1))
+        memory = options.get("--mem", "0").upper()
+        if memory.endswith("G"):
+            memory = int(float(memory[:-1]) * 1024)
+        else:
+            memory = int(float(memory.rstrip("M")))
+        if cpus > self.cpus or memory > self.memory:
+            return 1, "", ("error: Job requests more resources than available "
+                           f"({self.cpus} CPUs, {self.memory} MB)\n")
+        timelimit = None
+        if "--time" in options:
+            timelimit = time_to_seconds(options["--time"])
+
+        with self.lock, self.state_lock():
+            # job IDs taken by other drivers
+            saved = self.read_state()
+            if saved is not None:
+                self.next_jobid = max(self.next_jobid, saved["next_jobid"])
+            jobid = str(self.next_jobid)
+            self.next_jobid += 1
+            self.jobs[jobid] = {"state": "PENDING", "command": command,
+                                "cwd": cwd or os.getcwd(), "cpus": cpus,
+                                "memory": memory, "time": timelimit,
+                                "pid": None, "returncode": None,
+                                "submitted": time.time(), "start": None,
+                                "end": None, "driver": os.getpid()}
+            self.owned.add(jobid)
+            self.pending.append(jobid)
+            self.dispatch()
+            self.save_state()
+        return 0, f"Submitted local job {jobid}\n", ""
+
+    def dispatch(self):
+        """ Start pending jobs which fit into the free resources.
+
+        Has to be called with the lock held.
+        """
+        import threading
+
+        for jobid in list(self.pending):
+            job = self.jobs[jobid]
+            if job["cpus"] > self.cpus - self.used_cpus or \
+               job["memory"] > self.memory - self.used_memory:
+                continue
+            self.pending.remove(jobid)
+            self.used_cpus += job["cpus"]
+            self.used_memory += job["memory"]
+            job["state"] = "RUNNING"
+            job["start"] = time.time()
+            threading.Thread(target=self.execute_job, args=(jobid,),
+                             daemon=True).start()
+
+    def execute_job(self, jobid):
+        """ Run a job and record its final state, called in a thread. """
+        import signal
+
+        job = self.jobs[jobid]
+        os.makedirs(self.rc_dir, exist_ok=True)
+        rcfile = os.path.join(self.rc_dir, f"{jobid}.rc")
+        env = dict(os.environ, OMP_NUM_THREADS=str(job["cpus"]),
+                   CCJOB_JOBID=jobid, CCJOB_RCFILE=rcfile)
+        # the shell records the return code for drivers started later
+        args = ["/bin/sh", "-c", '"$@"; echo $? > "$CCJOB_RCFILE"', "sh",
+                which(job["command"][0])] + job["command"][1:]
+        outfile = os.path.join(job["cwd"], f"local-{jobid}.out")
+        try:
+            with open(outfile, "w") as out:
+                p = sp.Popen(args, cwd=job["cwd"], env=env, stdout=out,
+                             stderr=sp.STDOUT, start_new_session=True)
+                with self.lock, self.state_lock():
+                    job["pid"] = p.pid
+                    self.save_state()
+                try:
+                    returncode = p.wait(timeout=job["time"])
+                    state = "COMPLETED" if returncode == 0 else "FAILED"
+                except sp.TimeoutExpired:
+                    os.killpg(p.pid, signal.SIGTERM)
+                    returncode = p.wait()
+                    state = "TIMEOUT"
+        except OSError:
+            returncode, state = 1, "FAILED"
+        if state != "TIMEOUT":
+            returncode = self.read_returncode(jobid, returncode)
+            state = "COMPLETED" if returncode == 0 else "FAILED"
+        self.finish_job(jobid, state, returncode)
+
+    def monitor_job(self, jobid):
+        """ Wait for a job started by a previous driver, called in a thread.
+        """
+        job = self.jobs[jobid]
+        while pid_alive(job["pid"]):
+            time.sleep(1.0)
+        returncode = self.read_returncode(jobid, None)
+        self.finish_job(jobid, "COMPLETED" if returncode == 0 else "FAILED",
+                        returncode)
+
+    def read_returncode(self, jobid, default):
+        try:
+            with open(os.path.join(self.rc_dir, f"{jobid}.rc")) as f:
+                return int(f.read())
+        except (OSError, ValueError):
+            return default
+
+    def finish_job(self, jobid, state, returncode):
+        with self.lock, self.state_lock():
+            job = self.jobs[jobid]
+            job["state"] = state
+            job["returncode"] = returncode
+            job["end"] = time.time()
+            self.used_cpus -= job["cpus"]
+            self.used_memory -= job["memory"]
+            self.dispatch()
+            self.save_state()
+            self.lock.notify_all()
+
+    @contextlib.contextmanager
+    def state_lock(self):
+        """ Exclusive lock of the state file (between processes). """
+        import fcntl
+
+        with open(self.state_file + ".lock", "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def read_state(self):
+        """ Content of the state file or None if there is none yet. """
+        try:
+            with open(self.state_file) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save_state(self):
+        """ Write state file (atomically). Has to be called with the lock and
+        the state lock held.
+
+        Jobs of other drivers found in the file are kept.
+        """
+        import tempfile
+
+        jobs, next_jobid = self.jobs, self.next_jobid
+        saved = self.read_state()
+        if saved is not None:
+            jobs = dict(saved["jobs"])
+            jobs.update((jobid, self.jobs[jobid]) for jobid in self.owned)
+            next_jobid = max(next_jobid, saved["next_jobid"])
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(self.state_file),
+                                   prefix=os.path.basename(self.state_file),
+                                   suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump({"next_jobid": next_jobid, "jobs": jobs}, f)
+            os.replace(tmp, self.state_file)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def load_state(self):
+        """ Read state file of a previous driver. Has to be called with the
+        lock and the state lock held.
+        """
+        import threading
+
+        saved = self.read_state()
+        if saved is None:
+            return
+        self.next_jobid = saved["next_jobid"]
+        self.jobs = saved["jobs"]
+        for jobid, job in sorted(self.jobs.items(), key=lambda x: int(x[0])):
+            if job["state"] not in ("PENDING", "RUNNING"):
+                continue
+            driver = job.get("driver")
+            if driver not in (None, os.getpid()) and pid_alive(driver):
+                # handled by another driver which is still running
+                continue
+            self.owned.add(jobid)
+            job["driver"] = os.getpid()
+            if job["state"] == "PENDING":
+                self.pending.append(jobid)
+            elif job["state"] == "RUNNING":
+                if job["pid"] is not None and pid_alive(job["pid"]):
+                    self.used_cpus += job["cpus"]
+                    self.used_memory += job["memory"]
+                    threading.Thread(target=self.monitor_job, args=(jobid,),
+                                     daemon=True).start()
+                else:
+                    # died together with the previous driver (or before
+                    # its return code was recorded)
+                    returncode = self.read_returncode(jobid, None)
+                    job["state"] = "COMPLETED" if returncode == 0 else "FAILED"
+                    job["returncode"] = returncode
+
+    def get_status_many(self, jobids, chunksize=None):
+        """ Get status of many jobs.
+
+        Jobs of other drivers are looked up in the state file.
+
+        Returns
+        -------
+        status : dict
+            Mapping of job ID to state.
+        """
+        ids = [str(j) for j in jobids if j is not None]
+        with self.lock:
+            saved = None
+            if any(j not in self.owned for j in ids) and \
+                    os.path.exists(self.state_file):
+                with self.state_lock():
+                    saved = self.read_state()
+            if saved is not None:
+                for jobid, job in saved["jobs"].items():
+                    if jobid not in self.owned:
+                        self.jobs[jobid] = job
+            return {j: self.jobs[j]["state"] for j in ids if j in self.jobs}
+
+    async def get_status_many_async(self, jobids, chunksize=None,
+                                    limiter=None):
+        return self.get_status_many(jobids)
+
+    def wait(self, timeout=None):
+        """ Block until all jobs are finished.
+
+        Returns
+        -------
+        finished : bool
+            False if the timeout expired before.
+        """
+        with self.lock:
+            return self.lock.wait_for(
+                lambda: len(self.pending) == 0 and
+                all(j["state"] != "RUNNING" for j in self.jobs.values()),
+                timeout=timeout)
+
+def pid_alive(pid):
+    """ Check whether a process exists. """
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+# scheduler instances shared by all jobs created with the same name
+_shared_queues = {}
+_shared_lock = threading.Lock()
+
+def shared_queue(key, factory):
+    """ Get the instance stored under a key, created on first use. """
+    with _shared_lock:
+        if key not in _shared_queues:
+            _shared_queues[key] = factory()
+        return _shared_queues[key]
+
 def queue_factory(q_string):
+    """ Get job scheduler by name.
+
+    All jobs created with the same name share one instance, so ``JobSet``
+    asks the scheduler once for all of them.
+    """
     if q_string.lower() == "slurm":
-        return SLURM()
+        return shared_queue("slurm", SLURM)
     elif q_string.lower() == "pbs":
-        return PBS()
+        return shared_queue("pbs", PBS)
+    elif q_string.lower() == "fake-slurm":
+        # job IDs and states are kept by the instance
+        return shared_queue("fake-slurm", FakeSLURM)
+    elif q_string.lower() == "local":
+        # one pool per state file keeps track of CPUs and memory
+        state_file = os.path.abspath("ccjob_local.json")
+        return shared_queue(("local", state_file),
+                            lambda: LocalPool(state_file=state_file))
     else:
         raise NotImplementedError("Currently only SLURM class is functional!")
@@ -0,0 +1,178 @@
+import string
+
+
+def _escape(text):
+    """ Escape braces for str.format. """
+    return text.replace("{", "{{").replace("}", "}}")
+
+
+class CompiledTemplate(object):
+    """ Input template parsed once into literal text and placeholders.
+
+    ``string.Template.substitute`` scans the template with a regular
+    expression on every call. Here the template is scanned only once and
+    rendered with a precomputed format string afterwards.
+
+    Parameters
+    ----------
+    template : string.Template or str
+        Template of input file.
+    name : str
+        Name of template (default: None).
+    """
+
+    def __init__(self, template, name=None):
+        if not isinstance(template, string.Template):
+            template = string.Template(template)
+        self.template = template
+        self.name = name
+
+        literals, names = [], []
+        text = template.template
+        pos = 0
+        chunk = []
+        for mo in template.pattern.finditer(text):
+            chunk.append(text[pos:mo.start()])
+            pos = mo.end()
+            if mo.group("escaped") is not None:
+                chunk.append(template.delimiter)
+                continue
+            identifier = mo.group("named") or mo.group("braced")
+            if identifier is None:
+                lines = text[:mo.start("invalid")].splitlines(keepends=True)
+                raise ValueError(("Invalid placeholder in template {0}: line "
+                                  "{1}").format(name, len(lines) + 1))
+            literals.append("".join(chunk))
+            names.append(identifier)
+            chunk = []
+        chunk.append(text[pos:])
+        literals.append("".join(chunk))
+
+        #: literal text segments (one more than placeholders)
+        self.literals = tuple(literals)
+        #: placeholder names in order of appearance
+        self.placeholders = tuple(names)
+        #: set of identifiers which have to be provided for rendering
+        self.identifiers = frozenset(names)
+
+        fmt = [_escape(literals[0])]
+        for identifier, literal in zip(names, literals[1:]):
+            fmt.append("{" + identifier + "}")
+            fmt.append(_escape(literal))
+        self._format = "".join(fmt)
+
+    def __repr__(self):
+        return "CompiledTemplate({0}, {1} placeholders)".format(
+               self.name, len(self.identifiers))
+
+    def missing(self, mapping=None, **kwargs):
+        """ Identifiers which are not provided by the parameters.
+
+        Returns
+        -------
+        missing : set
+            Missing identifiers.
+        """
+        provided = set(kwargs)
+        if mapping is not None:
+            provided.update(mapping)
+        return set(self.identifiers - provided)
+
+    def validate(self, mapping=None, **kwargs):
+        """ Check that all identifiers are provided before rendering.
+
+        Raises
+        ------
+        KeyError
+            If any identifier is missing.
+        """
+        missing = self.missing(mapping, **kwargs)
+        if len(missing) > 0:
+            raise KeyError("Missing template parameters: "
+                           + ", ".join(sorted(missing)))
+
+    def render(self, mapping=None, **kwargs):
+        """ Render template. Keyword arguments overwrite ``mapping``.
+
+        Returns
+        -------
+        text : str
+            Rendered template.
+        """
+        if mapping is None:
+            params = kwargs
+        elif len(kwargs) == 0:
+            params = mapping
+        else:
+            params = dict(mapping)
+            params.update(kwargs)
+        return self._format.format_map(params)
+
+    # same call signature as string.Template, e.g. for Input.from_template
+    substitute = render
+
+
+class TemplateRegistry(object):
+    """ Registry of compiled templates.
+
+    By default, all templates of ``ccjob.templates`` are available. They are
+    loaded and compiled on first access.
+
+    Parameters
+    ----------
+    templates : dict
+        Mapping of names to string.Template objects (default: None, i.e.
+        templates of ``ccjob.templates``).
+    """
+
+    def __init__(self, templates=None):
+        self._templates = templates
+        self._compiled = {}
+
+    def _load(self):
+        if self._templates is None:
+            from ccjob import templates
+            self._templates = {k: v for k, v in vars(templates).items()
+                               if isinstance(v, string.Template)}
+        return self._templates
+
+    def __contains__(self, name):
+        return name in self._load()
+
+    def __getitem__(self, name):
+        return self.get(name)
+
+    def names(self):
+        """ Names of all registered templates. """
+        return sorted(self._load())
+
+    def register(self, name, template):
+        """ Add (or replace) a template.
+
+        Parameters
+        ----------
+        name : str
+            Name of template.
+        template : string.Template or str
+            Template of input file.
+        """
+        self._load()[name] = template
+        self._compiled.pop(name, None)
+
+    def get(self, name):
+        """ Get compiled template by name.
+
+        Returns
+        -------
+        template : CompiledTemplate
+            Compiled template.
+        """
+        if name not in self._compiled:
+            templates = self._load()
+            if name not in templates:
+                raise KeyError(f"Unknown template '{name}'!")
+            self._compiled[name] = CompiledTemplate(templates[name], name=name)
+        return self._compiled[name]
+
+
+registry = TemplateRegistry()
@@ -0,0 +1,161 @@
+import math
+from ccjob.utils import seconds_to_time, time_to_seconds
+
+
+def percentile(values, q):
+    """ Percentile of values with linear interpolation (like numpy).
+
+    Parameters
+    ----------
+    values : iterable of float
+        Sample values (at least one).
+    q : float
+        Percentile between 0 and 100.
+
+    Returns
+    -------
+    value : float
+        q-th percentile of the values.
+    """
+    values = sorted(values)
+    if len(values) == 0:
+        raise ValueError("Percentile of empty sample!")
+    position = (len(values) - 1) * q / 100.0
+    lower = int(math.floor(position))
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+class SizingPolicy(object):
+    """ Memory and time requests derived from the usage of finished jobs.
+
+    The resource usage recorded in meta (see ``JobSet.update_usage``) of
+    all successfully completed jobs is collected per group, i.e. jobs with
+    similar resource needs like the same template and basis set (see the
+    ``group`` argument of ``ccjob.Job``). New or resubmitted jobs of a group
+    then request the given percentile of the observed peak memory and run
+    time times a safety margin. Jobs killed for exceeding their memory or
+    time limit request at least twice as much as before, i.e. twice the
+    request saved to meta at submission (see ``Job.record_request``).
+
+    Parameters
+    ----------
+    key : function(meta)
+        Function returning the group of a job from its meta dictionary
+        (default: None, i.e. ``meta["group"]``).
+    percentile : float
+        Percentile of the observed usage (default: 95).
+    mem_margin : float
+        Factor applied to the memory percentile (default: 1.25).
+    time_margin : float
+        Factor applied to the run time percentile (default: 1.5).
+    min_samples : int
+        Minimum number of finished jobs of a group before its requests are
+        changed (default: 3).
+    min_mem : int
+        Lower limit of memory requests in MB (default: 100).
+    min_time : float
+        Lower limit of time requests in seconds (default: 300).
+    """
+
+    def __init__(self, key=None, percentile=95.0, mem_margin=1.25,
+                 time_margin=1.5, min_samples=3, min_mem=100, min_time=300):
+        self.key = key if key is not None else lambda meta: meta.get("group")
+        self.percentile = percentile
+        self.mem_margin = mem_margin
+        self.time_margin = time_margin
+        self.min_samples = min_samples
+        self.min_mem = min_mem
+        self.min_time = min_time
+        #: mapping of group to list of (max_rss, elapsed)
+        self.samples = {}
+
+    def observe(self, items):
+        """ Collect the usage of successfully completed jobs.
+
+        Parameters
+        ----------
+        items : iterable of ccjob.Job or dict
+            Jobs (their meta files are read) or meta dictionaries, e.g.
+            from ``StatusStore.query``.
+
+        Returns
+        -------
+        n : int
+            Number of new samples.
+        """
+        n = 0
+        for item in items:
+            meta = item
+            if hasattr(item, "meta"):
+                meta = item.load_meta() if item.has_meta() else item.meta
+            if meta is None or meta.get("status") != 'FIN':
+                continue
+            if meta.get("q_state") != "COMPLETED" or "elapsed" not in meta:
+                continue
+            group = self.key(meta)
+            if group is None:
+                continue
+            self.samples.setdefault(group, []).append(
+                (meta.get("max_rss", 0.0), meta["elapsed"]))
+            n += 1
+        return n
+
+    def recommend(self, group):
+        """ Memory and time request for a group.
+
+        Returns
+        -------
+        request : tuple or None
+            Memory in MB and time in scheduler format, None if there are
+            less than ``min_samples`` samples.
+        """
+        samples = self.samples.get(group, [])
+        if len(samples) < self.min_samples:
+            return None
+        mem = percentile([s[0] for s in samples], self.percentile)
+        mem = max(self.min_mem, int(math.ceil(mem * self.mem_margin)))
+        seconds = percentile([s[1] for s in samples], self.percentile)
+        seconds = max(self.min_time, seconds * self.time_margin)
+        # full minutes
+        seconds = 60 * math.ceil(seconds / 60.0)
+        return mem, seconds_to_time(seconds)
+
+    def apply(self, jobs, silent=True):
+        """ Set memory and time options of jobs before (re-)submission.
+
+        Parameters
+        ----------
+        jobs : iterable of ccjob.Job
+            Job objects.
+        silent : bool
+            Whether to print the new requests (default: True).
+
+        Returns
+        -------
+        changed : list of ccjob.Job
+            Jobs whose options were changed.
+        """
+        changed = []
+        for job in jobs:
+            meta = job.load_meta() if job.has_meta() else job.meta
+            request = self.recommend(self.key(meta))
+            mem, time = job.options["memory"], job.options["time"]
+            if request is not None:
+                mem, time = request
+            # the previous run hit its limit, the options of this driver may
+            # differ from the limits it was submitted with
+            previous_mem = meta.get("memory", job.options["memory"])
+            previous_time = meta.get("time", job.options["time"])
+            if meta.get("q_state") == "OUT_OF_MEMORY" and mem is not None:
+                mem = max(mem, 2 * int(previous_mem or 0))
+            if meta.get("q_state") == "TIMEOUT" and time is not None:
+                seconds = 2 * time_to_seconds(previous_time or 0)
+                if time_to_seconds(time) < seconds:
+                    time = seconds_to_time(seconds)
+            if (mem, time) != (job.options["memory"], job.options["time"]):
+                job.options.update(memory=mem, time=time)
+                changed.append(job)
+                if not silent:
+                    print(f"-- {job.meta['wdir']}/: --mem={mem} --time={time}")
+        return changed
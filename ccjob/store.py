@@ -0,0 +1,155 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+
+
+class StatusStore(object):
+    """ Central store for the meta information of many jobs.
+
+    Instead of one meta file per working directory, the meta information
+    of all jobs of a campaign is kept in a single SQLite database (WAL
+    mode). Every job is one row keyed by its working directory and
+    basename, the status is indexed for fast campaign-wide queries.
+
+    Parameters
+    ----------
+    path : str
+        Path to database file (default: 'ccjob_status.db').
+    timeout : float
+        Seconds to wait for a lock held by another process (default: 30).
+    """
+
+    def __init__(self, path="ccjob_status.db", timeout=30.0):
+        self.path = os.path.abspath(path)
+        # the connection is shared by worker threads, access is serialized
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(self.path, timeout=timeout,
+                                          check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            self.connection.execute(
+                """CREATE TABLE IF NOT EXISTS jobs (
+                       wdir      TEXT NOT NULL,
+                       basename  TEXT NOT NULL,
+                       status    TEXT,
+                       jobid     TEXT,
+                       created   REAL,
+                       updated   REAL,
+                       out_size  INTEGER,
+                       out_mtime REAL,
+                       meta      TEXT,
+                       PRIMARY KEY (wdir, basename))""")
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """ Close database connection. """
+        self.connection.close()
+
+    def _row(self, meta, now):
+        return (meta["wdir"], meta["basename"], meta.get("status"),
+                meta.get("jobid"), now, now, meta.get("out_size"),
+                meta.get("out_mtime"), json.dumps(meta))
+
+    def save(self, meta):
+        """ Insert or update the meta information of a job.
+
+        Parameters
+        ----------
+        meta : dict
+            Meta dictionary of a job (has to contain 'wdir' and 'basename').
+        """
+        self.save_many([meta])
+
+    def save_many(self, metas):
+        """ Insert or update the meta information of many jobs at once.
+
+        Parameters
+        ----------
+        metas : iterable of dict
+            Meta dictionaries of jobs.
+        """
+        now = time.time()
+        rows = [self._row(meta, now) for meta in metas]
+        with self.lock, self.connection:
+            self.connection.executemany(
+                """INSERT INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (wdir, basename) DO UPDATE SET
+                       status=excluded.status,
+                       jobid=excluded.jobid,
+                       updated=excluded.updated,
+                       out_size=excluded.out_size,
+                       out_mtime=excluded.out_mtime,
+                       meta=excluded.meta""", rows)
+
+    def load(self, wdir, basename):
+        """ Get the meta information of a job.
+
+        Returns
+        -------
+        meta : dict or None
+            Meta dictionary or None if the job is unknown.
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT meta FROM jobs WHERE wdir=? AND basename=?",
+                (wdir, basename)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0])
+
+    def query(self, status=None, wdir=None):
+        """ Get the meta information of all jobs matching the filters.
+
+        Parameters
+        ----------
+        status : str
+            Only jobs with this status, e.g. 'FAIL' (default: None, i.e.
+            any status).
+        wdir : str
+            Only jobs in this folder or below (default: None).
+
+        Returns
+        -------
+        metas : list of dict
+            Meta dictionaries of all matching jobs.
+        """
+        sql = "SELECT meta FROM jobs"
+        conditions, params = [], []
+        if status is not None:
+            conditions.append("status=?")
+            params.append(status)
+        if wdir is not None:
+            wdir = os.path.abspath(wdir)
+            # plain prefix comparison, LIKE would treat '_' and '%' in paths
+            # as wildcards and ignore case
+            prefix = os.path.join(wdir, "")
+            conditions.append("(wdir=? OR substr(wdir, 1, ?)=?)")
+            params.extend([wdir, len(prefix), prefix])
+        if len(conditions) > 0:
+            sql += " WHERE " + " AND ".join(conditions)
+        with self.lock:
+            rows = self.connection.execute(sql, params).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def count(self):
+        """ Number of jobs per status.
+
+        Returns
+        -------
+        counts : dict
+            Mapping of status to number of jobs.
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return dict(rows)
@@ -0,0 +1,300 @@
+import time
+import collections
+from ccjob.ccjob import JobSet
+
+
+class SubmitController(object):
+    """ Submit many jobs without flooding the queuing manager.
+
+    At most ``max_queued`` jobs of the user are kept in the queue. With
+    SLURM, all active jobs of the user (also those submitted by other
+    scripts) are counted with one 'squeue --me' call, otherwise only the
+    jobs of the controller are counted with a single (batched) status
+    query. The queue is asked every ``poll_interval`` seconds and new jobs
+    are submitted as slots free up. Submissions which were refused with a
+    transient error (e.g. the ``MaxSubmitJobs`` limit or a busy controller,
+    see ``JobScheduler.transient_errors``) are retried with exponential
+    backoff, any other failure is final.
+
+    Jobs can also be fed lazily from a generator with ``submit_stream``,
+    which blocks while all slots are taken (backpressure).
+
+    Parameters
+    ----------
+    jobs : iterable of ccjob.Job
+        Job objects for ``run`` (default: None).
+    max_queued : int
+        Maximum number of jobs of the user in the queue at the same time
+        (default: 500).
+    poll_interval : float
+        Seconds between two queries of the queue if all slots are taken
+        (default: 60).
+    retries : int
+        Number of retries of a failed submission (default: 5).
+    backoff : float
+        Seconds to wait before the first retry, doubled for every further
+        retry (default: 5).
+    max_backoff : float
+        Upper limit of the waiting time between two retries (default: 300).
+    grace_polls : int
+        Number of status queries for which a job unknown to the queue is
+        still counted as in flight (default: 3).
+    """
+
+    def __init__(self, jobs=None, max_queued=500, poll_interval=60.0,
+                 retries=5, backoff=5.0, max_backoff=300.0, grace_polls=3):
+        self.jobs = [] if jobs is None else list(jobs)
+        self.max_queued = max_queued
+        self.poll_interval = poll_interval
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.grace_polls = grace_polls
+
+        #: submitted jobs which were not seen leaving the queue yet
+        self.active = []
+        # queues (by id) the jobs are submitted to
+        self.queues = {id(job.queue): job.queue for job in self.jobs}
+        # jobs in flight at the last query plus jobs submitted since
+        self.n_in_flight = None
+        # number of queries in a row a job was unknown to the queue
+        self.unknown = {}
+        self.submitted = []
+        self.failed = []
+        self.n_submitted = 0
+        self.start_time = None
+
+    def in_flight(self):
+        """ Number of jobs of the user which are still in the queue.
+
+        If the queue lists all active jobs of the user ('squeue --me'),
+        they are all counted and active jobs of the controller which are
+        not listed have left the queue. Otherwise, the active jobs of the
+        controller are checked with one status query. Jobs unknown to the
+        queue are counted as well for ``grace_polls`` queries, as accounting
+        may lag behind submission. After that they are dropped, e.g. if
+        accounting is disabled or 'sacct' fails.
+
+        Returns
+        -------
+        n : int
+            Number of jobs in flight.
+        """
+        for job in self.active:
+            self.queues.setdefault(id(job.queue), job.queue)
+        n_other = 0
+        still_active = []
+        rest = []
+        for key, queue in self.queues.items():
+            jobs = [job for job in self.active if id(job.queue) == key]
+            listed = None
+            if getattr(queue, "use_squeue", False):
+                listed = queue.get_active()
+            if listed is None:
+                rest.extend(jobs)
+                continue
+            listed = {k for k, v in listed.items() if queue.is_active(v)}
+            own = [job for job in jobs if str(job.jobid) in listed]
+            n_other += len(listed) - len(own)
+            still_active.extend(own)
+            for job in jobs:
+                self.unknown.pop(job, None)
+
+        status = JobSet(rest).get_status() if len(rest) > 0 else {}
+        for job in rest:
+            q_status = status.get(str(job.jobid))
+            if q_status is None:
+                misses = self.unknown.get(job, 0) + 1
+                if misses <= self.grace_polls:
+                    self.unknown[job] = misses
+                    still_active.append(job)
+                    continue
+            elif job.queue.is_active(q_status):
+                still_active.append(job)
+            self.unknown.pop(job, None)
+        keep = {id(job) for job in still_active}
+        self.active = [job for job in self.active if id(job) in keep]
+        self.n_in_flight = len(self.active) + n_other
+        return self.n_in_flight
+
+    def submit_job(self, job, dry_run=False, silent=False):
+        """ Submit one job, retry with backoff after transient errors.
+
+        Returns
+        -------
+        submitted : bool
+            Whether the job was submitted.
+        """
+        delay = self.backoff
+        for attempt in range(self.retries + 1):
+            if attempt > 0:
+                if not silent:
+                    print("-- retry {0}/{1} in {2:.1f} s: {3}/".format(
+                          attempt, self.retries, delay, job.meta["wdir"]))
+                time.sleep(delay)
+                delay = min(2 * delay, self.max_backoff)
+            try:
+                job.submit(dry_run=dry_run, silent=silent)
+            except OSError as error:
+                # e.g. missing submission command, retrying will not help
+                print(f"!! Submission failed in {job.meta['wdir']}/: {error}")
+                return False
+            if dry_run:
+                return True
+            if job.jobid != None:
+                job.meta["status"] = 'PENDING'
+                job.save_meta()
+                return True
+            if not job.queue.is_transient(job.submit_error):
+                print(f"!! Submission failed in {job.meta['wdir']}/, "
+                      "not retrying")
+                return False
+        print(f"!! Giving up on {job.meta['wdir']}/ after "
+              f"{self.retries + 1} attempts")
+        return False
+
+    def throughput(self):
+        """ Submitted jobs per minute since the start of ``run``. """
+        if self.start_time is None:
+            return 0.0
+        elapsed = time.monotonic() - self.start_time
+        if elapsed <= 0:
+            return 0.0
+        return 60.0 * self.n_submitted / elapsed
+
+    def wait_for_slot(self, dry_run=False):
+        """ Block until less than ``max_queued`` jobs are in flight.
+
+        The queue is only asked if all slots were taken at the last query
+        (counting the jobs submitted since).
+        """
+        if dry_run:
+            return
+        while (self.n_in_flight is None
+               or self.n_in_flight >= self.max_queued) and \
+                self.in_flight() >= self.max_queued:
+            time.sleep(self.poll_interval)
+
+    def add_active(self, job):
+        """ Count a submitted job as in flight. """
+        self.active.append(job)
+        self.queues.setdefault(id(job.queue), job.queue)
+        if self.n_in_flight is not None:
+            self.n_in_flight += 1
+
+    def submit_stream(self, jobs, dry_run=False, silent=False):
+        """ Submit jobs from an iterable as slots become available.
+
+        The next job is taken from ``jobs`` only after the previous one
+        was submitted and is submitted when a slot is available, so a
+        generator producing them (e.g. writing inputs) is throttled by the
+        queue. Only the jobs in flight are kept.
+
+        Parameters
+        ----------
+        jobs : iterable of ccjob.Job
+            Job objects, e.g. a generator.
+        dry_run : bool
+            Whether to perform a dry-run job submission (default: False).
+        silent : bool
+            Whether to print additional information (default: False).
+
+        Yields
+        ------
+        result : tuple
+            (job, submitted) for every job.
+        """
+        if self.start_time is None:
+            self.start_time = time.monotonic()
+        jobs = iter(jobs)
+        while True:
+            try:
+                job = next(jobs)
+            except StopIteration:
+                return
+            # the queue of the job is asked for the jobs of the user
+            self.queues.setdefault(id(job.queue), job.queue)
+            self.wait_for_slot(dry_run=dry_run)
+            submitted = self.submit_job(job, dry_run=dry_run, silent=silent)
+            if submitted:
+                self.n_submitted += 1
+                if not dry_run:
+                    self.add_active(job)
+            yield job, submitted
+
+    def run(self, dry_run=False, silent=False, smart=True,
+            out_extension='out',
+            success_string="Have a nice day.",
+            success_fct=None,
+            use_CCParser=True):
+        """ Submit all jobs, keeping at most ``max_queued`` in the queue.
+
+        Parameters
+        ----------
+        dry_run : bool
+            Whether to perform a dry-run job submission (default: False).
+        silent : bool
+            Whether to print additional information (default: False).
+        smart : bool
+            Skip jobs which finished successfully or are still active
+            (default: True). Active jobs count against ``max_queued``.
+        out_extension : str
+            File extension of output file (default: 'out').
+        success_string : str
+            String to match in output regarding successful job completion
+            (default: 'Have a nice day.').
+        success_fct : function(path_to_output)
+            Function object for custom parsing (default: None). Has to take
+            output path as an input and has to return a boolean.
+        use_CCParser : bool
+            Use CCParser module if possible (defautl: True).
+
+        Returns
+        -------
+        summary : dict
+            Lists of jobs which were 'submitted', 'skipped' or 'failed' and
+            the throughput in jobs per minute ('rate').
+        """
+        skipped = []
+        todo = self.jobs
+        if smart:
+            successful = JobSet(self.jobs).is_successful(
+                out_extension=out_extension,
+                success_string=success_string,
+                success_fct=success_fct,
+                use_CCParser=use_CCParser)
+            todo = []
+            for job, ok in zip(self.jobs, successful):
+                if ok:
+                    skipped.append(job)
+                elif job.meta["status"] == 'PENDING':
+                    skipped.append(job)
+                    self.active.append(job)
+                else:
+                    todo.append(job)
+
+        todo = collections.deque(todo)
+        self.start_time = time.monotonic()
+        while len(todo) > 0:
+            free = self.max_queued - (0 if dry_run else self.in_flight())
+            if free <= 0:
+                time.sleep(self.poll_interval)
+                continue
+            for _ in range(min(free, len(todo))):
+                job = todo.popleft()
+                if self.submit_job(job, dry_run=dry_run, silent=silent):
+                    self.submitted.append(job)
+                    self.n_submitted += 1
+                    if not dry_run:
+                        self.add_active(job)
+                else:
+                    self.failed.append(job)
+            if not silent:
+                print("-- submitted {0}/{1} jobs, {2} in flight, "
+                      "{3:.1f} jobs/min".format(
+                          len(self.submitted), len(self.submitted)
+                          + len(self.failed) + len(todo), len(self.active),
+                          self.throughput()))
+
+        return {"submitted": list(self.submitted), "skipped": skipped,
+                "failed": list(self.failed), "rate": self.throughput()}
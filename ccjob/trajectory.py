@@ -0,0 +1,117 @@
+import os
+import mmap
+import string
+from ccjob.ccjob import Input
+from ccjob.registry import CompiledTemplate, registry
+
+
+def read_xyz_frames(path, start=0, stop=None, step=1):
+    """ Stream frames of a multi-frame XYZ file.
+
+    The file is memory-mapped and only the lines of the requested frames
+    are decoded, so the memory needed does not depend on the length of the
+    trajectory.
+
+    Parameters
+    ----------
+    path : str
+        Path to XYZ file (number of atoms, comment line, one line per atom
+        for every frame).
+    start : int
+        Index of first frame (default: 0).
+    stop : int
+        Index after the last frame (default: None, i.e. all frames).
+    step : int
+        Take every step-th frame (default: 1).
+
+    Yields
+    ------
+    frame : dict
+        Frame with the keys 'index', 'natoms', 'comment' and 'xyz' (atom
+        lines like in ``ccjob.templates.A``).
+    """
+    if os.path.getsize(path) == 0:
+        return
+    with open(path, "rb") as f, \
+         mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        index = 0
+        while stop is None or index < stop:
+            line = mm.readline()
+            if len(line) == 0:
+                return
+            if len(line.strip()) == 0:
+                continue
+            try:
+                natoms = int(line)
+            except ValueError:
+                raise ValueError(f"Invalid XYZ file {path}: expected number "
+                                 f"of atoms of frame {index}")
+            comment = mm.readline()
+            begin = mm.tell()
+            for _ in range(natoms):
+                if len(mm.readline()) == 0:
+                    raise ValueError(f"Invalid XYZ file {path}: frame "
+                                     f"{index} is truncated")
+            if index >= start and (index - start) % step == 0:
+                lines = mm[begin:mm.tell()].decode("utf-8").splitlines()
+                yield {"index"   : index,
+                       "natoms"  : natoms,
+                       "comment" : comment.decode("utf-8").strip(),
+                       "xyz"     : "\n".join(l.strip() for l in lines)}
+            index += 1
+
+
+def stream_inputs(template, frames, path_pattern, transform=None,
+                  defaults=None, silent=True):
+    """ Render and write one input per frame, one frame at a time.
+
+    Parameters
+    ----------
+    template : str, string.Template or ccjob.registry.CompiledTemplate
+        Template of input file. Strings are looked up in
+        ``ccjob.registry.registry``.
+    frames : iterable of dict
+        Frames, e.g. from ``read_xyz_frames``.
+    path_pattern : str
+        Pattern of input paths in ``str.format`` syntax. Available fields are
+        ``index`` (of the frame) and the template parameters, e.g.
+        'frames/{index:05d}/adc.in'.
+    transform : function(frame)
+        Function returning the template parameters of a frame or None to
+        skip it (default: None, i.e. ``{"xyz": frame["xyz"]}``).
+    defaults : dict
+        Default values for template fields (default: None, i.e.
+        ``ccjob.templates.defaults``).
+    silent : bool
+        Whether to print additional information (default: True).
+
+    Yields
+    ------
+    inp : ccjob.Input
+        Input object of every frame (already written).
+    """
+    if isinstance(template, str):
+        template = registry[template]
+    elif isinstance(template, string.Template):
+        template = CompiledTemplate(template)
+    if defaults is None:
+        from ccjob.templates import defaults
+    if transform is None:
+        transform = lambda frame: {"xyz": frame["xyz"]}
+
+    validated = False
+    for frame in frames:
+        params = transform(frame)
+        if params is None:
+            continue
+        if not validated:
+            # all frames share the same parameters
+            template.validate(defaults, **params)
+            validated = True
+        fields = dict(params, index=frame["index"])
+        inp = Input(path_pattern.format_map(fields),
+                    inp_string=template.render(defaults, **params),
+                    to_file=False)
+        os.makedirs(inp.wdir, exist_ok=True)
+        inp.save_input(silent=silent)
+        yield inp
@@ -1,6 +1,17 @@
 import os
+import functools
 import glob
+import math
+import mmap
 import re
+import shlex
+import shutil
+import string
+
+# file names (lower case) recognized as electronic configuration files
+eleconfig_names = ("eleconfiguration.txt", "eleconfig.txt", "elconfig.txt",
+                   "eleconf.txt", "econf.txt", "elconf.txt", "ele.config",
+                   "electronic.conf", "ccjob_elconfig.txt")
 
 def find_output(directory, extension="out", abspath=True):
     """ Find output file in a directory.
@@ -47,15 +58,11 @@ def find_eleconfig(directory, abspath=True):
     elconf_path : str or int
          Path to 'eleconfig.txt'.
     """
-    usual_suspects = ["eleconfiguration.txt", "eleconfig.txt",
-                      "elconfig.txt", "eleconf.txt", "econf.txt",
-                      "elconf.txt", "ele.config", "electronic.conf",
-                      "ccjob_elconfig.txt"
-                     ]
+    usual_suspects = eleconfig_names
     cand = [os.path.basename(fn) for fn in glob.glob(directory+"/*.txt")
             if os.path.isfile(fn)]
-    cand.extend([os.path.basename(cf) for cf in glob.glob(directory+"/*.config")
-                 if os.path.isfile(cf)])
+    cand.extend([os.path.basename(cf) for cf in
+                 glob.glob(directory+"/*.config") if os.path.isfile(cf)])
 
     intersec = [x for x in cand if x.lower() in usual_suspects]
     if len(intersec) != 1:
@@ -68,8 +75,12 @@ def find_eleconfig(directory, abspath=True):
             outpath = os.path.join(absdir, intersec[0])
         return elconf_path
 
+@functools.lru_cache(maxsize=None)
 def module_exists(module_name):
-    """ Check if a module can be imported. """
+    """ Check if a module can be imported.
+
+    The result is cached, so the import is only attempted once per process.
+    """
     try:
         __import__(module_name)
     except ImportError:
@@ -77,6 +88,185 @@ def module_exists(module_name):
     else:
         return True
 
+def file_contains(fpath, search_string, tail_size=65536):
+    """ Check whether a file contains a string, searching its end first.
+
+    Output files are usually terminated by a success message, so only the
+    last ``tail_size`` bytes are read at first. Only if the string is not
+    found there, the rest of the file is scanned via mmap.
+
+    Parameters
+    ----------
+    fpath : str
+        Path to file.
+    search_string : str
+        String to look for.
+    tail_size : int
+        Number of bytes at the end of the file searched first
+        (default: 64 KiB).
+
+    Returns
+    -------
+    found : bool
+        Whether the string occurs in the file.
+    """
+    needle = search_string.encode("utf-8")
+    with open(fpath, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        start = max(0, f.tell() - tail_size)
+        f.seek(start)
+        if needle in f.read():
+            return True
+        elif start == 0:
+            # tail was the whole file
+            return False
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            # include matches crossing the start of the tail
+            return mm.find(needle, 0, start + len(needle) - 1) != -1
+
+@functools.lru_cache(maxsize=None)
+def which(program):
+    """ Resolve a program name to its path in $PATH.
+
+    The lookup is done only once per process and program. If the program
+    cannot be found, the name is returned unchanged.
+    """
+    path = shutil.which(program)
+    return program if path is None else path
+
+def template_args(template, mapping):
+    """ Argument vector of a scheduler option template.
+
+    The template (e.g. '-l mem=$memory') is split into arguments before the
+    values are substituted, so every value stays within its argument even
+    if it contains spaces or quotes.
+
+    Parameters
+    ----------
+    template : str
+        Option template in ``string.Template`` syntax.
+    mapping : dict
+        Values of the template fields.
+
+    Returns
+    -------
+    args : list of str
+        Arguments, e.g. ['-l', 'mem=500'].
+    """
+    return [string.Template(token).substitute(mapping)
+            for token in shlex.split(template)]
+
+def time_to_seconds(time_string):
+    """ Convert a time in scheduler format to seconds.
+
+    Accepted formats are 'mm', 'mm:ss', 'hh:mm:ss', 'dd-hh', 'dd-hh:mm' and
+    'dd-hh:mm:ss' (as understood by SLURM).
+
+    Parameters
+    ----------
+    time_string : str
+        Time in scheduler format.
+
+    Returns
+    -------
+    seconds : float
+        Time in seconds.
+    """
+    time_string = str(time_string).strip()
+    days = 0
+    if "-" in time_string:
+        days, time_string = time_string.split("-", 1)
+        days = int(days)
+        # with days given, the first field is hours
+        fields = [float(x) for x in time_string.split(":")]
+        fields += [0] * (3 - len(fields))
+        hours, minutes, seconds = fields
+    else:
+        fields = [float(x) for x in time_string.split(":")]
+        if len(fields) == 1:
+            hours, minutes, seconds = 0, fields[0], 0
+        elif len(fields) == 2:
+            hours, (minutes, seconds) = 0, fields
+        else:
+            hours, minutes, seconds = fields
+    return ((days * 24 + hours) * 60 + minutes) * 60 + seconds
+
+def seconds_to_time(seconds):
+    """ Convert seconds to scheduler time format ('dd-hh:mm:ss').
+
+    Parameters
+    ----------
+    seconds : float
+        Time in seconds (rounded up to full seconds).
+
+    Returns
+    -------
+    time_string : str
+        Time in scheduler format.
+    """
+    seconds = int(math.ceil(seconds))
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    days, hours = divmod(hours, 24)
+    time_string = f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+    if days > 0:
+        time_string = f"{days}-{time_string}"
+    return time_string
+
+def memory_to_mb(memory_string, default_unit="K"):
+    """ Convert a memory size as printed by SLURM (e.g. '1024K') to MB.
+
+    Parameters
+    ----------
+    memory_string : str
+        Memory size with optional unit (K, M, G, T, multiples of 1024).
+    default_unit : str
+        Unit of numbers without unit (default: 'K' as for MaxRSS).
+
+    Returns
+    -------
+    memory : float
+        Memory in MB.
+    """
+    memory_string = str(memory_string).strip().upper()
+    units = {"K": 1.0 / 1024, "M": 1.0, "G": 1024.0, "T": 1024.0**2}
+    unit = default_unit
+    if memory_string[-1:] in units:
+        memory_string, unit = memory_string[:-1], memory_string[-1]
+    return float(memory_string) * units[unit]
+
+async def run_async(args, cwd=None, limiter=None):
+    """ Run a command without shell in a subprocess (coroutine).
+
+    Parameters
+    ----------
+    args : list
+        Argument vector (program and arguments).
+    cwd : str
+        Working directory of the subprocess (default: None).
+    limiter : asyncio.Semaphore
+        Limits the number of concurrent subprocesses (default: None).
+
+    Returns
+    -------
+    returncode : int
+        Return code of the command.
+    stdout : bytes
+        Standard output.
+    stderr : bytes
+        Standard error.
+    """
+    import asyncio
+
+    if limiter is not None:
+        async with limiter:
+            return await run_async(args, cwd=cwd)
+    proc = await asyncio.create_subprocess_exec(
+        *args, cwd=cwd, stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE)
+    stdout, stderr = await proc.communicate()
+    return proc.returncode, stdout, stderr
+
 def split_path(filepath):
     """
     Make absolute path and split filename from path.
@@ -117,7 +307,8 @@ def zr_frag(fname, separator="----", fmt="string"):
 
     """
     if fmt.lower() not in ("string", "list"):
-        raise ValueError("Invalid format option specified! Use either 'string' or 'list'.")
+        raise ValueError("Invalid format option specified! Use either "
+                         "'string' or 'list'.")
     with open(fname) as zr:
         rl = zr.readlines()
     line_B = 0
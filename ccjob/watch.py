@@ -0,0 +1,226 @@
+import os
+import time
+import queue
+from ccjob.ccjob import JobSet
+from ccjob.utils import module_exists
+
+
+class JobWatcher(object):
+    """ Report finished jobs as soon as possible with little scheduler load.
+
+    The queue is asked for the status of all unfinished jobs with a single
+    (batched) query every ``poll_interval`` seconds. In between, the working
+    directories are watched for changes: with the watchdog module (inotify
+    on Linux) if available, otherwise by comparing the size and mtime of the
+    output files every ``scan_interval`` seconds. A changed output that
+    signals successful termination finishes its job right away, failures
+    are detected by the next poll.
+
+    Meta information is updated whenever a job finishes.
+
+    Parameters
+    ----------
+    jobs : iterable of ccjob.Job
+        Job objects.
+    poll_interval : float
+        Seconds between two queries of the queue (default: 60).
+    scan_interval : float
+        Seconds between two scans of the output files if watchdog is not
+        available (default: 5).
+    out_extension : str
+        File extension of output file (default: 'out').
+    success_string : str
+        String to match in output regarding successful job completion
+        (default: 'Have a nice day.').
+    success_fct : function(path_to_output)
+        Function object for custom parsing (default: None). Has to take
+        output path as an input and has to return a boolean.
+    use_CCParser : bool
+        Use CCParser module if possible (defautl: True).
+    use_watchdog : bool
+        Use watchdog module if possible (default: True).
+    """
+
+    def __init__(self, jobs, poll_interval=60.0, scan_interval=5.0,
+                 out_extension='out',
+                 success_string="Have a nice day.",
+                 success_fct=None,
+                 use_CCParser=True,
+                 use_watchdog=True):
+        self.jobs = list(jobs)
+        self.poll_interval = poll_interval
+        self.scan_interval = scan_interval
+        self.out_extension = out_extension
+        self.success_string = success_string
+        self.success_fct = success_fct
+        self.use_CCParser = use_CCParser
+        self.use_watchdog = use_watchdog and module_exists("watchdog")
+
+        self.pending = list(self.jobs)
+        self.changes = queue.Queue()
+        self.observer = None
+        self.fingerprints = {}
+
+    def outpath(self, job):
+        outfile = ".".join([job.meta["basename"], self.out_extension])
+        return os.path.join(job.meta["wdir"], outfile)
+
+    def poll(self):
+        """ Check all pending jobs with one query of the queue.
+
+        Returns
+        -------
+        finished : list of tuple
+            (job, successful) for every job which finished.
+        """
+        results = JobSet(self.pending).is_successful(
+            out_extension=self.out_extension,
+            success_string=self.success_string,
+            success_fct=self.success_fct,
+            use_CCParser=self.use_CCParser)
+        finished = []
+        for job, successful in zip(list(self.pending), results):
+            if successful or job.meta["status"] != 'PENDING':
+                self.pending.remove(job)
+                finished.append((job, successful))
+        return finished
+
+    def check_output(self, job):
+        """ Check whether a job wrote a successful output.
+
+        Unsuccessful outputs are not recorded, as the job may still run.
+        """
+        meta = dict(job.meta)
+        if job.good_output(self.outpath(job),
+                           success_string=self.success_string,
+                           success_fct=self.success_fct,
+                           use_CCParser=self.use_CCParser):
+            job.save_meta()
+            return True
+        job.meta = meta
+        return False
+
+    def start(self):
+        """ Start watching the working directories (watchdog only). """
+        if not self.use_watchdog or self.observer is not None:
+            return
+        from watchdog.observers import Observer
+        from watchdog.events import FileSystemEventHandler
+
+        changes = self.changes
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if not event.is_directory:
+                    changes.put(os.path.dirname(event.src_path))
+
+        self.observer = Observer()
+        handler = Handler()
+        for wdir in {job.meta["wdir"] for job in self.pending}:
+            self.observer.schedule(handler, wdir, recursive=False)
+        self.observer.start()
+
+    def stop(self):
+        """ Stop watching the working directories. """
+        if self.observer is not None:
+            self.observer.stop()
+            self.observer.join()
+            self.observer = None
+
+    def wait_for_changes(self, timeout):
+        """ Wait for changes in working directories of pending jobs.
+
+        Returns
+        -------
+        wdirs : set
+            Working directories with changed files.
+        """
+        wdirs = set()
+        if self.use_watchdog:
+            try:
+                wdirs.add(self.changes.get(timeout=timeout))
+                while True:
+                    wdirs.add(self.changes.get_nowait())
+            except queue.Empty:
+                return wdirs
+
+        time.sleep(min(timeout, self.scan_interval))
+        for job in self.pending:
+            try:
+                stat = os.stat(self.outpath(job))
+            except OSError:
+                continue
+            fingerprint = (stat.st_size, stat.st_mtime)
+            if self.fingerprints.get(id(job)) != fingerprint:
+                self.fingerprints[id(job)] = fingerprint
+                wdirs.add(job.meta["wdir"])
+        return wdirs
+
+    def events(self, timeout=None):
+        """ Generate completion events until all jobs are finished.
+
+        Parameters
+        ----------
+        timeout : float
+            Stop after this many seconds (default: None, i.e. wait for all
+            jobs).
+
+        Yields
+        ------
+        event : tuple
+            (job, successful) for every finished job.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        self.start()
+        try:
+            next_poll = time.monotonic()
+            while len(self.pending) > 0:
+                now = time.monotonic()
+                if deadline is not None and now >= deadline:
+                    return
+                if now >= next_poll:
+                    for event in self.poll():
+                        yield event
+                    next_poll = now + self.poll_interval
+                    continue
+
+                wait = next_poll - now
+                if deadline is not None:
+                    wait = min(wait, deadline - now)
+                wdirs = self.wait_for_changes(wait)
+                for job in [j for j in self.pending
+                            if j.meta["wdir"] in wdirs]:
+                    if self.check_output(job):
+                        self.pending.remove(job)
+                        yield job, True
+        finally:
+            self.stop()
+
+    def run(self, callback, timeout=None):
+        """ Call ``callback(job, successful)`` for every finished job.
+
+        Parameters
+        ----------
+        callback : function(job, successful)
+            Function called for every finished job.
+        timeout : float
+            Stop after this many seconds (default: None).
+        """
+        for job, successful in self.events(timeout=timeout):
+            callback(job, successful)
+
+    async def events_async(self, timeout=None):
+        """ Asynchronous iterator over completion events.
+
+        The blocking watcher runs in a worker thread of the event loop.
+        """
+        import asyncio
+
+        loop = asyncio.get_event_loop()
+        events = self.events(timeout=timeout)
+        done = object()
+        while True:
+            event = await loop.run_in_executor(None, next, events, done)
+            if event is done:
+                return
+            yield event
@@ -0,0 +1,216 @@
+from ccjob.ccjob import JobSet
+
+
+class Workflow(object):
+    """ Jobs with dependencies on each other (directed acyclic graph).
+
+    Every job may declare parent jobs whose results it needs, e.g. an FDE
+    calculation reading the density exported by another job. All jobs are
+    submitted at once; children are held back by the queue with
+    '--dependency=afterok:<parent IDs>' until their parents finished
+    successfully. With SLURM, children of failed parents are cancelled
+    ('--kill-on-invalid-dep=yes').
+
+    Parameters
+    ----------
+    jobs : iterable of ccjob.Job
+        Jobs without parents (default: None).
+    """
+
+    def __init__(self, jobs=None):
+        self.jobs = []
+        self.parents = {}
+        for job in jobs or []:
+            self.add(job)
+
+    def __iter__(self):
+        return iter(self.jobs)
+
+    def __len__(self):
+        return len(self.jobs)
+
+    def add(self, job, parents=None):
+        """ Add a job and the jobs it depends on.
+
+        Parameters
+        ----------
+        job : ccjob.Job
+            Job object.
+        parents : list of ccjob.Job
+            Jobs which have to finish successfully first (default: None).
+            Parents which are not part of the workflow yet are added.
+
+        Returns
+        -------
+        job : ccjob.Job
+            The added job.
+        """
+        parents = list(parents or [])
+        for parent in parents:
+            if parent not in self.parents:
+                self.add(parent)
+        if job not in self.parents:
+            self.jobs.append(job)
+            self.parents[job] = []
+        self.parents[job].extend(p for p in parents
+                                 if p not in self.parents[job])
+        return job
+
+    def children(self, job):
+        """ Jobs which directly depend on a job. """
+        return [j for j in self.jobs if job in self.parents[j]]
+
+    def descendants(self, jobs):
+        """ Jobs which directly or indirectly depend on any of the jobs. """
+        found = []
+        stack = list(jobs)
+        while len(stack) > 0:
+            for child in self.children(stack.pop()):
+                if child not in found:
+                    found.append(child)
+                    stack.append(child)
+        return found
+
+    def order(self):
+        """ Jobs in topological order (parents before children).
+
+        Raises
+        ------
+        ValueError
+            If the dependencies contain a cycle.
+        """
+        ordered = []
+        remaining = list(self.jobs)
+        while len(remaining) > 0:
+            ready = [j for j in remaining
+                     if all(p in ordered for p in self.parents[j])]
+            if len(ready) == 0:
+                raise ValueError("Dependencies of workflow contain a cycle!")
+            ordered.extend(ready)
+            remaining = [j for j in remaining if j not in ready]
+        return ordered
+
+    def submit(self, jobs=None, dry_run=False, silent=False):
+        """ Submit jobs in topological order with dependencies.
+
+        Dependencies are set on parents which are submitted as well or are
+        still active (status 'PENDING'). Children of jobs whose submission
+        failed are not submitted.
+
+        Parameters
+        ----------
+        jobs : list of ccjob.Job
+            Subset of jobs to submit (default: None, i.e. all jobs).
+        dry_run : bool
+            Whether to perform a dry-run job submission (default: False).
+        silent : bool
+            Whether to print additional information (default: False).
+
+        Returns
+        -------
+        submitted : list of ccjob.Job
+            Jobs which were submitted.
+        """
+        selected = self.jobs if jobs is None else jobs
+        submitted = []
+        for job in self.order():
+            if job not in selected:
+                continue
+            parents = [p for p in self.parents[job]
+                       if p in selected or p.meta["status"] == 'PENDING']
+            if any(p.jobid == None for p in parents) and not dry_run:
+                print("!! Parent job was not submitted, skipping folder "
+                      f"{job.meta['wdir']}/")
+                continue
+            job.dependencies = [p.jobid for p in parents]
+            job.submit(dry_run=dry_run, silent=silent)
+            job.dependencies = []
+            if dry_run:
+                continue
+            job.meta["status"] = 'PENDING'
+            job.save_meta()
+            if job.jobid != None:
+                submitted.append(job)
+        return submitted
+
+    def smart_submit(self, dry_run=False, silent=False,
+                     out_extension='out',
+                     success_string="Have a nice day.",
+                     success_fct=None,
+                     ignore_meta=False,
+                     use_CCParser=True):
+        """ Resubmit only the failed part of the workflow.
+
+        The status of all jobs is checked with one query of the queue (see
+        ``JobSet``). Jobs which neither finished successfully nor are still
+        active are resubmitted together with all their unfinished
+        descendants. Descendants which are still in the queue (held because
+        of the failed dependency) are cancelled first.
+
+        Parameters
+        ----------
+        dry_run : bool
+            Whether to perform a dry-run job submission (default: False).
+        silent : bool
+            Whether to print additional information (default: False).
+        out_extension : str
+            File extension of output file (default: 'out').
+        success_string : str
+            String to match in output regarding successful job completion
+            (default: 'Have a nice day.').
+        success_fct : function(path_to_output)
+            Function object for custom parsing (default: None). Has to take
+            output path as an input and has to return a boolean.
+        ignore_meta : bool
+            Ignore existing meta file (default: False). Effectively overwrites
+            old meta with new one.
+        use_CCParser : bool
+            Use CCParser module if possible (defautl: True).
+
+        Returns
+        -------
+        submitted : list of ccjob.Job
+            Jobs which were submitted.
+        """
+        results = JobSet(self.jobs).is_successful(
+            out_extension=out_extension,
+            success_string=success_string,
+            success_fct=success_fct,
+            ignore_meta=ignore_meta,
+            use_CCParser=use_CCParser)
+        successful = {job: ok for job, ok in zip(self.jobs, results)}
+        failed = [job for job in self.jobs if not successful[job]
+                  and job.meta["status"] != 'PENDING']
+        todo = failed + [job for job in self.descendants(failed)
+                         if not successful[job] and job not in failed]
+        if len(todo) == 0:
+            if not silent:
+                print("All good. Nothing to resubmit in workflow.")
+            return []
+        self.cancel([job for job in todo if job.meta["status"] == 'PENDING'],
+                    dry_run=dry_run, silent=silent)
+        return self.submit(jobs=todo, dry_run=dry_run, silent=silent)
+
+    def cancel(self, jobs, dry_run=False, silent=False):
+        """ Remove jobs from the queue.
+
+        Parameters
+        ----------
+        jobs : list of ccjob.Job
+            Jobs to cancel (jobs without job ID are skipped).
+        dry_run : bool
+            Whether to only print the commands (default: False).
+        silent : bool
+            Whether to print additional information (default: False).
+        """
+        for job in jobs:
+            if job.jobid == None or not hasattr(job.queue, "cancel_args"):
+                continue
+            args = job.queue.cancel_args(job.jobid)
+            if dry_run:
+                print("-- dry-run: ", " ".join(args))
+                continue
+            if not silent:
+                print("-- running: ", " ".join(args))
+            job.queue.run_command(args)
+            job.meta["status"] = None
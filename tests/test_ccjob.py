@@ -3,9 +3,17 @@
 """Tests for `ccjob` package."""
 
 
+import os
+import json
+import shutil
+import tempfile
 import unittest
+from unittest import mock
 
 from ccjob import ccjob
+from ccjob import queue
+from ccjob import utils
+from ccjob import store
 
 
 class TestCcjob(unittest.TestCase):
@@ -13,9 +21,795 @@ class TestCcjob(unittest.TestCase):
 
     def setUp(self):
         """Set up test fixtures, if any."""
+        self.tmpdir = tempfile.mkdtemp()
 
     def tearDown(self):
         """Tear down test fixtures, if any."""
+        shutil.rmtree(self.tmpdir)
+
+    def make_job(self, name, status=None, jobid=None, output=None):
+        wdir = os.path.join(self.tmpdir, name)
+        inp = ccjob.Input(os.path.join(wdir, name + ".in"), inp_string="")
+        job = ccjob.Job(inp, script="qchem")
+        if status is not None:
+            with open(job.meta_filepath, "w") as f:
+                json.dump({"status": status, "jobid": jobid}, f)
+        if output is not None:
+            with open(os.path.join(wdir, name + ".out"), "w") as f:
+                f.write(output)
+        return job
 
     def test_000_something(self):
         """Test something."""
+
+    def test_001_parse_status_many(self):
+        out = ("101|RUNNING\n101.batch|RUNNING\n102|CANCELLED by 1000\n"
+               "103_4|PENDING\n")
+        status = queue.SLURM().parse_status_many(out)
+        self.assertEqual(status, {"101": "RUNNING", "102": "CANCELLED",
+                                  "103_4": "PENDING"})
+
+    def test_002_jobset_single_query(self):
+        jobs = [self.make_job("fin", status="FIN", jobid="1"),
+                self.make_job("run", status="PENDING", jobid="2"),
+                self.make_job("done", status="PENDING", jobid="3",
+                              output="Have a nice day.\n")]
+        with mock.patch.object(queue.SLURM, "get_status_usage_many",
+                               return_value=({"2": "RUNNING",
+                                              "3": "COMPLETED"}, {})) as sacct:
+            result = ccjob.JobSet(jobs).is_successful(use_CCParser=False)
+        sacct.assert_called_once()
+        self.assertEqual(sorted(sacct.call_args[0][0]), ["2", "3"])
+        self.assertEqual(result, [True, False, True])
+        self.assertEqual(jobs[2].load_status(), "FIN")
+
+    def test_002_jobset_queue_instances(self):
+        # two instances of one class, e.g. two independent clusters
+        first = queue.FakeSLURM(execute=False)
+        second = queue.FakeSLURM(execute=False)
+        second.next_jobid = 2000
+        jobs = [self.make_job(f"q{i}") for i in range(4)]
+        for i, job in enumerate(jobs):
+            job.queue = first if i % 2 == 0 else second
+            job.submit(silent=True)
+        first.wait()
+        second.wait()
+        self.assertEqual(ccjob.JobSet(jobs).get_status(),
+                         {"1000": "COMPLETED", "1001": "COMPLETED",
+                          "2000": "COMPLETED", "2001": "COMPLETED"})
+        self.assertIs(queue.queue_factory("slurm"),
+                      queue.queue_factory("SLURM"))
+
+    def test_002_unknown_jobid(self):
+        # job ID of a previous driver which the queue no longer knows
+        job = self.make_job("purged", status="FAIL", jobid="5")
+        submitted = mock.Mock(stdout=b"Submitted batch job 6\n", stderr=b"")
+        with mock.patch.object(queue.SLURM, "get_status_many",
+                               return_value={}), \
+             mock.patch.object(queue.sp, "run", return_value=submitted):
+            self.assertTrue(job.smart_submit(silent=True,
+                                             use_CCParser=False))
+        self.assertEqual(job.load_meta()["jobid"], "6")
+
+    def test_003_array_submit(self):
+        jobs = [self.make_job(f"geom{i}") for i in range(3)]
+        submitted = mock.Mock(stdout=b"Submitted batch job 42\n", stderr=b"")
+        with mock.patch.object(queue.sp, "run",
+                               return_value=submitted) as run:
+            ccjob.JobArray(jobs).submit(throttle=2, silent=True)
+        self.assertIn("--array=0-2%2", run.call_args[0][0])
+        self.assertNotIn("--partition=None", run.call_args[0][0])
+        self.assertEqual(run.call_args[1]["cwd"], self.tmpdir)
+        with open(os.path.join(self.tmpdir, "array_manifest.txt")) as f:
+            self.assertEqual(len(f.readlines()), 3)
+        self.assertEqual([j.load_meta()["jobid"] for j in jobs],
+                         ["42_0", "42_1", "42_2"])
+
+    def test_004_expand_array_jobid(self):
+        status = queue.SLURM().parse_status_many("5_[2-3,7%2]|PENDING\n")
+        self.assertEqual(sorted(status), ["5_2", "5_3", "5_7"])
+
+    def test_005_smart_submit_all(self):
+        jobs = [self.make_job("fin", status="FIN", jobid="1"),
+                self.make_job("run", status="PENDING", jobid="2"),
+                self.make_job("new")]
+        submitted = mock.Mock(stdout=b"Submitted batch job 7\n", stderr=b"")
+        with mock.patch.object(queue.SLURM, "get_status_many",
+                               return_value={"2": "RUNNING"}) as sacct, \
+             mock.patch.object(queue.sp, "run",
+                               return_value=submitted) as run:
+            summary = ccjob.smart_submit_all(jobs, max_workers=2, silent=True,
+                                             use_CCParser=False)
+        sacct.assert_called_once()
+        self.assertEqual(run.call_args[1]["cwd"], jobs[2].meta["wdir"])
+        self.assertEqual(summary["submitted"], [jobs[2]])
+        self.assertEqual(sorted(j.meta["basename"] for j in
+                                summary["skipped"]), ["fin", "run"])
+        self.assertEqual(jobs[2].load_meta()["jobid"], "7")
+
+    def test_006_file_contains(self):
+        fpath = os.path.join(self.tmpdir, "big.out")
+        with open(fpath, "w") as f:
+            f.write("Have a nice day.\n" + "x" * 100 + "\n")
+        self.assertTrue(utils.file_contains(fpath, "Have a nice day.",
+                                            tail_size=16))
+        self.assertTrue(utils.file_contains(fpath, "day.\nxx", tail_size=50))
+        self.assertFalse(utils.file_contains(fpath, "Thank you",
+                                             tail_size=16))
+        self.assertFalse(utils.file_contains(fpath, "Thank you"))
+
+    def test_007_status_store(self):
+        db = store.StatusStore(os.path.join(self.tmpdir, "status.db"))
+        jobs = []
+        for name in ("a", "b", "c"):
+            wdir = os.path.join(self.tmpdir, name)
+            inp = ccjob.Input(os.path.join(wdir, name + ".in"), inp_string="")
+            jobs.append(ccjob.Job(inp, script="qchem", store=db))
+        with open(os.path.join(self.tmpdir, "a", "a.out"), "w") as f:
+            f.write("Have a nice day.\n")
+        result = ccjob.JobSet(jobs).is_successful(use_CCParser=False)
+        self.assertEqual(result, [True, False, False])
+        self.assertFalse(os.path.exists(jobs[0].meta_filepath))
+        self.assertEqual(jobs[0].load_status(), "FIN")
+        self.assertTrue(jobs[0].is_finished())
+        self.assertEqual(db.count(), {"FIN": 1, None: 2})
+        inp = ccjob.Input(os.path.join(self.tmpdir, "d", "d.in"),
+                          inp_string="")
+        self.assertIsNone(ccjob.Job(inp, store=db).load_status())
+        self.assertEqual(len(db.query(status="FIN", wdir=self.tmpdir)), 1)
+        # '_' and '%' are no wildcards, case matters
+        for wdir in ("run_1", "runX1/a", "Run_1/a", "run_1/sub"):
+            db.save({"wdir": os.path.join(self.tmpdir, wdir),
+                     "basename": "x", "status": None})
+        found = db.query(wdir=os.path.join(self.tmpdir, "run_1"))
+        self.assertEqual(sorted(m["wdir"] for m in found),
+                         [os.path.join(self.tmpdir, "run_1"),
+                          os.path.join(self.tmpdir, "run_1", "sub")])
+        db.close()
+
+    def test_008_output_fingerprint(self):
+        job = self.make_job("cached", output="Have a nice day.\n")
+        self.assertTrue(job.is_successful(use_CCParser=False))
+        job = self.make_job("cached")
+        with mock.patch.object(ccjob, "file_contains") as parse:
+            self.assertTrue(job.is_successful(ignore_meta=True,
+                                              use_CCParser=False))
+        parse.assert_not_called()
+        outfile = os.path.join(job.meta["wdir"], "cached.out")
+        with open(outfile, "a") as f:
+            f.write("restarted\n")
+        os.utime(outfile, (0, 0))
+        with mock.patch.object(ccjob, "file_contains",
+                               return_value=False) as parse:
+            self.assertFalse(job.is_successful(ignore_meta=True,
+                                               use_CCParser=False))
+        parse.assert_called_once()
+        # a different success criterion is not answered from the cache
+        self.assertTrue(job.is_successful(ignore_meta=True,
+                                          success_string="restarted",
+                                          use_CCParser=False))
+        self.assertFalse(job.is_successful(ignore_meta=True,
+                                           success_fct=lambda path: False,
+                                           use_CCParser=False))
+        # functions are only told apart by an explicit cache key
+        calls = []
+        def lenient(path):
+            calls.append(path)
+            return True
+        lenient.cache_key = "lenient"
+        for _ in range(2):
+            self.assertTrue(job.is_successful(ignore_meta=True,
+                                              success_fct=lenient,
+                                              use_CCParser=False))
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(job.is_successful(ignore_meta=True,
+                                          success_fct=lambda path: True,
+                                          use_CCParser=False))
+        self.assertFalse(job.is_successful(ignore_meta=True,
+                                           success_fct=lambda path: False,
+                                           use_CCParser=False))
+
+    def test_009_compiled_template(self):
+        from ccjob import templates
+        from ccjob.registry import registry, CompiledTemplate
+        params = dict(templates.defaults, basis="x{y}")
+        self.assertEqual(registry["ADCinHF"].render(params),
+                         templates.ADCinHF.substitute(params))
+        compiled = CompiledTemplate("$$rem\nbasis = ${basis}$method\n")
+        self.assertEqual(compiled.identifiers, {"basis", "method"})
+        self.assertEqual(compiled.render(basis="sto-3g", method="hf"),
+                         "$rem\nbasis = sto-3ghf\n")
+        with self.assertRaises(KeyError):
+            compiled.validate(basis="sto-3g")
+        with self.assertRaises(ValueError):
+            CompiledTemplate("basis = $ ")
+        fpath = os.path.join(self.tmpdir, "missing", "x.in")
+        with self.assertRaises(KeyError):
+            ccjob.Input.from_template(compiled, fpath, defaults={},
+                                      basis="sto-3g")
+        self.assertFalse(os.path.exists(fpath))
+
+    def test_010_generate_inputs(self):
+        from ccjob.generate import generate_inputs
+        grid = {"basis": ["sto-3g", "cc-pVDZ"],
+                "xyz": {"w1": "O 0 0 0", "w2": "O 0 0 1"},
+                "nstates": [2]}
+        pattern = os.path.join(self.tmpdir, "{basis}", "{xyz}",
+                               "adc_{index}.in")
+        inputs = generate_inputs("ADC", grid, pattern, silent=True)
+        self.assertEqual(len(inputs), 4)
+        self.assertEqual(inputs[3].filepath,
+                         os.path.join(self.tmpdir, "cc-pVDZ", "w2",
+                                      "adc_3.in"))
+        with open(inputs[3].filepath) as f:
+            content = f.read()
+        self.assertIn("basis = cc-pVDZ", content)
+        self.assertIn("O 0 0 1", content)
+        zipped = generate_inputs("ADC", {"basis": ["a", "b"],
+                                         "nstates": [1, 2]},
+                                 pattern.replace("{xyz}", "zip"),
+                                 mode="zip", to_file=False)
+        self.assertEqual(len(zipped), 2)
+
+    def test_011_save_input_unchanged(self):
+        fpath = os.path.join(self.tmpdir, "keep", "keep.in")
+        inp = ccjob.Input(fpath, inp_string="$rem\nbasis = sto-3g\n$end\n")
+        os.utime(fpath, (0, 0))
+        self.assertFalse(inp.save_input(silent=True))
+        self.assertEqual(os.path.getmtime(fpath), 0)
+        inp.input_string = inp.input_string.replace("sto-3g", "6-31g")
+        self.assertTrue(inp.save_input(silent=True))
+        self.assertTrue(inp.save_input(silent=True, force=True))
+
+    def test_012_submit_async(self):
+        import asyncio
+        sbatch = os.path.join(self.tmpdir, "fake sbatch")
+        with open(sbatch, "w") as f:
+            f.write('#!/bin/sh\necho "Submitted batch job $(basename $PWD)"\n')
+        os.chmod(sbatch, 0o755)
+        slurm = queue.SLURM()
+        slurm.job_submit = sbatch
+        jobs = [self.make_job(str(i)) for i in range(5)]
+        for job in jobs:
+            job.queue = slurm
+        asyncio.run(ccjob.JobSet(jobs).submit_async(max_concurrency=2,
+                                                    silent=True))
+        self.assertEqual([j.load_meta()["jobid"] for j in jobs],
+                         [str(i) for i in range(5)])
+
+    def test_012_option_values(self):
+        job = self.make_job("dimer")
+        job.options["jobname"] = "water dimer"
+        job.set_custom_options(**{"--comment": "O'Brien"})
+        args = job.get_job_args()
+        self.assertIn("--job-name=water dimer", args)
+        self.assertIn("--comment=O'Brien", args)
+        job.queue = queue.queue_factory("pbs")
+        args = job.get_job_args(exclude=("jobname",))
+        i = args.index("-l")
+        self.assertEqual(args[i:i + 2], ["-l", "mem=500"])
+        self.assertEqual(utils.template_args("-N $jobname",
+                                             {"jobname": "a b"}),
+                         ["-N", "a b"])
+
+    def test_013_fake_slurm(self):
+        script = os.path.join(self.tmpdir, "fake qchem")
+        with open(script, "w") as f:
+            f.write('#!/bin/sh\necho "Have a nice day." > "${1%.in}.out"\n')
+        os.chmod(script, 0o755)
+        fake = queue.FakeSLURM(max_workers=2)
+        jobs = [self.make_job(f"geom{i}") for i in range(4)]
+        for job in jobs:
+            job.queue = fake
+            job.script = script
+        jobs[3].script = "/bin/false"
+        summary = ccjob.smart_submit_all(jobs, silent=True,
+                                         use_CCParser=False)
+        self.assertEqual(len(summary["submitted"]), 4)
+        fake.wait()
+        self.assertEqual(ccjob.JobSet(jobs).is_successful(use_CCParser=False),
+                         [True, True, True, False])
+        self.assertEqual(fake.get_status(jobs[3].jobid), "FAILED")
+        array = [self.make_job(f"task{i}") for i in range(3)]
+        for job in array:
+            job.queue = fake
+            job.script = script
+        ccjob.JobArray(array).submit(silent=True)
+        fake.wait()
+        fake.shutdown()
+        self.assertTrue(all(ccjob.JobSet(array).is_successful(
+                            use_CCParser=False)))
+
+        # jobs created by name share one instance
+        named = []
+        for i in range(3):
+            wdir = os.path.join(self.tmpdir, f"named{i}")
+            inp = ccjob.Input(os.path.join(wdir, "x.in"), inp_string="")
+            named.append(ccjob.Job(inp, script=script, queue="fake-slurm"))
+        for job in named:
+            job.submit(silent=True)
+        self.assertEqual(len({job.jobid for job in named}), 3)
+        queue.queue_factory("fake-slurm").wait()
+        self.assertEqual(sorted(ccjob.JobSet(named).get_status().values()),
+                         ["COMPLETED"] * 3)
+
+    def test_014_local_pool(self):
+        state_file = os.path.join(self.tmpdir, "local.json")
+        pool = queue.LocalPool(cpus=2, memory=1000, state_file=state_file)
+        script = os.path.join(self.tmpdir, "fake_qchem")
+        with open(script, "w") as f:
+            f.write('#!/bin/sh\necho "Have a nice day." > "${1%.in}.out"\n')
+        os.chmod(script, 0o755)
+        jobs = [self.make_job(f"local{i}") for i in range(3)]
+        for job in jobs:
+            job.queue = pool
+            job.script = script
+        jobs[1].options["cpus"] = 2
+        jobs[2].options["memory"] = 2000
+        ccjob.smart_submit_all(jobs, silent=True, use_CCParser=False)
+        self.assertIsNone(jobs[2].jobid)
+        self.assertTrue(pool.wait(timeout=10))
+        self.assertEqual(ccjob.JobSet(jobs[:2]).is_successful(
+                         use_CCParser=False), [True, True])
+        restarted = queue.LocalPool(cpus=2, memory=1000,
+                                    state_file=state_file)
+        self.assertEqual(restarted.get_status(jobs[0].jobid), "COMPLETED")
+
+        # jobs created by name share one pool per state file
+        cwd = os.getcwd()
+        os.chdir(self.tmpdir)
+        try:
+            named = []
+            for i in range(3):
+                wdir = os.path.join(self.tmpdir, f"named{i}")
+                inp = ccjob.Input(os.path.join(wdir, "x.in"), inp_string="")
+                named.append(ccjob.Job(inp, script=script, queue="local"))
+            self.assertFalse(os.path.exists("ccjob_local.d"))
+            for job in named:
+                job.submit(silent=True)
+            self.assertIs(named[0].queue, queue.queue_factory("local"))
+            self.assertTrue(named[0].queue.wait(timeout=10))
+        finally:
+            os.chdir(cwd)
+        self.assertEqual(len({job.jobid for job in named}), 3)
+        self.assertEqual(ccjob.JobSet(named).is_successful(
+                         use_CCParser=False), [True] * 3)
+        self.assertEqual([f for f in os.listdir(self.tmpdir)
+                          if f.endswith(".tmp")], [])
+
+    def test_015_job_bundle(self):
+        script = os.path.join(self.tmpdir, "fake_qchem")
+        with open(script, "w") as f:
+            f.write('#!/bin/sh\necho "Have a nice day." > "${1%.in}.out"\n'
+                    'echo "$OMP_NUM_THREADS"\n')
+        os.chmod(script, 0o755)
+        fake = queue.FakeSLURM()
+        jobs = [self.make_job(f"short{i}") for i in range(5)]
+        for i, job in enumerate(jobs):
+            job.queue = fake
+            job.script = script
+            job.options.update(cpus=i + 1, memory=100 * (i + 1),
+                               time="00:10:00")
+        bundle = ccjob.JobBundle(jobs, max_parallel=2)
+        options = bundle.get_options(jobs)
+        self.assertEqual((options["cpus"], options["memory"],
+                          options["time"]), (9, 900, "00:35:00"))
+        bundle.submit(silent=True)
+        fake.wait()
+        fake.shutdown()
+        self.assertEqual(len({j.jobid for j in jobs}), 1)
+        self.assertTrue(all(bundle.is_successful(use_CCParser=False)))
+        with open(os.path.join(jobs[2].meta["wdir"], "stdout.txt")) as f:
+            self.assertEqual(f.read(), "3\n")
+
+    def test_016_job_watcher(self):
+        from ccjob.watch import JobWatcher
+        jobs = [self.make_job(f"watch{i}", status="PENDING", jobid=str(i))
+                for i in range(3)]
+        status = {"0": "RUNNING", "1": "RUNNING", "2": "FAILED"}
+        watcher = JobWatcher(jobs, poll_interval=3600, scan_interval=0.01,
+                             use_CCParser=False, use_watchdog=False)
+        with mock.patch.object(queue.SLURM, "get_status_usage_many",
+                               return_value=(status, {})) as sacct:
+            events = watcher.events(timeout=5)
+            self.assertEqual(next(events), (jobs[2], False))
+            with open(os.path.join(jobs[0].meta["wdir"], "watch0.out"),
+                      "w") as f:
+                f.write("Have a nice day.\n")
+            self.assertEqual(next(events), (jobs[0], True))
+            events.close()
+        sacct.assert_called_once()
+        self.assertEqual(jobs[0].load_status(), "FIN")
+        self.assertEqual(watcher.pending, [jobs[1]])
+
+    def test_017_workflow(self):
+        from ccjob.workflow import Workflow
+        script = os.path.join(self.tmpdir, "fake_qchem")
+        with open(script, "w") as f:
+            f.write('#!/bin/sh\necho "Have a nice day." > "${1%.in}.out"\n')
+        os.chmod(script, 0o755)
+        fake = queue.FakeSLURM(max_workers=1)
+        a, b, c, d = [self.make_job(name) for name in "abcd"]
+        for job in (a, b, c, d):
+            job.queue = fake
+            job.script = script
+        c.script = "/bin/false"
+        flow = Workflow()
+        flow.add(b, parents=[a])
+        flow.add(d, parents=[c])
+        self.assertEqual(flow.order(), [a, c, b, d])
+        self.assertEqual(len(flow.submit(silent=True)), 4)
+        fake.wait()
+        self.assertEqual(fake.get_status(d.jobid), "CANCELLED")
+        c.script = script
+        resubmitted = flow.smart_submit(silent=True, use_CCParser=False)
+        self.assertEqual(resubmitted, [c, d])
+        fake.wait()
+        fake.shutdown()
+        self.assertTrue(all(ccjob.JobSet(flow).is_successful(
+                            use_CCParser=False)))
+        b.dependencies = ["1", "2"]
+        self.assertIn("--dependency=afterok:1:2 --kill-on-invalid-dep=yes",
+                      b.get_job_options())
+
+        # without --kill-on-invalid-dep children of failed parents are held
+        fake = queue.FakeSLURM(max_workers=1)
+        fake.dependency_template = "--dependency=afterok:$jobids"
+        e, f = [self.make_job(name) for name in "ef"]
+        for job in (e, f):
+            job.queue = fake
+            job.script = script
+        e.script = "/bin/false"
+        held = Workflow()
+        held.add(f, parents=[e])
+        held.submit(silent=True)
+        fake.wait()
+        old = f.jobid
+        self.assertEqual(fake.get_status(old), "PENDING")
+        e.script = script
+        self.assertEqual(held.smart_submit(silent=True, use_CCParser=False),
+                         [e, f])
+        self.assertEqual(fake.get_status(old), "CANCELLED")
+        fake.wait()
+        fake.shutdown()
+        self.assertTrue(all(ccjob.JobSet(held).is_successful(
+                            use_CCParser=False)))
+        flow.add(c, parents=[d])
+        with self.assertRaises(ValueError):
+            flow.order()
+
+    def test_018_submit_controller(self):
+        from ccjob.throttle import SubmitController
+        fake = queue.FakeSLURM(max_workers=1, execute=False, runtime=0.02,
+                               max_submit_jobs=2)
+        jobs = [self.make_job(f"throttle{i}") for i in range(6)]
+        for job in jobs:
+            job.queue = fake
+        controller = SubmitController(jobs[:3], max_queued=2,
+                                      poll_interval=0.01)
+        with mock.patch.object(fake, "sbatch",
+                               wraps=fake.sbatch) as sbatch:
+            summary = controller.run(silent=True, use_CCParser=False)
+        self.assertEqual(sbatch.call_count, 3)
+        self.assertEqual(summary["submitted"], jobs[:3])
+        self.assertGreater(summary["rate"], 0)
+        fake.wait()
+        # too many jobs at once, rejected submissions are retried
+        controller = SubmitController(jobs[3:], max_queued=10, retries=20,
+                                      backoff=0.005, max_backoff=0.02)
+        summary = controller.run(silent=True, use_CCParser=False)
+        fake.wait()
+        fake.shutdown()
+        self.assertEqual(summary["failed"], [])
+        self.assertTrue(all(j.jobid is not None for j in jobs))
+        self.assertEqual(jobs[5].load_status(), "PENDING")
+        # jobs unknown to the queue (no accounting) do not block forever
+        controller = SubmitController(max_queued=1, poll_interval=0.001,
+                                      grace_polls=2)
+        controller.active = jobs[:1]
+        with mock.patch.object(fake, "use_squeue", False), \
+             mock.patch.object(fake, "get_status_many", return_value={}):
+            controller.wait_for_slot()
+        self.assertEqual(controller.active, [])
+        # all active jobs of the user count, also those of other scripts
+        controller = SubmitController(max_queued=3)
+        controller.active = jobs[:1]
+        active = {"1": "RUNNING", "2": "PENDING", "3": "COMPLETED",
+                  str(jobs[0].jobid): "RUNNING"}
+        with mock.patch.object(fake, "get_active", return_value=active):
+            self.assertEqual(controller.in_flight(), 3)
+        self.assertEqual(controller.active, jobs[:1])
+        with mock.patch.object(fake, "get_active", return_value={}):
+            self.assertEqual(controller.in_flight(), 0)
+        self.assertEqual(controller.active, [])
+        # only transient submission errors are retried
+        controller = SubmitController(retries=3, backoff=0.001)
+        job = self.make_job("refused")
+        job.queue = fake
+        refused = (1, "", "sbatch: error: invalid partition specified\n")
+        with mock.patch.object(fake, "sbatch",
+                               return_value=refused) as sbatch:
+            self.assertFalse(controller.submit_job(job, silent=True))
+        self.assertEqual(sbatch.call_count, 1)
+        busy = (1, "", "sbatch: error: Batch job submission failed: "
+                "Socket timed out on send/recv operation\n")
+        with mock.patch.object(fake, "sbatch", return_value=busy) as sbatch:
+            self.assertFalse(controller.submit_job(job, silent=True))
+        self.assertEqual(sbatch.call_count, 4)
+
+    def test_019_squeue_fast_path(self):
+        def run(args, **kwargs):
+            if os.path.basename(args[0]) == "squeue":
+                out = b"1 PENDING\n2 COMPLETING\n9 RUNNING\n3 COMPLETED\n"
+            else:
+                requested = args[args.index("-j") + 1].split(",")
+                out = "".join(f"{j}|COMPLETED\n" for j in requested).encode()
+            return mock.Mock(stdout=out, stderr=b"", returncode=0)
+
+        slurm = queue.SLURM()
+        with mock.patch.object(queue.sp, "run", side_effect=run) as p:
+            status = slurm.get_status_many(["1", "2", "3", "4"])
+        self.assertEqual(status, {"1": "PENDING", "2": "COMPLETING",
+                                  "3": "COMPLETED", "4": "COMPLETED"})
+        self.assertEqual(p.call_count, 2)
+        self.assertEqual(p.call_args[0][0][2], "3,4")
+        job = self.make_job("pending")
+        job.jobid, job.meta["status"] = "1", "PENDING"
+        self.assertTrue(job.is_running(q_status=status["1"]))
+        self.assertFalse(job.is_running(q_status=status["3"]))
+        self.assertEqual(slurm.inv_state["OUT_OF_MEMORY"], "failed")
+
+    def test_020_campaign_scan(self):
+        from ccjob.campaign import Campaign
+        for i in range(4):
+            wdir = os.path.join(self.tmpdir, "scan", f"set{i % 2}", f"job{i}")
+            os.makedirs(wdir)
+            for fn in [f"job{i}.in", f"job{i}.out", "slurm-1.out"]:
+                open(os.path.join(wdir, fn), "w").close()
+        wdir = os.path.join(self.tmpdir, "scan", "set1", "job3")
+        open(os.path.join(wdir, "eleconfig.txt"), "w").close()
+        root = os.path.join(self.tmpdir, "scan")
+        serial = Campaign.scan(root)
+        threaded = Campaign.scan(root, max_workers=4)
+        self.assertEqual(serial.index, threaded.index)
+        self.assertEqual(len(threaded.folders()), 4)
+        with mock.patch.object(utils.glob, "glob") as glob:
+            self.assertEqual(threaded.find_output(wdir),
+                             os.path.join(wdir, "job3.out"))
+            self.assertEqual(threaded.find_eleconfig(wdir),
+                             os.path.join(wdir, "eleconfig.txt"))
+            with self.assertRaises(FileNotFoundError):
+                threaded.find_eleconfig(os.path.dirname(wdir))
+        glob.assert_not_called()
+        self.assertEqual(utils.find_output(wdir), threaded.find_output(wdir))
+        jobs = threaded.jobs(script="qchem")
+        self.assertEqual([j.meta["basename"] for j in jobs],
+                         ["job0", "job2", "job1", "job3"])
+
+    def test_021_allocation_steps(self):
+        from ccjob.allocation import Allocation
+        script = os.path.join(self.tmpdir, "fake_qchem")
+        with open(script, "w") as f:
+            f.write('#!/bin/sh\necho "Have a nice day." > "${1%.in}.out"\n'
+                    'echo "$1"\n')
+        os.chmod(script, 0o755)
+        fake = queue.FakeSLURM()
+        jobs = [self.make_job(f"step{i}") for i in range(4)]
+        for job in jobs:
+            job.queue = fake
+            job.script = script
+            job.options.update(cpus=2, partition="short")
+        self.assertIn("--exclusive", jobs[0].run_args(step_of="7"))
+        self.assertNotIn("--partition=short", jobs[0].run_args(step_of="7"))
+        with Allocation(cpus=4, queue=fake) as alloc:
+            jobid = alloc.jobid
+            summary = alloc.run(jobs, silent=True, use_CCParser=False)
+        self.assertEqual(len(summary["successful"]), 4)
+        self.assertEqual(fake.get_status(jobid), "CANCELLED")
+        with open(os.path.join(jobs[1].meta["wdir"], "stdout.txt")) as f:
+            self.assertEqual(f.read(), "step1.in\n")
+        self.assertEqual(jobs[1].load_status(), "FIN")
+        self.assertFalse(os.path.exists("stdout.txt"))
+        # steps outside of an allocation are refused
+        self.assertEqual(jobs[0].run(silent=True, step_of=jobid), 1)
+
+    def test_022_usage_and_sizing(self):
+        from ccjob.sizing import SizingPolicy
+        out = ("7|COMPLETED|00:10:00|09:58.123|\n"
+               "7.batch|COMPLETED|00:10:00|09:58.123|2097152K\n"
+               "8|OUT_OF_MEMORY|00:01:00|00:59|\n")
+        usage = queue.SLURM().parse_usage_many(out)
+        self.assertEqual(usage["7"]["max_rss"], 2048.0)
+        self.assertAlmostEqual(usage["7"]["total_cpu"], 598.123)
+        self.assertEqual(usage["8"]["q_state"], "OUT_OF_MEMORY")
+
+        script = os.path.join(self.tmpdir, "fake_qchem")
+        with open(script, "w") as f:
+            f.write('#!/bin/sh\necho "Have a nice day." > "${1%.in}.out"\n')
+        os.chmod(script, 0o755)
+        fake = queue.FakeSLURM(max_rss=300.0)
+        jobs = [self.make_job(f"size{i}") for i in range(4)]
+        for job in jobs:
+            job.queue, job.script = fake, script
+            job.meta["group"] = "adc/tz"
+        jobs[3].script = "/bin/false"
+        for job in jobs:
+            job.submit(silent=True)
+        fake.wait()
+        fake.shutdown()
+        # status and usage with one sacct call
+        with mock.patch.object(fake, "sacct", wraps=fake.sacct) as sacct:
+            self.assertEqual(ccjob.JobSet(jobs).is_successful(
+                             use_CCParser=False), [True] * 3 + [False])
+        self.assertEqual(sacct.call_count, 1)
+        self.assertEqual(jobs[0].load_meta()["max_rss"], 300.0)
+        # the final state of the failed job is known from meta
+        again = self.make_job("size3")
+        again.queue = fake
+        with mock.patch.object(fake, "sacct", wraps=fake.sacct) as sacct:
+            self.assertEqual(ccjob.JobSet([again]).is_successful(
+                             use_CCParser=False), [False])
+        sacct.assert_not_called()
+        self.assertEqual(again.load_meta()["q_state"], "FAILED")
+        policy = SizingPolicy()
+        self.assertEqual(policy.observe(jobs), 3)
+        new = self.make_job("size_new")
+        new.meta["group"] = "adc/tz"
+        oom = self.make_job("size_oom", status="FAIL")
+        with open(oom.meta_filepath, "w") as f:
+            json.dump({"status": "FAIL", "q_state": "OUT_OF_MEMORY",
+                       "memory": 4000, "jobid": "99",
+                       "usage_jobid": "99"}, f)
+        # sweep of a restarted driver keeps the request in meta
+        self.assertEqual(ccjob.JobSet([oom]).is_successful(
+                         use_CCParser=False), [False])
+        self.assertEqual(policy.apply([new, oom]), [new, oom])
+        self.assertEqual((new.options["memory"], new.options["time"]),
+                         (375, "00:05:00"))
+        # twice the memory of the killed job, not of the current options
+        self.assertEqual(oom.options["memory"], 8000)
+        self.assertEqual((jobs[0].load_meta()["memory"],
+                          jobs[0].load_meta()["time"]), (500, "00:15:00"))
+
+    def test_023_trajectory_stream(self):
+        from ccjob.throttle import SubmitController
+        from ccjob.trajectory import read_xyz_frames, stream_inputs
+        traj = os.path.join(self.tmpdir, "traj.xyz")
+        with open(traj, "w") as f:
+            for i in range(5):
+                f.write(f"2\nframe {i}\nO 0.0 0.0 {i}.0\nH  0.0 1.0 {i}.0\n")
+        frames = list(read_xyz_frames(traj, start=1, step=2))
+        self.assertEqual([fr["index"] for fr in frames], [1, 3])
+        self.assertEqual(frames[1]["xyz"], "O 0.0 0.0 3.0\nH  0.0 1.0 3.0")
+        self.assertEqual(frames[0]["comment"], "frame 1")
+
+        fake = queue.FakeSLURM(max_workers=1, execute=False, runtime=0.01)
+        produced = []
+
+        def transform(frame):
+            produced.append(frame["index"])
+            return {"xyz": frame["xyz"], "nstates": frame["index"]}
+
+        inputs = stream_inputs("ADC", read_xyz_frames(traj), os.path.join(
+                               self.tmpdir, "frames", "{index:03d}", "adc.in"),
+                               transform=transform)
+        jobs = (ccjob.Job(inp, script="qchem", queue=fake) for inp in inputs)
+        controller = SubmitController(max_queued=2, poll_interval=0.01)
+        stream = controller.submit_stream(jobs, silent=True)
+        next(stream)
+        # frames are only read and rendered when they can be submitted
+        self.assertEqual(produced, [0])
+        self.assertTrue(all(ok for _, ok in stream))
+        fake.wait()
+        fake.shutdown()
+        self.assertEqual(controller.n_submitted, 5)
+        with open(os.path.join(self.tmpdir, "frames", "004", "adc.in")) as f:
+            content = f.read()
+        self.assertIn("ee_states = 4", content)
+        self.assertIn("O 0.0 0.0 4.0", content)
+
+    @unittest.skipUnless(utils.module_exists("numpy"), "requires numpy")
+    def test_024_geometry_selection(self):
+        import numpy as np
+        from ccjob import templates
+        from ccjob.geometry import CellList, Geometry
+        self.assertEqual(Geometry.from_xyz(templates.A).xyz_block(),
+                         templates.A)
+
+        rng = np.random.RandomState(0)
+        centers = rng.uniform(0, 30, size=(400, 3))
+        water = np.array([[0.0, 0.0, 0.0], [0.96, 0.0, 0.0],
+                          [-0.24, 0.93, 0.0]])
+        coords = (centers[:, None, :] + water).reshape(-1, 3)
+        symbols = ["O", "H", "H"] * len(centers)
+        molecules = np.repeat(np.arange(len(centers)), 3)
+        geom = Geometry(symbols, coords, molecules=molecules)
+
+        points = coords[:5]
+        d = np.linalg.norm(coords[:, None] - points[None], axis=2)
+        brute = np.flatnonzero((d <= 4.0).any(axis=1))
+        self.assertEqual(CellList(coords, 4.0).query(points, 4.0).tolist(),
+                         brute.tolist())
+        self.assertEqual(CellList(coords, 1.5).query(points, 4.0).tolist(),
+                         brute.tolist())
+
+        a, b, pc = geom.select([0], 4.0, 8.0, use_kdtree=False)
+        self.assertEqual(a.tolist(), [0, 1, 2])
+        self.assertEqual(len(np.intersect1d(b, pc)), 0)
+        self.assertEqual(len(b) % 3, 0)
+        self.assertEqual(len(pc) % 3, 0)
+        fields = geom.blocks([0], 4.0, 8.0, use_kdtree=False,
+                             charge_table={"O": -0.834, "H": 0.417})
+        self.assertEqual(len(fields["frag_b"].splitlines()), len(b))
+        charges = [float(l.split()[3])
+                   for l in fields["point_charges"].splitlines()]
+        self.assertAlmostEqual(sum(charges), 0.0)
+        with self.assertRaises(KeyError):
+            geom.charges({"O": -0.834})
+
+    def test_025_block_formatter(self):
+        from ccjob.formatting import BlockFormatter, Block, format_xyz
+        from ccjob.registry import CompiledTemplate
+        from ccjob import templates
+        with self.assertRaises(ValueError):
+            BlockFormatter("%16.10f %d")
+        formatter = BlockFormatter("%-2s%12.4f%8.2f")
+        symbols = ["O", "H", "Cl", "H"]
+        x = [0.0, -0.0, -1e-9, 12345.67891]
+        y = [0.125, -0.375, 9.999, -99.995]
+        expected = "\n".join("%-2s%12.4f%8.2f" % v for v in zip(symbols, x, y))
+        self.assertEqual(formatter.format_slow([symbols, x, y]), expected)
+        self.assertEqual(formatter.format(symbols, x, y), expected)
+        # values which do not fit are formatted the slow way
+        self.assertEqual(formatter.format(symbols, x, [1e9] * 4),
+                         "\n".join("%-2s%12.4f%8.2f" % v
+                                   for v in zip(symbols, x, [1e9] * 4)))
+        with self.assertRaises(ValueError):
+            formatter.format(symbols, x)
+
+        lines = [l.split() for l in templates.A.splitlines()]
+        coords = [[float(v) for v in l[1:]] for l in lines]
+        block = Block.xyz([l[0] for l in lines], coords)
+        self.assertEqual(str(block), templates.A)
+        self.assertEqual(format_xyz([l[0] for l in lines], coords),
+                         templates.A)
+        compiled = CompiledTemplate(templates.MP2_prepolExportDens)
+        pc = Block(BlockFormatter("%16.10f%16.10f%16.10f%8.1f"),
+                   [-7.9563726699], [1.4854060709], [0.1167920007], [-0.8])
+        text = compiled.render(templates.defaults, xyz=block,
+                               point_charges=pc)
+        self.assertIn(templates.A, text)
+        self.assertIn(str(pc), text)
+        self.assertEqual(str(pc).split(), templates.pc.split()[:4])
+
+    @unittest.skipUnless(utils.module_exists("numpy"), "requires numpy")
+    def test_025_block_formatter_numpy(self):
+        import numpy as np
+        from ccjob.formatting import point_charge_formatter
+        rng = np.random.RandomState(1)
+        coords = rng.uniform(-99, 99, size=(2000, 3))
+        # ties, carries and negative zeros
+        coords[:4, 0] = [0.5e-10, -0.5e-10, 99.99999999999, -0.0]
+        charges = np.round(rng.uniform(-1, 1, 2000), 5)
+        columns = [coords[:, 0], coords[:, 1], coords[:, 2], charges]
+        self.assertEqual(point_charge_formatter.format(*columns),
+                         point_charge_formatter.format_slow(
+                             [c.tolist() for c in columns]))
+
+    def test_025_block_formatter_threads(self):
+        import numpy as np
+        from concurrent.futures import ThreadPoolExecutor
+        from ccjob.formatting import point_charge_formatter
+        rng = np.random.RandomState(2)
+        blocks = [[rng.uniform(-99, 99, 500 + 100 * i) for _ in range(4)]
+                  for i in range(8)]
+        expected = [point_charge_formatter.format_slow(
+            [c.tolist() for c in block]) for block in blocks]
+
+        def format_all(block):
+            return [point_charge_formatter.format(*block) for _ in range(20)]
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(format_all, blocks))
+        for texts, text in zip(results, expected):
+            self.assertEqual(texts, [text] * 20)